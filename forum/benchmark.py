@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+爬虫性能基准测试脚本
+Usage: python benchmark.py <benchmark> [options]
+"""
+
+import os
+import sys
+import gzip
+import time
+import random
+import shutil
+import logging
+import argparse
+import itertools
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from types import SimpleNamespace
+
+from forum_spider.pipelines import TxtWriterPipeline
+from forum_spider.simhash import SimHashIndex, simhash
+from forum_spider.keywords import KeywordAutomaton
+from forum_spider.selector_cache import SelectorCache
+from forum_spider import scoring
+from forum_spider.replay import default_source, load_corpus
+from scrapy.utils.misc import load_object
+from scrapy.utils.project import get_project_settings
+from forum_spider.spiders.hassbian_spider import HassbianSpider
+from scrapy.http import HtmlResponse
+import scrapy
+
+
+def _fake_spider(output_dir):
+    """构造只包含Pipeline所需设置的spider对象"""
+    settings = {'CUSTOM_SETTINGS': {'OUTPUT_DIR': output_dir}}
+    return SimpleNamespace(crawler=SimpleNamespace(settings=settings), settings=settings)
+
+
+def bench_post_index(args):
+    """回复追加耗时 vs 输出目录中的帖子数量"""
+    print(f"{'帖子目录数':>10} {'启动(ms)':>10} {'索引查找(us/条)':>16} {'listdir查找(us/条)':>20}")
+
+    for size in args.sizes:
+        tmp_dir = tempfile.mkdtemp(prefix='bench_post_index_')
+        try:
+            pipeline = TxtWriterPipeline()
+            base_output_dir = os.path.join(tmp_dir, pipeline.forum_name)
+            os.makedirs(base_output_dir)
+            for post_id in range(size):
+                os.mkdir(os.path.join(base_output_dir, f"{post_id}_benchmark_{post_id}"))
+
+            spider = _fake_spider(tmp_dir)
+            start = time.perf_counter()
+            pipeline.open_spider(spider)
+            startup_ms = (time.perf_counter() - start) * 1000
+
+            post_ids = [str(random.randrange(size)) for _ in range(args.replies)]
+            replies = [{'post_id': post_id, 'floor_num': i, 'author': 'bench', 'content': 'x' * 200}
+                       for i, post_id in enumerate(post_ids, 2)]
+
+            start = time.perf_counter()
+            for reply in replies:
+                pipeline._append_reply_to_txt(reply)
+            indexed_us = (time.perf_counter() - start) / len(replies) * 1e6
+
+            # 旧实现：每条回复都列出并stat整个输出目录
+            legacy_samples = post_ids[:args.legacy_replies]
+            start = time.perf_counter()
+            for post_id in legacy_samples:
+                [d for d in os.listdir(base_output_dir)
+                 if os.path.isdir(os.path.join(base_output_dir, d)) and d.startswith(f"{post_id}_")]
+            legacy_us = (time.perf_counter() - start) / len(legacy_samples) * 1e6
+
+            pipeline.close_spider(spider)
+            print(f"{size:>10} {startup_ms:>10.1f} {indexed_us:>16.1f} {legacy_us:>20.1f}")
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+def _synthetic_replies(count, near_duplicate_ratio, seed=0):
+    """生成回复内容：独立回复、少量字符改动的转帖/引用，以及"顶"、"mark"之类的灌水"""
+    rng = random.Random(seed)
+    # 字符频率近似Zipf分布，接近真实中文文本的n-gram重复程度
+    vocabulary = [chr(c) for c in range(0x4E00, 0x4E00 + 3000)] + list('abcdefghijklmnopqrstuvwxyz0123456789')
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    spam = ['顶', 'mark', '顶一下', '感谢分享', '学习了', 'mark一下，回头试试']
+    originals = []
+    for _ in range(count):
+        roll = rng.random()
+        if originals and roll < near_duplicate_ratio:
+            chars = list(rng.choice(originals))
+            for _ in range(rng.randint(0, 2)):
+                chars[rng.randrange(len(chars))] = rng.choice(vocabulary)
+            yield ''.join(chars)
+        elif roll < near_duplicate_ratio + 0.05:
+            yield rng.choice(spam)
+        else:
+            text = ''.join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(30, 200)))
+            if len(originals) < 10000:
+                originals.append(text)
+            yield text
+
+
+def bench_simhash(args):
+    """SimHash指纹计算与分段索引查找吞吐量"""
+    print(f"{'回复数':>10} {'指纹(us/条)':>12} {'查找+插入(us/条)':>18} {'吞吐(条/s)':>12} "
+          f"{'近似重复':>10} {'索引指纹数':>10}")
+
+    for count in args.replies:
+        contents = list(_synthetic_replies(count, args.near_duplicate_ratio))
+        index = SimHashIndex(args.max_distance)
+
+        start = time.perf_counter()
+        fingerprints = [simhash(content, args.ngram) for content in contents]
+        fingerprint_seconds = time.perf_counter() - start
+
+        duplicates = 0
+        start = time.perf_counter()
+        for key, fingerprint in enumerate(fingerprints):
+            if index.find(fingerprint) is None:
+                index.add(fingerprint, key)
+            else:
+                duplicates += 1
+        index_seconds = time.perf_counter() - start
+
+        total_seconds = fingerprint_seconds + index_seconds
+        print(f"{count:>10} {fingerprint_seconds / count * 1e6:>12.1f} {index_seconds / count * 1e6:>18.1f} "
+              f"{count / total_seconds:>12.0f} {duplicates:>10} {len(index):>10}")
+
+
+def bench_filter(args):
+    """关键词过滤：Aho-Corasick自动机 vs 逐个关键词子串查找"""
+    rng = random.Random(0)
+    vocabulary = [chr(c) for c in range(0x4E00, 0x4E00 + 3000)]
+    texts = [(''.join(rng.choices(vocabulary, k=20)), ''.join(rng.choices(vocabulary, k=args.length)))
+             for _ in range(args.items)]
+    print(f"{'关键词数':>10} {'编译(ms)':>10} {'自动机(us/条)':>14} {'逐个查找(us/条)':>16}")
+
+    for size in args.keywords:
+        keywords = [''.join(rng.choices(vocabulary, k=rng.randint(2, 4))) for _ in range(size)]
+
+        start = time.perf_counter()
+        automaton = KeywordAutomaton((keyword, keyword) for keyword in keywords)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for title, content in texts:
+            automaton.find_rules(title, content)
+        automaton_us = (time.perf_counter() - start) / len(texts) * 1e6
+
+        start = time.perf_counter()
+        for title, content in texts:
+            [keyword for keyword in keywords if keyword in content or keyword in title]
+        naive_us = (time.perf_counter() - start) / len(texts) * 1e6
+
+        print(f"{size:>10} {build_ms:>10.1f} {automaton_us:>14.1f} {naive_us:>16.1f}")
+
+
+def _synthetic_thread_page(tid, page, posts, rng):
+    """按Discuz桌面版模板生成帖子页：页头导航、侧栏和每个楼层的用户信息、正文、签名、操作按钮"""
+    nav = ''.join(f'<li><a href="forum-{i}-1.html" title="版块{i}">版块{i}</a></li>' for i in range(40))
+    blocks = []
+    for i in range(posts):
+        floor = (page - 1) * posts + i + 1
+        pid = tid * 100 + floor
+        profile = ''.join(f'<tr><th>字段{k}</th><td><a href="home.php?uid={pid}&f={k}">{rng.randint(0, 9999)}</a></td></tr>'
+                          for k in range(8))
+        message = '<br />\r\n'.join(''.join(rng.choices('智能家居网关灯光开关传感器配置自动化集成插件', k=rng.randint(20, 80)))
+                                      for _ in range(rng.randint(1, 6)))
+        buttons = ''.join(f'<a href="forum.php?mod=misc&action={k}&pid={pid}">操作{k}</a>' for k in range(10))
+        blocks.append(f'''<div id="post_{pid}"><table id="pid{pid}" class="plhin" summary="pid{pid}"><tr>
+<td class="pls" rowspan="2"><div class="pls favatar"><div class="pi"><div class="authi"><a href="space-uid-{pid}.html" class="xw1">用户{floor}</a></div></div>
+<div class="avatar"><a href="space-uid-{pid}.html"><img src="avatar.php?uid={pid}" /></a></div><table class="tns">{profile}</table></div></td>
+<td class="plc"><div class="pi"><strong><a href="forum.php?mod=redirect&goto=findpost&ptid={tid}&pid={pid}" id="postnum{pid}"><em>{floor}</em>#</a></strong>
+<div class="pti"><div class="authi"><img class="authicn" src="online.gif" /><em id="authorposton{pid}">发表于 2025-7-{floor % 28 + 1} 10:{floor % 60:02d}</em>
+<span class="pipe">|</span><a href="forum.php?mod=viewthread&tid={tid}&authorid={pid}">只看该作者</a></div></div></div>
+<div class="pct"><div class="pcb"><div class="t_fsz"><table cellspacing="0" cellpadding="0"><tr><td class="t_f" id="postmessage_{pid}">
+{message}</td></tr></table></div></div></div></td></tr>
+<tr><td class="plc plm"><div class="sign">签名档 {floor}</div></td></tr>
+<tr><td class="plc"><div class="po hin"><div class="pob cl">{buttons}</div></div></td></tr></table></div>''')
+    return f'''<!DOCTYPE html><html><head><title>帖子 {tid} - 论坛</title></head><body>
+<div id="hd"><ul id="nav">{nav}</ul></div><div id="pt" class="bm cl"><div class="z"><a href="./">首页</a><em>&rsaquo;</em><a href="forum-38-1.html">版块</a></div></div>
+<div id="ct" class="wp cl"><div id="pgt" class="pgs mbm cl"><div class="pg"><a href="thread-{tid}-2-1.html">2</a><label><span title="共 3 页"> / 3 页</span></label></div></div>
+<div id="postlist" class="pl bm"><table cellspacing="0" cellpadding="0"><tr><td class="plc ptm pbn vwthd"><h1 class="ts"><span id="thread_subject">帖子 {tid} 的标题</span></h1>
+<span class="xg1"><a href="thread-{tid}-1-1.html">[复制链接]</a></span></td></tr></table>{''.join(blocks)}</div></div>
+<div id="ft" class="wp cl">{nav}</div></body></html>'''
+
+
+def _saved_thread_pages(cache_dir):
+    """从HTTP缓存（SQLite缓存数据库或缓存目录）读取已保存的帖子页 (url, body)"""
+    pages = []
+    if not os.path.exists(cache_dir):
+        return pages
+    corpus = load_corpus(cache_dir)
+    for method, url in list(corpus.entries):
+        if 'thread-' not in url:
+            continue
+        _, response_url, _, body = corpus.get(method, url)
+        if body[:2] == b'\x1f\x8b':  # 缓存保存的是未解压的响应体
+            body = gzip.decompress(body)
+        pages.append((response_url, body))
+    return pages
+
+
+def _extraction_spider(backend, output_dir):
+    """构造只用于页面提取的spider（不打开已见集合）"""
+    spider = HassbianSpider()
+    spider.extraction_backend = backend
+    spider.max_replies = 10 ** 6
+    spider.selector_cache = SelectorCache(os.path.join(output_dir, 'selector_stats.json'), spider.allowed_domains[0])
+    return spider
+
+
+def _extract_page(spider, url, body):
+    response = HtmlResponse(url=url, body=body, encoding='utf-8')
+    post_id = spider.extract_post_id(url)
+    post = spider.extract_post_info(response, post_id)
+    replies = spider.extract_replies(response, post_id)
+    return [dict(post or {})] + [dict(reply) for reply in replies]
+
+
+def bench_extract(args):
+    """帖子页提取：css后端（逐字段选择器） vs lxml后端（单次遍历）"""
+    logging.getLogger('forum_spider').setLevel(logging.ERROR)  # 已保存的移动版页面没有楼层，屏蔽提取警告
+    rng = random.Random(0)
+    pages = _saved_thread_pages(args.cache_dir or default_source(get_project_settings(), 'hassbian'))
+    saved = len(pages)
+    for i in range(args.synthetic):
+        tid = 10000 + i
+        pages.append((f'https://bbs.hassbian.com/thread-{tid}-1-1.html',
+                      _synthetic_thread_page(tid, 1, args.posts, rng).encode('utf-8')))
+    if not pages:
+        print("没有可用的帖子页")
+        return
+    print(f"页面: {saved} 个已保存页面 + {args.synthetic} 个合成页面（每页 {args.posts} 楼）")
+
+    tmp_dir = tempfile.mkdtemp(prefix='bench_extract_')
+    try:
+        results = {}
+        print(f"{'后端':>6} {'耗时(ms/页)':>12} {'吞吐(页/s)':>12} {'item数':>8}")
+        for backend in ('css', 'lxml'):
+            spider = _extraction_spider(backend, tmp_dir)
+            items = []
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                items = [_extract_page(spider, url, body) for url, body in pages]
+            seconds = (time.perf_counter() - start) / args.rounds
+            results[backend] = items
+            print(f"{backend:>6} {seconds / len(pages) * 1000:>12.2f} {len(pages) / seconds:>12.0f} "
+                  f"{sum(map(len, items)):>8}")
+
+        mismatched = [url for (url, _), css_items, lxml_items in zip(pages, results['css'], results['lxml'])
+                      if css_items != lxml_items]
+        print(f"结果不一致的页面: {len(mismatched)}")
+        for url in mismatched[:5]:
+            print(f"  {url}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def _synthetic_threads(count, max_replies, posts_per_page, rng):
+    """回复数呈长尾分布的列表页帖子，最后回复时间在30天内"""
+    threads = []
+    for i in range(count):
+        replies = min(int(rng.paretovariate(1.2)) - 1, 500)
+        threads.append(scoring.ThreadHotness(str(10000 + i), replies, replies * rng.randint(5, 50) + rng.randint(0, 200),
+                                             rng.uniform(0, 720), None, max_replies, posts_per_page))
+    return threads
+
+
+def _crawl_budget(threads, budget):
+    """按给定顺序抓取帖子（每个帖子所需请求数见 scoring.expected_requests），返回预算内得到的回复数和用掉的请求数"""
+    replies = requests = 0
+    for thread in threads:
+        cost = scoring.expected_requests(thread)
+        if requests + cost > budget:
+            # 预算不足以抓完整个帖子时只抓取剩余预算能覆盖的页
+            pages = budget - requests
+            replies += min(scoring.expected_new_replies(thread), max(0, pages * thread.posts_per_page - 1))
+            requests = budget
+            break
+        replies += scoring.expected_new_replies(thread)
+        requests += cost
+    return replies, requests
+
+
+def bench_hotness(args):
+    """固定请求预算下，列表页顺序 vs 热度优先级得到的新回复数"""
+    rng = random.Random(0)
+    scorer = load_object(args.scorer)
+    threads = _synthetic_threads(args.threads, args.max_replies, args.posts_per_page, rng)
+    # 与Scrapy优先级队列一致：优先级高的先下载，同优先级按列表页顺序
+    by_priority = sorted(threads, key=lambda thread: -scoring.to_priority(scorer(thread), 10, 1000))
+    total = sum(map(scoring.expected_new_replies, threads))
+    print(f"帖子: {args.threads}，共 {total} 条可抓取回复（每帖最多 {args.max_replies} 条），评分函数: {args.scorer}")
+    print(f"{'请求预算':>8} {'列表顺序(回复)':>14} {'热度优先(回复)':>14} {'回复/请求':>16}")
+    for budget in args.budgets:
+        list_replies, list_requests = _crawl_budget(threads, budget)
+        hot_replies, hot_requests = _crawl_budget(by_priority, budget)
+        print(f"{budget:>8} {list_replies:>14} {hot_replies:>14} "
+              f"{list_replies / max(1, list_requests):>7.2f} -> {hot_replies / max(1, hot_requests):<6.2f}")
+
+
+class _StandInServer:
+    """模拟论坛服务器的本地HTTP服务：并发超过 capacity 后延迟按排队线性增长，超过 limit 返回 429（Retry-After: 1）"""
+
+    def __init__(self, latency, capacity, limit):
+        self.latency = latency
+        self.capacity = capacity
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.peak = 0
+        self.throttled = 0
+        self.body = ('<html><body>' + '<p>stand-in forum page</p>' * 80 + '</body></html>').encode()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server.lock:
+                    server.inflight += 1
+                    inflight = server.inflight
+                    server.peak = max(server.peak, inflight)
+                try:
+                    if inflight > server.limit:
+                        with server.lock:
+                            server.throttled += 1
+                        self.send_response(429)
+                        self.send_header('Retry-After', '1')
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    time.sleep(server.latency * max(1.0, inflight / server.capacity))
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(server.body)))
+                    self.end_headers()
+                    self.wfile.write(server.body)
+                finally:
+                    with server.lock:
+                        server.inflight -= 1
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def reset(self):
+        self.peak = self.throttled = 0
+
+
+class _PageSpider(scrapy.Spider):
+    """依次请求 /page/<i> 的基准测试爬虫"""
+    name = 'aimd-benchmark'
+
+    def __init__(self, base_url, pages, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.base_url = base_url
+        self.pages = pages
+        self.fetched = 0
+
+    async def start(self):
+        for i in range(self.pages):
+            yield scrapy.Request(f'{self.base_url}/page/{i}', callback=self.parse)
+
+    def parse(self, response):
+        self.fetched += 1
+
+
+def bench_aimd(args):
+    """本地模拟服务器上，固定延迟 + AutoThrottle 与 AIMD 自适应并发的吞吐量对比"""
+    from scrapy.crawler import Crawler, CrawlerProcess
+    from twisted.internet import defer
+
+    server = _StandInServer(args.latency, args.capacity, args.limit)
+    base = get_project_settings()
+    base.set('LOG_FILE', None)
+    base.set('LOG_LEVEL', args.log_level)
+
+    def settings_for(aimd):
+        settings = base.copy()
+        custom_settings = dict(settings.get('CUSTOM_SETTINGS', {}))
+        custom_settings.update({'AIMD_ENABLED': aimd, 'METRICS_ENABLED': False, 'FRONTIER_ENABLED': False})
+        settings.set('CUSTOM_SETTINGS', custom_settings)
+        settings.set('ITEM_PIPELINES', {})
+        settings.set('SPIDER_MIDDLEWARES', {})
+        settings.set('HTTPCACHE_ENABLED', False)
+        if args.delay is not None:
+            settings.set('DOWNLOAD_DELAY', args.delay)
+        if not aimd:
+            # 原来的配置：固定延迟 + AutoThrottle，每域名2个并发，全局8个
+            settings.set('AUTOTHROTTLE_ENABLED', True)
+            settings.set('AUTOTHROTTLE_DEBUG', False)
+            settings.set('CONCURRENT_REQUESTS', 8)
+        return settings
+
+    # CrawlerProcess负责安装reactor和日志（它的设置会合并进每个crawler，只传日志设置）；
+    # 第二种配置在第一次爬取结束后加入，process.start() 等待两者都结束
+    process = CrawlerProcess({'LOG_LEVEL': args.log_level, 'LOG_FILE': None})
+    results = []
+
+    @defer.inlineCallbacks
+    def run_all():
+        for label, aimd in (('固定延迟+AutoThrottle', False), ('AIMD', True)):
+            server.reset()
+            crawler = Crawler(_PageSpider, settings_for(aimd), init_reactor=not results)
+            started = time.perf_counter()
+            yield process.crawl(crawler, base_url=server.url, pages=args.requests)
+            elapsed = time.perf_counter() - started
+            stats = crawler.stats.get_stats()
+            results.append((label, crawler.spider.fetched, elapsed, server.peak, server.throttled,
+                            stats.get('aimd/increases', 0), stats.get('aimd/decreases', 0),
+                            stats.get('aimd/max_concurrency', '-')))
+
+    run_all()
+    process.start()
+    server.httpd.shutdown()
+
+    print(f"模拟服务器: 延迟 {args.latency * 1000:.0f}ms，{args.capacity} 个并发以上开始排队，超过 {args.limit} 个返回429")
+    print(f"{'配置':<20} {'页面':>6} {'耗时(s)':>8} {'页面/秒':>8} {'峰值并发':>8} {'429':>6} {'加速/减速':>10} {'最大并发':>8}")
+    for label, fetched, elapsed, peak, throttled, increases, decreases, max_concurrency in results:
+        print(f"{label:<20} {fetched:>6} {elapsed:>8.1f} {fetched / elapsed:>8.2f} {peak:>8} {throttled:>6} "
+              f"{f'{increases}/{decreases}':>10} {max_concurrency:>8}")
+    if len(results) == 2 and results[0][2] > 0:
+        print(f"吞吐量提升: {(results[1][1] / results[1][2]) / (results[0][1] / results[0][2]):.1f}x")
+
+
+def _dir_usage(path):
+    """目录下的文件数和总字节数"""
+    files = size = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+
+def bench_httpcache(args):
+    """HTTP缓存存储：Scrapy文件系统存储 vs 单文件压缩SQLite存储的写入、读取耗时和磁盘占用"""
+    from scrapy.extensions.httpcache import FilesystemCacheStorage
+    from scrapy.settings import Settings
+    from scrapy.statscollectors import MemoryStatsCollector
+    from scrapy.utils.request import RequestFingerprinter
+    from scrapy.signalmanager import SignalManager
+    from forum_spider.httpcache import SqliteCacheStorage, zstandard
+
+    rng = random.Random(0)
+    pages = [(f'https://bbs.hassbian.com/thread-{10000 + i}-1-1.html',
+              _synthetic_thread_page(10000 + i, 1, args.posts, rng).encode('utf-8')) for i in range(args.pages)]
+    raw_bytes = sum(len(body) for _, body in pages)
+    print(f"页面: {args.pages} 个合成帖子页，共 {raw_bytes / 1024 / 1024:.1f}MB（zstandard {'已' if zstandard else '未'}安装）")
+    print(f"{'存储':<16} {'写入(ms/页)':>12} {'读取(ms/页)':>12} {'文件数':>8} {'磁盘(MB)':>10}")
+
+    storages = [('filesystem', FilesystemCacheStorage, {}),
+                ('sqlite+zlib', SqliteCacheStorage, {'HTTPCACHE_COMPRESSION': 'zlib'})]
+    if zstandard is not None:
+        storages.append(('sqlite+zstd', SqliteCacheStorage, {'HTTPCACHE_COMPRESSION': 'zstd'}))
+    for label, storage_cls, custom_settings in storages:
+        tmp_dir = tempfile.mkdtemp(prefix='bench_httpcache_')
+        try:
+            settings = Settings({'HTTPCACHE_DIR': tmp_dir, 'HTTPCACHE_EXPIRATION_SECS': 0,
+                                 'CUSTOM_SETTINGS': {**custom_settings, 'HTTPCACHE_MAX_MB': 1024}})
+            crawler = SimpleNamespace(stats=MemoryStatsCollector(SimpleNamespace(settings=settings)),
+                                      request_fingerprinter=RequestFingerprinter(), signals=SignalManager())
+            spider = SimpleNamespace(name='hassbian', crawler=crawler)
+            storage = storage_cls(settings)
+            storage.open_spider(spider)
+            requests = [scrapy.Request(url) for url, _ in pages]
+
+            start = time.perf_counter()
+            for request, (url, body) in zip(requests, pages):
+                response = HtmlResponse(url=url, body=body, headers={'Content-Type': 'text/html; charset=utf-8'})
+                storage.store_response(spider, request, response)
+            store_ms = (time.perf_counter() - start) / len(pages) * 1000
+            storage.close_spider(spider)
+
+            storage.open_spider(spider)
+            start = time.perf_counter()
+            for request in requests:
+                storage.retrieve_response(spider, request)
+            retrieve_ms = (time.perf_counter() - start) / len(pages) * 1000
+            storage.close_spider(spider)
+
+            files, size = _dir_usage(tmp_dir)
+            print(f"{label:<16} {store_ms:>12.3f} {retrieve_ms:>12.3f} {files:>8} {size / 1024 / 1024:>10.2f}")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='运行爬虫性能基准测试')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    post_index = subparsers.add_parser('post-index', help='TXT回复追加的帖子目录查找开销')
+    post_index.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 30000],
+                            help='输出目录中的帖子数量 (默认: 1000 10000 30000)')
+    post_index.add_argument('--replies', type=int, default=2000,
+                            help='每轮追加的回复数 (默认: 2000)')
+    post_index.add_argument('--legacy-replies', type=int, default=20,
+                            help='旧实现的采样回复数 (默认: 20)')
+    post_index.set_defaults(func=bench_post_index)
+
+    simhash_parser = subparsers.add_parser('simhash', help='回复内容SimHash近似去重吞吐量')
+    simhash_parser.add_argument('--replies', type=int, nargs='+', default=[100000, 1000000],
+                                help='回复数量 (默认: 100000 1000000)')
+    simhash_parser.add_argument('--max-distance', type=int, default=3,
+                                help='汉明距离阈值 (默认: 3)')
+    simhash_parser.add_argument('--ngram', type=int, default=3,
+                                help='字符n-gram长度 (默认: 3)')
+    simhash_parser.add_argument('--near-duplicate-ratio', type=float, default=0.1,
+                                help='近似重复回复比例 (默认: 0.1)')
+    simhash_parser.set_defaults(func=bench_simhash)
+
+    filter_parser = subparsers.add_parser('filter', help='FilterPipeline关键词匹配开销')
+    filter_parser.add_argument('--keywords', type=int, nargs='+', default=[100, 1000, 5000],
+                               help='关键词数量 (默认: 100 1000 5000)')
+    filter_parser.add_argument('--items', type=int, default=2000,
+                               help='item数量 (默认: 2000)')
+    filter_parser.add_argument('--length', type=int, default=500,
+                               help='内容长度 (默认: 500)')
+    filter_parser.set_defaults(func=bench_filter)
+
+    extract_parser = subparsers.add_parser('extract', help='帖子页提取后端（css / lxml）耗时对比')
+    extract_parser.add_argument('--cache-dir', default=None,
+                                help='已保存页面所在的HTTP缓存数据库或目录 (默认: .scrapy/httpcache/hassbian.sqlite3，不存在时为 .scrapy/httpcache/hassbian)')
+    extract_parser.add_argument('--synthetic', type=int, default=50,
+                                help='额外生成的合成帖子页数量 (默认: 50)')
+    extract_parser.add_argument('--posts', type=int, default=10,
+                                help='合成页面每页楼层数 (默认: 10)')
+    extract_parser.add_argument('--rounds', type=int, default=5,
+                                help='重复轮数 (默认: 5)')
+    extract_parser.set_defaults(func=bench_extract)
+
+    hotness_parser = subparsers.add_parser('hotness', help='固定请求预算下热度优先级带来的新回复数')
+    hotness_parser.add_argument('--threads', type=int, default=2000,
+                                help='合成的列表页帖子数量 (默认: 2000)')
+    hotness_parser.add_argument('--budgets', type=int, nargs='+', default=[100, 500, 2000],
+                                help='请求预算 (默认: 100 500 2000)')
+    hotness_parser.add_argument('--max-replies', type=int, default=20,
+                                help='每个帖子最多抓取的回复数 (默认: 20)')
+    hotness_parser.add_argument('--posts-per-page', type=int, default=10,
+                                help='每页楼层数 (默认: 10)')
+    hotness_parser.add_argument('--scorer', default='forum_spider.scoring.reply_yield',
+                                help='评分函数 (默认: forum_spider.scoring.reply_yield)')
+    hotness_parser.set_defaults(func=bench_hotness)
+
+    aimd_parser = subparsers.add_parser('aimd', help='本地模拟服务器上固定延迟+AutoThrottle与AIMD自适应并发的吞吐量')
+    aimd_parser.add_argument('--requests', type=int, default=60,
+                             help='每种配置请求的页面数 (默认: 60)')
+    aimd_parser.add_argument('--delay', type=float, default=None,
+                             help='DOWNLOAD_DELAY，固定延迟配置使用该值，AIMD从该值开始调整 (默认: settings.py中的值)')
+    aimd_parser.add_argument('--latency', type=float, default=0.3,
+                             help='模拟服务器的基础响应时间（秒） (默认: 0.3)')
+    aimd_parser.add_argument('--capacity', type=int, default=4,
+                             help='模拟服务器不排队的并发数 (默认: 4)')
+    aimd_parser.add_argument('--limit', type=int, default=6,
+                             help='模拟服务器超过该并发数返回429 (默认: 6)')
+    aimd_parser.add_argument('--log-level', default='WARNING',
+                             help='日志级别，INFO 可查看AIMD的每次调整 (默认: WARNING)')
+    aimd_parser.set_defaults(func=bench_aimd)
+
+    httpcache_parser = subparsers.add_parser('httpcache', help='HTTP缓存存储（文件系统 / 压缩SQLite）的读写耗时和磁盘占用')
+    httpcache_parser.add_argument('--pages', type=int, default=2000,
+                                  help='合成帖子页数量 (默认: 2000)')
+    httpcache_parser.add_argument('--posts', type=int, default=10,
+                                  help='每页楼层数 (默认: 10)')
+    httpcache_parser.set_defaults(func=bench_httpcache)
+
+    args = parser.parse_args()
+    args.func(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
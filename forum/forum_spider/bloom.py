@@ -0,0 +1,175 @@
+"""
+可扩展布隆过滤器（Scalable Bloom Filter）
+
+用作已见帖子ID的第一级成员判断：过滤器判定“不存在”时一定不存在，
+判定“存在”时再查询精确的已见集合确认。容量用满时自动追加更大的分片，
+每个分片的误判率按 ratio 收紧，使总误判率不超过 error_rate。
+
+文件格式：魔数 + 头部长度 + JSON头部（分片参数）+ 各分片位数组。
+加载时通过 mmap（写时复制）映射位数组，启动时无需把整个文件读入内存。
+"""
+
+import os
+import json
+import math
+import mmap
+import struct
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SBF1'
+HEADER_LENGTH = struct.Struct('<I')
+
+
+def _hashes(key):
+    """计算双重哈希所需的两个64位哈希值"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+
+class BloomSlice:
+    """固定容量的布隆过滤器分片"""
+
+    def __init__(self, capacity, error_rate, bits=None, count=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, h1, h2):
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def contains(self, h1, h2):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(h1, h2))
+
+    def add(self, h1, h2):
+        bits = self.bits
+        for pos in self._positions(h1, h2):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def fill_error_rate(self):
+        """按当前元素数估算的实际误判率"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    @property
+    def size_bytes(self):
+        return len(self.bits)
+
+
+class ScalableBloomFilter:
+    """按需扩容的布隆过滤器"""
+
+    def __init__(self, error_rate=0.001, initial_capacity=100000, growth=2, ratio=0.9):
+        self.error_rate = error_rate
+        self.initial_capacity = initial_capacity
+        self.growth = growth
+        self.ratio = ratio
+        self.slices = []
+        self.keys_added = 0  # 调用方确认为新键的添加次数，用于校验过滤器与精确集合是否同步
+        self._mmap = None
+        self._view = None
+
+    def __contains__(self, key):
+        h1, h2 = _hashes(key)
+        return any(s.contains(h1, h2) for s in reversed(self.slices))
+
+    def __len__(self):
+        return sum(s.count for s in self.slices)
+
+    def add(self, key):
+        """添加键，返回它此前是否（按过滤器判断）不存在"""
+        self.keys_added += 1
+        h1, h2 = _hashes(key)
+        if any(s.contains(h1, h2) for s in self.slices):
+            return False
+        if not self.slices or self.slices[-1].count >= self.slices[-1].capacity:
+            self._add_slice()
+        self.slices[-1].add(h1, h2)
+        return True
+
+    def _add_slice(self):
+        index = len(self.slices)
+        capacity = self.initial_capacity * (self.growth ** index)
+        # 各分片误判率构成等比数列，总和不超过 error_rate
+        error_rate = self.error_rate * (1 - self.ratio) * (self.ratio ** index)
+        self.slices.append(BloomSlice(capacity, error_rate))
+
+    def metrics(self):
+        """内存和误判率统计"""
+        miss_probability = 1.0
+        for s in self.slices:
+            miss_probability *= 1 - s.fill_error_rate()
+        return {
+            'slices': len(self.slices),
+            'count': len(self),
+            'keys_added': self.keys_added,
+            'capacity': sum(s.capacity for s in self.slices),
+            'memory_bytes': sum(s.size_bytes for s in self.slices),
+            'estimated_error_rate': 1 - miss_probability,
+        }
+
+    def save(self, path):
+        """原子写入文件"""
+        header = json.dumps({
+            'error_rate': self.error_rate,
+            'initial_capacity': self.initial_capacity,
+            'growth': self.growth,
+            'ratio': self.ratio,
+            'keys_added': self.keys_added,
+            'slices': [{'capacity': s.capacity, 'error_rate': s.error_rate, 'count': s.count}
+                       for s in self.slices],
+        }).encode('utf-8')
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(HEADER_LENGTH.pack(len(header)))
+            f.write(header)
+            for s in self.slices:
+                f.write(s.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """以写时复制的mmap加载过滤器，修改只发生在内存中，调用save()才落盘"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        if mapped[:len(MAGIC)] != MAGIC:
+            mapped.close()
+            raise ValueError(f"Not a bloom filter file: {path}")
+        offset = len(MAGIC)
+        (header_length,) = HEADER_LENGTH.unpack_from(mapped, offset)
+        offset += HEADER_LENGTH.size
+        header = json.loads(mapped[offset:offset + header_length])
+        offset += header_length
+
+        bloom = cls(header['error_rate'], header['initial_capacity'], header['growth'], header['ratio'])
+        bloom.keys_added = header.get('keys_added', 0)
+        view = memoryview(mapped)
+        for spec in header['slices']:
+            s = BloomSlice(spec['capacity'], spec['error_rate'], bits=view[offset:], count=spec['count'])
+            s.bits = view[offset:offset + (s.num_bits + 7) // 8]
+            offset += s.size_bytes
+            bloom.slices.append(s)
+        bloom._mmap = mapped
+        bloom._view = view
+        return bloom
+
+    def close(self):
+        """释放mmap映射（位数组复制到内存中，过滤器仍可继续使用）"""
+        if self._mmap is not None:
+            for s in self.slices:
+                if isinstance(s.bits, memoryview):
+                    s.bits = bytearray(s.bits)
+            self._view.release()
+            self._mmap.close()
+            self._view = None
+            self._mmap = None
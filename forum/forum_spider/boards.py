@@ -0,0 +1,67 @@
+"""
+多板块列表页爬取
+
+FORUM_BOARDS 配置要在同一个进程中爬取的板块：板块ID列表，或 板块ID -> 配额 的字典
+（``{'max_pages': 页数, 'max_posts': 新帖子数}``，未写的配额使用 MAX_PAGES / MAX_POSTS_PER_PAGE）。
+各板块的列表页URL由 FORUM_LIST_URL 替换板块ID得到；未配置 FORUM_BOARDS 时只爬取 FORUM_LIST_URL 的板块。
+
+每个板块有独立的列表页消费顺序、帖子配额和完成状态，一个板块配额用满只取消该板块尚未下载的列表页。
+"""
+
+import re
+
+_BOARD_IN_URL = re.compile(r'forum-(\d+)-')
+
+
+class Board:
+    """一个板块的列表页爬取状态"""
+
+    def __init__(self, board_id, list_url_template, max_pages, max_posts):
+        self.board_id = str(board_id)
+        self.list_url_template = list_url_template
+        self.max_pages = max_pages
+        self.max_posts = max_posts
+        self.found_posts_count = 0  # 已选中的新帖子数
+        self.done = False  # 帖子配额已满足或已到末页，ListPageCancelMiddleware据此取消该板块未下载的列表页
+        self.pages_parsed = {}  # 页码 -> 帖子链接列表（下载失败为None），等待按顺序消费
+        self.next_page = 1
+        self.page_timings = {}  # 页码 -> {'latency', 'completed_at', 'links'}
+
+    def list_url(self, page_num):
+        return self.list_url_template.format(page_num)
+
+    @property
+    def forum_id(self):
+        """Discuz的板块ID（fid），板块ID不是数字时为None"""
+        return self.board_id if self.board_id.isdigit() else None
+
+    def __repr__(self):
+        return f"Board({self.board_id}, max_pages={self.max_pages}, max_posts={self.max_posts})"
+
+
+def load_boards(custom_settings):
+    """按 FORUM_BOARDS 创建板块（按配置顺序），未配置时使用 FORUM_LIST_URL 的单个板块"""
+    list_url = custom_settings.get('FORUM_LIST_URL', 'https://bbs.hassbian.com/forum-38-{}.html')
+    max_pages = custom_settings.get('MAX_PAGES', 1)
+    max_posts = custom_settings.get('MAX_POSTS_PER_PAGE', 10)
+
+    board_quotas = custom_settings.get('FORUM_BOARDS')
+    if not board_quotas:
+        match = _BOARD_IN_URL.search(list_url)
+        return [Board(match.group(1) if match else 'default', list_url, max_pages, max_posts)]
+
+    if not _BOARD_IN_URL.search(list_url):
+        raise ValueError(f"FORUM_LIST_URL must contain forum-<id>- to use FORUM_BOARDS: {list_url}")
+    if not isinstance(board_quotas, dict):
+        board_quotas = {board_id: {} for board_id in board_quotas}
+
+    boards = []
+    for board_id, quota in board_quotas.items():
+        quota = quota or {}
+        boards.append(Board(
+            board_id,
+            _BOARD_IN_URL.sub(f'forum-{board_id}-', list_url, count=1),
+            quota.get('max_pages', max_pages),
+            quota.get('max_posts', max_posts),
+        ))
+    return boards
@@ -0,0 +1,106 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedFileWriter:
+    """带写缓冲和文件句柄LRU缓存的文本写入器
+
+    追加内容先进入按文件划分的内存缓冲区，单个文件缓冲超过 flush_bytes、
+    全部缓冲超过 max_buffered_bytes 或距上次刷新超过 flush_interval 秒时才写盘；
+    打开的文件句柄按LRU最多保留 max_open_files 个。
+    """
+
+    def __init__(self, flush_bytes=64 * 1024, flush_interval=5.0, max_open_files=64,
+                 max_buffered_bytes=8 * 1024 * 1024, encoding='utf-8'):
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_open_files = max(1, max_open_files)
+        self.max_buffered_bytes = max_buffered_bytes
+        self.encoding = encoding
+
+        self.buffers = {}  # 文件路径 -> 待写入的文本块
+        self.buffer_sizes = {}  # 文件路径 -> 待写入字符数
+        self.buffered_total = 0
+        self.handles = OrderedDict()  # 文件路径 -> 打开的文件句柄（LRU顺序）
+        self.last_flush = time.monotonic()
+
+        # 统计信息
+        self.append_count = 0
+        self.write_count = 0
+        self.open_count = 0
+
+    def write(self, path, text):
+        """截断文件并立即写入内容（用于初始化文件头部）"""
+        self._discard_buffer(path)
+        handle = self.handles.pop(path, None)
+        if handle:
+            handle.close()
+        handle = self._get_handle(path, 'w')
+        handle.write(text)
+        self.write_count += 1
+
+    def append(self, path, text):
+        """追加内容到文件缓冲区，达到阈值时写盘"""
+        self.buffers.setdefault(path, []).append(text)
+        self.buffer_sizes[path] = self.buffer_sizes.get(path, 0) + len(text)
+        self.buffered_total += len(text)
+        self.append_count += 1
+
+        if self.buffered_total >= self.max_buffered_bytes or \
+                time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+        elif self.buffer_sizes[path] >= self.flush_bytes:
+            self._flush_path(path)
+
+    def flush(self):
+        """把所有缓冲区写入磁盘"""
+        for path in list(self.buffers):
+            self._flush_path(path)
+        for handle in self.handles.values():
+            handle.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        """刷新缓冲并关闭所有文件句柄"""
+        self.flush()
+        while self.handles:
+            _, handle = self.handles.popitem(last=False)
+            handle.close()
+        logger.info(f"Buffered writer closed: {self.append_count} appends, "
+                    f"{self.write_count} writes, {self.open_count} file opens")
+
+    def _flush_path(self, path):
+        chunks = self.buffers.pop(path, None)
+        if not chunks:
+            return
+        self.buffered_total -= self.buffer_sizes.pop(path, 0)
+        handle = self._get_handle(path, 'a')
+        handle.write(''.join(chunks))
+        self.write_count += 1
+
+    def _discard_buffer(self, path):
+        if self.buffers.pop(path, None) is not None:
+            self.buffered_total -= self.buffer_sizes.pop(path, 0)
+
+    def _get_handle(self, path, mode):
+        handle = self.handles.get(path)
+        if handle is not None:
+            self.handles.move_to_end(path)
+            return handle
+
+        # 超出上限时关闭最久未使用的句柄
+        while len(self.handles) >= self.max_open_files:
+            _, old_handle = self.handles.popitem(last=False)
+            old_handle.close()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        handle = open(path, mode, encoding=self.encoding)
+        self.handles[path] = handle
+        self.open_count += 1
+        return handle
@@ -0,0 +1,174 @@
+"""
+每域名自适应并发（AIMD）
+
+AdaptiveConcurrencyMiddleware 替代固定的 DOWNLOAD_DELAY + AutoThrottle，直接调整下载器每个slot
+（按域名或IP）的并发数和下载延迟：
+
+- 每收到 max(AIMD_WINDOW, 当前并发数) 个响应评估一次（约一个“往返”）。窗口内没有错误且平均延迟不超过
+  基线延迟（窗口平均延迟的最小值）的 AIMD_LATENCY_FACTOR 倍时加速：下载延迟大于 AIMD_MIN_DELAY 时先减半，
+  之后并发数加 AIMD_INCREASE（最多 AIMD_MAX_CONCURRENCY）。
+- 429/5xx 响应、下载异常（超时、连接错误）或窗口平均延迟超过上述阈值（且高于 AIMD_LATENCY_FLOOR）时减速：
+  并发数乘以 AIMD_DECREASE_FACTOR；已是 AIMD_MIN_CONCURRENCY 时下载延迟加倍（最多 AIMD_MAX_DELAY）。
+  减速前已发出的请求带回的拥塞信号不再重复减速。
+
+每次调整都写入日志（slot、并发数、延迟、原因），统计项 aimd/* 记录调整次数和最终状态。
+"""
+
+import time
+import logging
+
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveConcurrencyMiddleware:
+    """按slot的加性增、乘性减并发控制"""
+
+    def __init__(self, crawler, start_concurrency=1, min_concurrency=1, max_concurrency=8, increase=1,
+                 decrease_factor=0.5, window=5, min_delay=0.05, max_delay=10.0, latency_factor=2.0,
+                 latency_floor=0.25):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.start_concurrency = start_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.window = window
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+        self.slots = {}  # slot -> {'concurrency', 'delay', 'responses', 'latency_sum', 'baseline', 'decreased_at'}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        custom_settings = crawler.settings.get('CUSTOM_SETTINGS', {})
+        if not custom_settings.get('AIMD_ENABLED', True):
+            raise NotConfigured
+        if crawler.settings.getbool('AUTOTHROTTLE_ENABLED'):
+            logger.warning("AutoThrottle is enabled and will fight AdaptiveConcurrencyMiddleware over download delays")
+        mw = cls(
+            crawler,
+            start_concurrency=custom_settings.get('AIMD_START_CONCURRENCY', 1),
+            min_concurrency=custom_settings.get('AIMD_MIN_CONCURRENCY', 1),
+            max_concurrency=custom_settings.get('AIMD_MAX_CONCURRENCY', 8),
+            increase=custom_settings.get('AIMD_INCREASE', 1),
+            decrease_factor=custom_settings.get('AIMD_DECREASE_FACTOR', 0.5),
+            window=custom_settings.get('AIMD_WINDOW', 5),
+            min_delay=custom_settings.get('AIMD_MIN_DELAY', 0.05),
+            max_delay=custom_settings.get('AIMD_MAX_DELAY', 10.0),
+            latency_factor=custom_settings.get('AIMD_LATENCY_FACTOR', 2.0),
+            latency_floor=custom_settings.get('AIMD_LATENCY_FLOOR', 0.25),
+        )
+        crawler.signals.connect(mw.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def _state(self, key, slot):
+        state = self.slots.get(key)
+        if state is None:
+            # 初始延迟取下载器为该slot设置的值（DOWNLOAD_DELAY）
+            state = self.slots[key] = {
+                'concurrency': self.start_concurrency,
+                'delay': min(max(slot.delay, self.min_delay), self.max_delay),
+                'responses': 0,
+                'latency_sum': 0.0,
+                'baseline': None,
+                'decreased_at': 0.0,
+            }
+        return state
+
+    def _slot(self, request):
+        key = request.meta.get('download_slot')
+        if key is None:
+            return None, None
+        return key, self.crawler.engine.downloader.slots.get(key)
+
+    def request_reached_downloader(self, request, spider):
+        # 此时下载器已为请求分配slot，尚未开始下载
+        key, slot = self._slot(request)
+        if slot is None:
+            return
+        state = self._state(key, slot)
+        slot.concurrency = state['concurrency']
+        slot.delay = state['delay']
+        request.meta['aimd_sent'] = time.monotonic()
+
+    def process_response(self, request, response, spider):
+        if 'cached' in response.flags:
+            return response
+        key, slot = self._slot(request)
+        if slot is None or key not in self.slots:
+            return response
+        state = self.slots[key]
+        if response.status == 429 or response.status >= 500:
+            self._decrease(key, slot, state, request, f"HTTP {response.status}")
+            return response
+
+        latency = request.meta.get('download_latency')
+        if latency is None:
+            return response
+        state['responses'] += 1
+        state['latency_sum'] += latency
+        if state['responses'] >= max(self.window, state['concurrency']):
+            self._evaluate(key, slot, state, request)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if isinstance(exception, IgnoreRequest):
+            return None
+        key, slot = self._slot(request)
+        if slot is not None and key in self.slots:
+            self._decrease(key, slot, self.slots[key], request, exception.__class__.__name__)
+        return None
+
+    def _evaluate(self, key, slot, state, request):
+        mean = state['latency_sum'] / state['responses']
+        state['responses'] = 0
+        state['latency_sum'] = 0.0
+        baseline = state['baseline']
+        if baseline is not None and mean > self.latency_floor and mean > baseline * self.latency_factor:
+            self._decrease(key, slot, state, request, f"latency {mean * 1000:.0f}ms > {self.latency_factor:g}x baseline {baseline * 1000:.0f}ms")
+            return
+        state['baseline'] = mean if baseline is None else min(baseline, mean)
+
+        old_concurrency, old_delay = state['concurrency'], state['delay']
+        if state['delay'] > self.min_delay:
+            delay = state['delay'] / 2
+            state['delay'] = self.min_delay if delay < max(self.min_delay, 0.05) else delay
+        else:
+            state['concurrency'] = min(self.max_concurrency, state['concurrency'] + self.increase)
+        if (state['concurrency'], state['delay']) == (old_concurrency, old_delay):
+            return
+        self.stats.inc_value('aimd/increases')
+        self._apply(key, slot, state, old_concurrency, old_delay, f"healthy window, mean latency {mean * 1000:.0f}ms")
+
+    def _decrease(self, key, slot, state, request, reason):
+        # 上次减速前发出的请求反映的是旧的并发数，不再重复减速
+        if request.meta.get('aimd_sent', 0.0) < state['decreased_at']:
+            return
+        old_concurrency, old_delay = state['concurrency'], state['delay']
+        if state['concurrency'] > self.min_concurrency:
+            state['concurrency'] = max(self.min_concurrency, int(state['concurrency'] * self.decrease_factor))
+        else:
+            state['delay'] = min(self.max_delay, max(state['delay'] * 2, 0.5))
+        state['decreased_at'] = time.monotonic()
+        state['responses'] = 0
+        state['latency_sum'] = 0.0
+        self.stats.inc_value('aimd/decreases')
+        self._apply(key, slot, state, old_concurrency, old_delay, reason)
+
+    def _apply(self, key, slot, state, old_concurrency, old_delay, reason):
+        slot.concurrency = state['concurrency']
+        slot.delay = state['delay']
+        self.stats.max_value('aimd/max_concurrency', state['concurrency'])
+        logger.info(f"AIMD {key}: concurrency {old_concurrency} -> {state['concurrency']}, "
+                    f"delay {old_delay:.2f}s -> {state['delay']:.2f}s ({reason})")
+
+    def spider_closed(self, spider, reason):
+        for key, state in self.slots.items():
+            self.stats.set_value(f'aimd/{key}/concurrency', state['concurrency'])
+            self.stats.set_value(f'aimd/{key}/delay', round(state['delay'], 3))
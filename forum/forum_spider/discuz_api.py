@@ -0,0 +1,120 @@
+"""
+Discuz X 移动端 JSON API
+
+``api/mobile/index.php?version=4&module=forumdisplay`` 返回主题列表，``module=viewthread``
+返回帖子和一页回复，响应体比HTML页面小得多，也不需要解析DOM。
+
+响应格式（只列出用到的字段）::
+
+    {"Variables": {"forum_threadlist": [{"tid", "replies", "lastpost", "dblastpost", ...}],
+                   "thread": {"tid", "subject", "author", "views", "replies", ...},
+                   "postlist": [{"pid", "first", "author", "dateline", "message", ...}],
+                   "ppp": "10", ...},
+     "Message": {"messageval": "...", "messagestr": "..."}}
+
+站点关闭了移动端API、需要登录或帖子不存在时没有 Variables（或只有 Message），
+此时 variables() 返回None，由爬虫回退到HTML页面。
+"""
+
+import re
+import json
+import html
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode, urljoin
+
+API_PATH = 'api/mobile/index.php'
+API_VERSION = 4
+
+# Discuz 按站点时区显示时间，数据库时间戳按北京时间格式化，与HTML页面一致
+FORUM_TIMEZONE = timezone(timedelta(hours=8))
+
+_TAG = re.compile(r'<[^>]+>')
+_TITLE_ATTR = re.compile(r'title="([^"]+)"')
+
+
+def api_url(base_url, module, **params):
+    query = urlencode({'version': API_VERSION, 'module': module, **params})
+    return urljoin(base_url.rstrip('/') + '/', f'{API_PATH}?{query}')
+
+
+def forumdisplay_url(base_url, fid, page):
+    return api_url(base_url, 'forumdisplay', fid=fid, page=page)
+
+
+def viewthread_url(base_url, tid, page):
+    return api_url(base_url, 'viewthread', tid=tid, page=page)
+
+
+def variables(response):
+    """API响应中的 Variables；不是JSON或没有所需数据时返回None"""
+    try:
+        data = json.loads(response.text)
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get('Variables'), dict):
+        return None
+    result = data['Variables']
+    if 'forum_threadlist' not in result and 'postlist' not in result:
+        return None
+    return result
+
+
+def message_of(response):
+    """API返回的提示信息（如需要登录、帖子不存在），用于日志"""
+    try:
+        message = json.loads(response.text).get('Message') or {}
+    except (ValueError, AttributeError):
+        return None
+    return message.get('messageval') or message.get('messagestr')
+
+
+def to_int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def text_of(value):
+    """API字段中的HTML转为纯文本（去标签、反转义实体）"""
+    if not value:
+        return ''
+    return html.unescape(_TAG.sub(' ', value)).strip()
+
+
+def format_timestamp(timestamp):
+    """数据库时间戳格式化为Discuz页面上的时间格式（如 2025-8-1 12:05）"""
+    moment = datetime.fromtimestamp(to_int(timestamp), FORUM_TIMEZONE)
+    return f"{moment.year}-{moment.month}-{moment.day} {moment.hour:02d}:{moment.minute:02d}"
+
+
+def display_time(value, timestamp=None):
+    """显示时间：优先使用数据库时间戳，其次是 span 的 title（近期时间显示为“3 天前”），最后是纯文本"""
+    if to_int(timestamp):
+        return format_timestamp(timestamp)
+    match = _TITLE_ATTR.search(value or '')
+    if match:
+        return html.unescape(match.group(1))
+    return text_of(value) or None
+
+
+def thread_list(variables):
+    """主题列表：[(帖子ID, 回复数, 最后回复时间, 查看数)]"""
+    threads = []
+    for thread in variables.get('forum_threadlist') or []:
+        tid = str(thread.get('tid') or '')
+        if tid.isdigit():
+            threads.append((tid, to_int(thread.get('replies'), None),
+                            display_time(thread.get('lastpost'), thread.get('dblastpost')),
+                            to_int(thread.get('views'), None)))
+    return threads
+
+
+def posts_per_page(variables, default):
+    return to_int(variables.get('ppp'), default) or default
+
+
+def total_pages(variables, per_page):
+    """按主题回复数计算总页数（第1楼为主帖）"""
+    replies = to_int((variables.get('thread') or {}).get('replies'))
+    return max(1, -(-(replies + 1) // per_page))
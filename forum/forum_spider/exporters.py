@@ -0,0 +1,182 @@
+"""
+导出目标（Sink）
+
+ExportPipeline 把每个item只转换一次为普通dict记录，再依次交给 EXPORT_SINKS
+中配置的各个导出目标。自定义导出目标继承 ExportSink 并实现 write() 即可；
+有写缓冲的导出目标实现 flush()，断点续爬的检查点时调用，从断点恢复时（frontier.resuming）追加到已有的输出。
+"""
+
+import os
+import csv
+import logging
+
+from forum_spider.items import PostItem, ReplyItem
+from forum_spider.frontier import resuming
+from forum_spider.jsonl import JsonLinesWriter, jsonl_to_json
+from forum_spider.storage import SqliteStore
+
+logger = logging.getLogger(__name__)
+
+# item类型 -> 输出文件/表名
+RECORD_NAMES = {
+    'PostItem': 'posts',
+    'ReplyItem': 'replies',
+}
+
+RECORD_FIELDS = {
+    'PostItem': list(PostItem.fields),
+    'ReplyItem': list(ReplyItem.fields),
+}
+
+
+def output_dir_for(spider):
+    """获取并创建输出目录"""
+    output_dir = spider.settings.get('CUSTOM_SETTINGS', {}).get('OUTPUT_DIR', 'output')
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    return output_dir
+
+
+class ExportSink:
+    """导出目标基类"""
+
+    name = 'sink'
+
+    def open(self, spider):
+        pass
+
+    def write(self, item_type, record):
+        raise NotImplementedError
+
+    def flush(self):
+        """把缓冲的记录写入磁盘（检查点）"""
+        pass
+
+    def close(self, spider):
+        pass
+
+
+class JsonLinesSink(ExportSink):
+    """JSON Lines 流式导出，结束时可生成旧版JSON数组文件"""
+
+    name = 'jsonl'
+
+    def __init__(self, compression=None, legacy_export=None):
+        self.compression = compression
+        self.legacy_export = legacy_export
+        self.output_dir = None
+        self.writers = {}
+
+    def open(self, spider):
+        custom_settings = spider.settings.get('CUSTOM_SETTINGS', {})
+        self.output_dir = output_dir_for(spider)
+        if self.compression is None:
+            self.compression = custom_settings.get('JSONL_COMPRESSION')
+        if self.legacy_export is None:
+            self.legacy_export = custom_settings.get('JSON_LEGACY_EXPORT', True)
+
+        append = resuming(spider.crawler)
+        for item_type, name in RECORD_NAMES.items():
+            self.writers[item_type] = JsonLinesWriter(
+                os.path.join(self.output_dir, f'{name}.jsonl'),
+                compression=self.compression,
+                flush_every=custom_settings.get('JSONL_FLUSH_EVERY', 100),
+                flush_interval=custom_settings.get('JSONL_FLUSH_INTERVAL', 5.0),
+                append=append,
+            )
+
+    def write(self, item_type, record):
+        writer = self.writers.get(item_type)
+        if writer:
+            writer.write(record)
+
+    def flush(self):
+        for writer in self.writers.values():
+            writer.flush()
+
+    def close(self, spider):
+        for item_type, writer in self.writers.items():
+            writer.close()
+            if self.legacy_export:
+                jsonl_to_json(writer.path, os.path.join(self.output_dir, f'{RECORD_NAMES[item_type]}.json'))
+
+
+class CsvSink(ExportSink):
+    """CSV导出，帖子和回复分别写入 posts.csv / replies.csv"""
+
+    name = 'csv'
+
+    def __init__(self):
+        self.files = {}
+        self.writers = {}
+
+    def open(self, spider):
+        output_dir = output_dir_for(spider)
+        mode = 'a' if resuming(spider.crawler) else 'w'
+        for item_type, name in RECORD_NAMES.items():
+            f = open(os.path.join(output_dir, f'{name}.csv'), mode, newline='', encoding='utf-8')
+            writer = csv.DictWriter(f, fieldnames=RECORD_FIELDS[item_type])
+            if f.tell() == 0:
+                writer.writeheader()
+            self.files[item_type] = f
+            self.writers[item_type] = writer
+
+    def write(self, item_type, record):
+        writer = self.writers.get(item_type)
+        if writer:
+            writer.writerow(record)
+
+    def flush(self):
+        for f in self.files.values():
+            f.flush()
+
+    def close(self, spider):
+        for f in self.files.values():
+            f.close()
+
+
+class TxtSink(ExportSink):
+    """按论坛目录结构输出的TXT文件（复用 TxtWriterPipeline 的写入逻辑）"""
+
+    name = 'txt'
+
+    def __init__(self):
+        # 延迟导入，避免与pipelines模块循环引用
+        from forum_spider.pipelines import TxtWriterPipeline
+        self.pipeline = TxtWriterPipeline()
+
+    def open(self, spider):
+        # 包装的 TxtWriterPipeline 在 open_spider 中自行连接检查点信号
+        self.pipeline.open_spider(spider)
+
+    def write(self, item_type, record):
+        if item_type == 'PostItem':
+            self.pipeline._save_post_as_txt(record)
+        elif item_type == 'ReplyItem':
+            self.pipeline._append_reply_to_txt(record)
+
+    def close(self, spider):
+        self.pipeline.close_spider(spider)
+
+
+class SqliteSink(ExportSink):
+    """SQLite导出（WAL模式、批量upsert，见 forum_spider.storage）"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=None):
+        self.path = path
+        self.store = None
+
+    def open(self, spider):
+        self.store = SqliteStore.from_spider(spider, self.path)
+        self.store.open()
+
+    def write(self, item_type, record):
+        self.store.add(item_type, record)
+
+    def flush(self):
+        self.store.flush()
+
+    def close(self, spider):
+        self.store.close()
@@ -0,0 +1,171 @@
+"""
+单次遍历的帖子页提取（lxml后端）
+
+默认的 css 后端对每个字段、每个楼层都单独执行一次CSS选择器：每次调用都要翻译选择器、
+从头扫描文档或楼层子树，并为每个结果创建 Selector 对象。ThreadPageExtractor 复用 Scrapy
+已经解析好的 lxml 树，用预编译的XPath在C层面遍历一次文档取出楼层元素（id 以 post_ 开头）
+和主帖相关节点，再对每个楼层遍历一次子树，取出作者、时间、正文等候选节点后在Python中按
+class/id 分类。结果与 css 后端各字段的首选选择器一致。
+
+首选选择器没有取到的字段由爬虫回退到 css 后端的后备选择器链。
+"""
+
+from lxml import etree
+
+# 含有这些 class 片段或 id 前缀（post_、postmessage_、postauthor）的元素才可能影响提取结果，
+# 其余元素在C层面跳过；先用 [@class or @id] 排除没有属性的元素，避免对每个元素做字符串比较
+_CANDIDATE = ("contains(@class, 'authi') or contains(@class, 'post') or contains(@class, 't_msgfont')"
+              " or starts-with(@id, 'post')")
+
+_DOCUMENT_NODES = etree.XPath(f"descendant::*[@class or @id][{_CANDIDATE} or @id = 'thread_subject']")
+_BLOCK_NODES = etree.XPath(f"descendant-or-self::*[@class or @id][{_CANDIDATE}]")
+
+
+def _direct_texts(element):
+    """元素的直接文本节点，等价于 ``::text``"""
+    texts = [] if element.text is None else [element.text]
+    texts.extend(child.tail for child in element if child.tail is not None)
+    return texts
+
+
+def _first_text(elements):
+    """所有元素的直接文本节点中的第一个，等价于 ``css('...::text').get()``"""
+    for element in elements:
+        if element.text is not None:
+            return element.text
+        for child in element:
+            if child.tail is not None:
+                return child.tail
+    return None
+
+
+def _is_first_child(element):
+    """等价于CSS的 :first-child（前面没有兄弟元素，注释等非元素节点不算）"""
+    previous = element.getprevious()
+    while previous is not None and not isinstance(previous.tag, str):
+        previous = previous.getprevious()
+    return previous is None
+
+
+def _has_class_ancestor(element, class_name, scope):
+    """element 在 scope 范围内（含 scope 本身）是否有带 class_name 的祖先"""
+    if element is scope:
+        return False
+    for ancestor in element.iterancestors():
+        if class_name in (ancestor.get('class') or '').split():
+            return True
+        if ancestor is scope:
+            break
+    return False
+
+
+class _Nodes:
+    """一个范围（整个文档或一个楼层）内按 class/id 分类的候选节点，均按文档顺序"""
+
+    __slots__ = ('blocks', 'subject', 'authi', 'postauthor', 'postauthor_id', 'postinfo', 'postmessage',
+                 't_msgfont', 'message_id')
+
+    def __init__(self, nodes):
+        self.blocks = []  # id 以 post_ 开头（楼层）
+        self.subject = []
+        self.authi = []
+        self.postauthor = []
+        self.postauthor_id = []
+        self.postinfo = []
+        self.postmessage = []
+        self.t_msgfont = []
+        self.message_id = []  # id 以 postmessage_ 开头
+        for node in nodes:
+            element_id = node.get('id')
+            if element_id:
+                if element_id.startswith('postmessage_'):
+                    self.message_id.append(node)
+                elif element_id.startswith('postauthor'):
+                    self.postauthor_id.append(node)
+                elif element_id.startswith('post_'):
+                    self.blocks.append(node)
+                elif element_id == 'thread_subject':
+                    self.subject.append(node)
+            class_attr = node.get('class')
+            if class_attr:
+                classes = class_attr.split()
+                if 'authi' in classes:
+                    self.authi.append(node)
+                if 'postauthor' in classes:
+                    self.postauthor.append(node)
+                if 'postinfo' in classes:
+                    self.postinfo.append(node)
+                if 'postmessage' in classes:
+                    self.postmessage.append(node)
+                if 't_msgfont' in classes:
+                    self.t_msgfont.append(node)
+
+    @staticmethod
+    def descendant_text(containers, tag):
+        """容器内第一个 tag 元素的第一个直接文本节点，等价于 ``css('.容器 tag::text').get()``
+
+        容器按文档顺序排列，嵌套容器的后代已包含在外层容器中，因此依次查找即按文档顺序。
+        """
+        for container in containers:
+            text = _first_text(container.iterdescendants(tag))
+            if text is not None:
+                return text
+        return None
+
+    def postinfo_texts(self):
+        return [text for element in self.postinfo for text in _direct_texts(element)]
+
+
+class ThreadPageExtractor:
+    """一次遍历收集帖子页的主帖字段和各楼层字段"""
+
+    def __init__(self, root):
+        self.document = _Nodes(_DOCUMENT_NODES(root))
+        self.blocks = self.document.blocks  # 楼层元素，按文档顺序
+
+    @classmethod
+    def from_response(cls, response):
+        """复用 response.selector 已解析的文档树，不重复解析"""
+        return cls(response.selector.root)
+
+    def post_fields(self):
+        """主帖字段（各字段首选选择器的结果，取不到为None）"""
+        document = self.document
+        content = None
+        first_message = next((element for element in document.message_id if _is_first_child(element)), None)
+        if first_message is not None:
+            texts = [text.strip() for text in first_message.itertext()]
+            content = ' '.join([text for text in texts if text]) or None
+        return {
+            'title': _first_text(document.subject),  # '#thread_subject::text'
+            'author': _Nodes.descendant_text(document.authi, 'a'),  # '.authi a::text'
+            'post_time': _Nodes.descendant_text(document.authi, 'em'),  # '.authi em::text'
+            'content': content,  # '[id^="postmessage_"]:first-child'
+            'stats_text': ' '.join(document.postinfo_texts()),  # '.postinfo::text'
+        }
+
+    def reply_fields(self, block):
+        """一个楼层的作者、时间、正文和楼层ID，与 css 后端的回复提取规则一致"""
+        nodes = _Nodes(_BLOCK_NODES(block))
+
+        # 正文选择器顺序：'.postcontent .postmessage', '.t_msgfont', '[id^="postmessage_"]', '.postbody .postmessage'
+        content = None
+        for elements in (
+                [element for element in nodes.postmessage if _has_class_ancestor(element, 'postcontent', block)],
+                nodes.t_msgfont,
+                nodes.message_id,
+                [element for element in nodes.postmessage if _has_class_ancestor(element, 'postbody', block)]):
+            if elements:
+                content = ' '.join(text for element in elements for text in element.itertext())
+                break
+
+        reply_time = _Nodes.descendant_text(nodes.authi, 'em')
+        return {
+            'author': _Nodes.descendant_text(nodes.postauthor, 'a') or
+                      _Nodes.descendant_text(nodes.authi, 'a') or
+                      _Nodes.descendant_text(nodes.postauthor_id, 'a'),
+            'reply_time': reply_time,
+            'postinfo_texts': [] if reply_time else nodes.postinfo_texts(),
+            'content': content,
+            'reply_id': block.get('id'),
+        }
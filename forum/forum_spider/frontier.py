@@ -0,0 +1,372 @@
+"""
+可断点续爬的持久化请求队列（crawl frontier）
+
+FrontierScheduler 替代 Scrapy 默认的内存调度器，把待下载的请求（含优先级）、已调度请求的指纹和爬虫状态
+保存在输出目录下的SQLite数据库中（FRONTIER_DB，每个爬虫一个文件）。进程被杀死后重新运行同一爬虫，
+从上一个检查点继续，只重新下载当时还在下载或处理中的请求：
+
+- requests 表：每个请求一行（request.to_dict() 序列化），状态为 pending（等待下载）/ inflight（已交给下载器）/
+  done（回调的结果已全部处理）。按优先级从高到低出队，同一优先级后入先出（与Scrapy默认队列一致）。
+  重试、拦截页重新入队等同一请求的副本沿用原来的行（meta['frontier_id']）。
+  非 dont_filter 请求的指纹已在表中时直接过滤（代替 RFPDupeFilter，跨断点有效）。
+- 检查点：每 FRONTIER_CHECKPOINT_INTERVAL 秒、且没有回调正在产出结果时，先发送 frontier_checkpoint 信号
+  让各Pipeline把缓冲的输出写入磁盘，再提交爬虫的已见集合（spider.seen_store），最后把爬虫状态
+  （spider.frontier_state()，如各板块的 found_posts_count、重组中的回复页）和请求表在同一个事务中提交。
+- 恢复：上次运行没有正常结束时，inflight 的请求改回 pending，爬虫状态交给 spider.restore_frontier_state()，
+  输出文件改为追加（resuming()）。上次检查点之后已写出的记录恢复后会再写一次（至少一次），
+  SqliteSink 按主键upsert不受影响。以errback结束的请求（下载失败、被取消）保持 inflight，恢复时重新下载。
+
+FRONTIER_ENABLED 为False时使用Scrapy默认调度器；FRONTIER_RESUME 为False（run.py --fresh）时丢弃上次的状态。
+"""
+
+import os
+import pickle
+import sqlite3
+import logging
+
+from scrapy import Request
+from scrapy.core.scheduler import BaseScheduler, Scheduler
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.request import request_from_dict
+from twisted.internet import task
+
+logger = logging.getLogger(__name__)
+
+FRONTIER_ID_KEY = 'frontier_id'
+
+# 检查点信号：Pipeline和导出目标收到后把缓冲的输出写入磁盘
+frontier_checkpoint = object()
+
+PENDING = 'pending'
+INFLIGHT = 'inflight'
+DONE = 'done'
+
+# 只在本进程的一次下载中有意义的meta（下载中间件设置、下载结束时清除），恢复上次运行的请求时去掉
+RUN_LOCAL_META = ('list_page_admitted', 'proxy_pool_active', 'aimd_sent', 'download_latency')
+# 代理池分配的代理（本次运行的代理列表可能不同），恢复时重新分配
+PROXY_POOL_META = ('proxy', 'proxy_pool', 'download_slot')
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS requests (
+        id INTEGER PRIMARY KEY,
+        fingerprint TEXT,
+        priority INTEGER NOT NULL,
+        state TEXT NOT NULL,
+        restored INTEGER NOT NULL DEFAULT 0,
+        data BLOB
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_requests_fingerprint ON requests (fingerprint)",
+    "CREATE INDEX IF NOT EXISTS idx_requests_queue ON requests (state, priority, id)",
+    "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB NOT NULL)",
+]
+
+
+def frontier_enabled(settings):
+    return settings.get('CUSTOM_SETTINGS', {}).get('FRONTIER_ENABLED', True)
+
+
+def resuming(crawler):
+    """本次运行是否从断点恢复（输出文件应追加而不是覆盖）"""
+    frontier = getattr(crawler, 'frontier', None)
+    return frontier is not None and frontier.resumed
+
+
+def connect_checkpoint(crawler, handler):
+    """断点续爬开启时把handler连接到检查点信号"""
+    if getattr(crawler, 'frontier', None) is not None:
+        crawler.signals.connect(handler, signal=frontier_checkpoint)
+
+
+def disconnect_checkpoint(crawler, handler):
+    if getattr(crawler, 'frontier', None) is not None:
+        crawler.signals.disconnect(handler, signal=frontier_checkpoint)
+
+
+class FrontierScheduler(BaseScheduler):
+    """SQLite持久化的调度器（SCHEDULER）"""
+
+    def __init__(self, crawler, path, resume=True, checkpoint_interval=10.0):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.fingerprinter = crawler.request_fingerprinter
+        self.path = path
+        self.resume = resume
+        self.checkpoint_interval = checkpoint_interval
+        self.conn = None
+        self.spider = None
+        self.resumed = False
+        self.pending = 0
+        self.unserializable = {}  # 行ID -> 无法序列化的请求（只在内存中，不能恢复）
+        self.processing = 0  # 正在产出结果的回调数
+        self.checkpoint_due = False
+        self.checkpoint_task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not frontier_enabled(crawler.settings):
+            return Scheduler.from_crawler(crawler)
+        custom_settings = crawler.settings.get('CUSTOM_SETTINGS', {})
+        output_dir = custom_settings.get('OUTPUT_DIR', 'output')
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        db_name = custom_settings.get('FRONTIER_DB', 'frontier_{spider}.db').format(spider=crawler.spider.name)
+        scheduler = cls(
+            crawler,
+            os.path.join(output_dir, db_name),
+            resume=custom_settings.get('FRONTIER_RESUME', True),
+            checkpoint_interval=custom_settings.get('FRONTIER_CHECKPOINT_INTERVAL', 10.0),
+        )
+        # FrontierMiddleware 和输出Pipeline通过 crawler.frontier 访问
+        crawler.frontier = scheduler
+        return scheduler
+
+    def open(self, spider):
+        self.spider = spider
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self.conn.execute(statement)
+        self.conn.commit()
+
+        status = self._get('status')
+        if status == 'running' and self.resume:
+            self._restore(spider)
+        else:
+            if status == 'running':
+                logger.info(f"Discarding the unfinished crawl in {self.path} (FRONTIER_RESUME is off)")
+            self.conn.execute("DELETE FROM requests")
+            self.conn.execute("DELETE FROM state")
+        self._set('status', 'running')
+        self.conn.commit()
+
+        self.checkpoint_task = task.LoopingCall(self.request_checkpoint)
+        self.checkpoint_task.start(self.checkpoint_interval, now=False)
+
+    def _restore(self, spider):
+        """上次运行中断：inflight 的请求重新下载，恢复爬虫状态"""
+        lost = self.conn.execute("DELETE FROM requests WHERE data IS NULL AND state != ?", (DONE,)).rowcount
+        refetch = self.conn.execute("UPDATE requests SET state = ? WHERE state = ?", (PENDING, INFLIGHT)).rowcount
+        self.conn.execute("UPDATE requests SET restored = 1 WHERE state = ?", (PENDING,))
+        self.pending = self.conn.execute("SELECT COUNT(*) FROM requests WHERE state = ?", (PENDING,)).fetchone()[0]
+        done = self.conn.execute("SELECT COUNT(*) FROM requests WHERE state = ?", (DONE,)).fetchone()[0]
+
+        spider_state = self._get('spider')
+        if spider_state is not None and hasattr(spider, 'restore_frontier_state'):
+            spider.restore_frontier_state(spider_state)
+        self.resumed = True
+
+        self.stats.set_value('frontier/resumed_pending', self.pending)
+        self.stats.set_value('frontier/resumed_refetch', refetch)
+        if lost:
+            self.stats.set_value('frontier/resumed_lost', lost)
+        logger.info(f"Resuming crawl from {self.path}: {done} requests done, {self.pending} pending "
+                    f"({refetch} were in flight and will be fetched again"
+                    f"{f', {lost} could not be saved and are lost' if lost else ''})")
+
+    def close(self, reason):
+        if self.conn is None:
+            return
+        if self.checkpoint_task is not None and self.checkpoint_task.running:
+            self.checkpoint_task.stop()
+        if self.processing:
+            # 仍有回调没有处理完，回到上一个检查点
+            logger.warning(f"{self.processing} callbacks still running at close, keeping the last checkpoint")
+            self.conn.rollback()
+        else:
+            self.checkpoint(final=True)
+        if reason == 'finished':
+            self._set('status', 'finished')
+            self.conn.commit()
+        else:
+            logger.info(f"Crawl closed ({reason}) with {self.pending} pending requests, "
+                        f"run again to resume from {self.path}")
+        self.stats.set_value('frontier/pending_at_close', self.pending)
+        self.conn.close()
+        self.conn = None
+
+    def has_pending_requests(self):
+        return self.pending > 0
+
+    def __len__(self):
+        return self.pending
+
+    def enqueue_request(self, request):
+        row_id = request.meta.get(FRONTIER_ID_KEY)
+        if row_id is not None:
+            # 重试等同一请求的副本：更新原来的行
+            row = self.conn.execute("SELECT state FROM requests WHERE id = ?", (row_id,)).fetchone()
+            if row is None:
+                row_id = None
+            elif row[0] == PENDING:
+                self.pending -= 1
+        if row_id is None:
+            fingerprint = None
+            if not request.dont_filter:
+                fingerprint = self.fingerprinter.fingerprint(request).hex()
+                if self.conn.execute("SELECT 1 FROM requests WHERE fingerprint = ? LIMIT 1", (fingerprint,)).fetchone():
+                    self.stats.inc_value('dupefilter/filtered')
+                    logger.debug(f"Filtered duplicate request: {request}")
+                    return False
+            row_id = self.conn.execute("INSERT INTO requests (fingerprint, priority, state) VALUES (?, ?, ?)",
+                                       (fingerprint, request.priority, PENDING)).lastrowid
+            request.meta[FRONTIER_ID_KEY] = row_id
+
+        data = self._serialize(request)
+        if data is None:
+            self.unserializable[row_id] = request
+        self.conn.execute("UPDATE requests SET priority = ?, state = ?, restored = 0, data = ? WHERE id = ?",
+                          (request.priority, PENDING, data, row_id))
+        self.pending += 1
+        self.stats.inc_value('scheduler/enqueued')
+        return True
+
+    def next_request(self):
+        row = self.conn.execute(
+            "SELECT id, restored, data FROM requests WHERE state = ? ORDER BY priority DESC, id DESC LIMIT 1",
+            (PENDING,)).fetchone()
+        if row is None:
+            return None
+        row_id, restored, data = row
+        self.conn.execute("UPDATE requests SET state = ? WHERE id = ?", (INFLIGHT, row_id))
+        self.pending -= 1
+        request = self.unserializable.pop(row_id, None)
+        if request is None:
+            request = request_from_dict(pickle.loads(data), spider=self.spider)
+            request.meta[FRONTIER_ID_KEY] = row_id
+            if restored:
+                self._forget_previous_run(request)
+        self.stats.inc_value('scheduler/dequeued')
+        return request
+
+    def _serialize(self, request):
+        """序列化请求，无法pickle的meta值逐个丢弃；回调不是爬虫方法等无法序列化的请求返回None"""
+        try:
+            data = request.to_dict(spider=self.spider)
+        except ValueError as e:
+            logger.warning(f"Request {request} cannot be saved and will not survive a restart: {e}")
+            self.stats.inc_value('frontier/unserializable')
+            return None
+        data['meta'] = {key: value for key, value in request.meta.items() if key != FRONTIER_ID_KEY}
+        try:
+            return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            pass
+        meta = {}
+        for key, value in data['meta'].items():
+            try:
+                pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                logger.debug(f"Dropping unpicklable meta[{key!r}] of {request} from the saved frontier")
+                self.stats.inc_value('frontier/dropped_meta')
+                continue
+            meta[key] = value
+        data['meta'] = meta
+        try:
+            return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning(f"Request {request} cannot be saved and will not survive a restart: {e}")
+            self.stats.inc_value('frontier/unserializable')
+            return None
+
+    def _forget_previous_run(self, request):
+        for key in RUN_LOCAL_META:
+            request.meta.pop(key, None)
+        if 'proxy_pool' in request.meta:
+            for key in PROXY_POOL_META:
+                request.meta.pop(key, None)
+            request.headers.pop(b'Proxy-Authorization', None)
+
+    def begin(self):
+        """回调开始产出结果（FrontierMiddleware调用）"""
+        self.processing += 1
+
+    def finish(self, row_id, completed):
+        """回调的结果全部处理完（completed为False表示回调抛出异常），请求标记为 done"""
+        self.processing -= 1
+        if completed and row_id is not None and self.conn is not None:
+            self.conn.execute("UPDATE requests SET state = ?, data = NULL WHERE id = ?", (DONE, row_id))
+        if not self.processing and self.checkpoint_due:
+            self.checkpoint()
+
+    def request_checkpoint(self):
+        """定时检查点：有回调正在产出结果时推迟到它们都处理完"""
+        if self.processing:
+            self.checkpoint_due = True
+        else:
+            self.checkpoint()
+
+    def checkpoint(self, final=False):
+        """输出落盘 -> 提交已见集合 -> 保存爬虫状态并提交请求表（final时Pipeline已关闭，不发信号）"""
+        self.checkpoint_due = False
+        if self.conn is None:
+            return
+        if not final:
+            self.crawler.signals.send_catch_log(signal=frontier_checkpoint)
+        seen_store = getattr(self.spider, 'seen_store', None)
+        if seen_store is not None:
+            seen_store.flush()
+        if hasattr(self.spider, 'frontier_state'):
+            self._set('spider', self.spider.frontier_state())
+        self.conn.commit()
+        self.stats.inc_value('frontier/checkpoints')
+
+    def _get(self, key):
+        row = self.conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def _set(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                          (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+
+
+class FrontierMiddleware:
+    """Spider中间件：回调的结果全部处理完后把请求标记为 done；回调新产生的请求不继承响应的 frontier_id"""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not frontier_enabled(crawler.settings):
+            raise NotConfigured
+        return cls(crawler)
+
+    def _detach(self, output, row_id):
+        # 复制 response.meta 或 request.replace() 得到的新请求是另一个请求，入队时新建一行
+        if isinstance(output, Request) and row_id is not None and output.meta.get(FRONTIER_ID_KEY) == row_id:
+            del output.meta[FRONTIER_ID_KEY]
+        return output
+
+    def process_spider_output(self, response, result, spider):
+        frontier = getattr(self.crawler, 'frontier', None)
+        if frontier is None:
+            yield from result
+            return
+        row_id = response.meta.get(FRONTIER_ID_KEY)
+        frontier.begin()
+        completed = False
+        try:
+            for output in result:
+                yield self._detach(output, row_id)
+            completed = True
+        finally:
+            frontier.finish(row_id, completed)
+
+    async def process_spider_output_async(self, response, result, spider):
+        frontier = getattr(self.crawler, 'frontier', None)
+        if frontier is None:
+            async for output in result:
+                yield output
+            return
+        row_id = response.meta.get(FRONTIER_ID_KEY)
+        frontier.begin()
+        completed = False
+        try:
+            async for output in result:
+                yield self._detach(output, row_id)
+            completed = True
+        finally:
+            frontier.finish(row_id, completed)
@@ -0,0 +1,285 @@
+"""
+单文件压缩HTTP缓存（支持条件请求重新验证）
+
+替代 Scrapy 默认的 FilesystemCacheStorage（每个响应6个小文件、过期后整页重新下载）：
+
+- SqliteCacheStorage：所有响应保存在 .scrapy/<HTTPCACHE_DIR>/<爬虫名>.sqlite3 一个文件中（WAL模式），
+  响应体用zstd压缩（未安装 zstandard 时用zlib），服务器已压缩（带 Content-Encoding）的响应体原样保存。
+  数据库超过 HTTPCACHE_MAX_MB 时按最近访问时间淘汰（LRU），淘汰到上限的90%。
+  过期条目不删除，交给策略决定是否重新验证。
+- RevalidatingPolicy：保存时间不超过 HTTPCACHE_EXPIRATION_SECS（0为永不过期）的条目直接命中；
+  过期条目带 If-None-Match / If-Modified-Since（取自缓存的 ETag / Last-Modified）重新请求，
+  服务器返回304时使用缓存的响应并刷新保存时间，返回200时替换缓存条目。
+  反爬虫检测重新入队的请求（meta['antibot_retries']）不使用缓存条目，重新下载的响应覆盖缓存的拦截页。
+  RETRY_HTTP_CODES（429/5xx等）和 HTTPCACHE_IGNORE_HTTP_CODES 的响应不缓存，否则重试时回放缓存的错误页。
+
+统计项：httpcache/hit（直接命中）、httpcache/revalidate（304重新验证）、httpcache/invalidate（内容已变化）
+由 Scrapy 的 HttpCacheMiddleware 记录；本模块增加 httpcache/bytes_saved（命中和304节省的下载字节数）、
+httpcache/conditional（带条件头的请求数）、httpcache/evictions 以及结束时的数据库大小和压缩率。
+"""
+
+import os
+import time
+import zlib
+import sqlite3
+import logging
+
+from scrapy import signals
+from scrapy.extensions.httpcache import DummyPolicy
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，没有时用zlib压缩
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+STORED_AT_KEY = 'cache_timestamp'  # 与Scrapy自带存储一致，retrieve_response 写入 request.meta
+ANTIBOT_RETRY_KEY = 'antibot_retries'  # ResponseValidationMiddleware 重新入队的请求
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    fingerprint TEXT PRIMARY KEY,
+    method TEXT NOT NULL,
+    request_url TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers BLOB NOT NULL,
+    body BLOB NOT NULL,
+    codec TEXT NOT NULL,
+    raw_size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)",
+    "CREATE INDEX IF NOT EXISTS idx_responses_request_url ON responses (method, request_url)",
+]
+
+
+def cache_db_path(settings, spider_name):
+    """爬虫的缓存数据库文件路径"""
+    return os.path.join(data_path(settings.get('HTTPCACHE_DIR', 'httpcache')), f'{spider_name}.sqlite3')
+
+
+def uncached_codes(settings):
+    """不缓存（也不从缓存使用）的状态码：会被重试的响应和 HTTPCACHE_IGNORE_HTTP_CODES"""
+    codes = settings.getlist('HTTPCACHE_IGNORE_HTTP_CODES') + settings.getlist('RETRY_HTTP_CODES')
+    return {int(code) for code in codes}
+
+
+def available_codec(codec):
+    """配置的压缩方式不可用时退回zlib"""
+    if codec == 'zstd' and zstandard is None:
+        return 'zlib'
+    return codec if codec in ('zstd', 'zlib', 'none') else 'zlib'
+
+
+def compress(data, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if codec == 'zlib':
+        return zlib.compress(data, 6)
+    return data
+
+
+def decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Cache entry is zstd-compressed but the 'zstandard' package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    return data
+
+
+class SqliteCacheStorage:
+    """单个SQLite文件的压缩缓存存储（HTTPCACHE_STORAGE）"""
+
+    def __init__(self, settings):
+        custom_settings = settings.get('CUSTOM_SETTINGS', {})
+        self.settings = settings
+        self.codec = available_codec(custom_settings.get('HTTPCACHE_COMPRESSION', 'zstd'))
+        self.max_bytes = int(custom_settings.get('HTTPCACHE_MAX_MB', 512) * 1024 * 1024)
+        self.commit_interval = custom_settings.get('HTTPCACHE_COMMIT_INTERVAL', 5.0)
+        self.uncached_codes = uncached_codes(settings)
+        self.path = None
+        self.conn = None
+        self.stats = None
+        self.fingerprinter = None
+        self.total_bytes = 0  # 所有条目压缩后的大小
+        self.accessed = {}  # 指纹 -> 最近访问时间，提交时批量写入
+        self.last_commit = time.monotonic()
+
+    def open_spider(self, spider):
+        crawler = spider.crawler
+        self.stats = crawler.stats
+        self.fingerprinter = crawler.request_fingerprinter
+        self.path = cache_db_path(self.settings, spider.name)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+        for statement in INDEXES:
+            self.conn.execute(statement)
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(stored_size), 0) FROM responses").fetchone()[0]
+        # 命中和304重新验证的响应不经过下载，按响应体大小计入节省的字节数
+        crawler.signals.connect(self.response_received, signal=signals.response_received)
+        logger.info(f"HTTP cache {self.path}: {self.total_bytes / 1024 / 1024:.1f}MB, codec {self.codec}")
+        if self.total_bytes > self.max_bytes:  # 上限调小后
+            self._evict()
+            self._commit()
+
+    def close_spider(self, spider):
+        if self.conn is None:
+            return
+        self._commit()
+        entries, raw_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_size), 0) FROM responses").fetchone()
+        self.stats.set_value('httpcache/db_entries', entries)
+        self.stats.set_value('httpcache/db_bytes', self.total_bytes)
+        if self.total_bytes:
+            self.stats.set_value('httpcache/compression_ratio', round(raw_bytes / self.total_bytes, 2))
+        self.conn.close()
+        self.conn = None
+
+    def _fingerprint(self, request):
+        return self.fingerprinter.fingerprint(request).hex()
+
+    def retrieve_response(self, spider, request):
+        fingerprint = self._fingerprint(request)
+        row = self.conn.execute(
+            "SELECT url, status, headers, body, codec, stored_at FROM responses WHERE fingerprint = ?",
+            (fingerprint,)).fetchone()
+        if row is None:
+            return None
+        url, status, headers, body, codec, stored_at = row
+        body = decompress(body, codec)
+        self.accessed[fingerprint] = time.time()
+        self._maybe_commit()
+        request.meta[STORED_AT_KEY] = stored_at
+        headers = Headers(headers_raw_to_dict(headers))
+        response_cls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return response_cls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider, request, response):
+        fingerprint = self._fingerprint(request)
+        now = time.time()
+        headers = headers_dict_to_raw(response.headers)
+        if 'cached' in response.flags:
+            # 304重新验证后Scrapy保存刷新过响应头的缓存响应，响应体不变，只更新响应头和保存时间
+            self.conn.execute("UPDATE responses SET headers = ?, stored_at = ?, accessed_at = ? WHERE fingerprint = ?",
+                              (headers, now, now, fingerprint))
+            self._maybe_commit()
+            return
+
+        body = response.body
+        # 服务器已压缩的响应体（HttpCompressionMiddleware 在缓存之后才解压）再压缩没有收益
+        codec = 'none' if b'Content-Encoding' in response.headers else self.codec
+        stored = compress(body, codec)
+        stored_size = len(stored) + len(headers)
+        previous = self.conn.execute("SELECT stored_size FROM responses WHERE fingerprint = ?",
+                                     (fingerprint,)).fetchone()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (fingerprint, method, request_url, url, status, headers, body, codec, "
+            "raw_size, stored_size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (fingerprint, request.method, request.url, response.url, response.status, headers, stored, codec,
+             len(body) + len(headers), stored_size, now, now))
+        self.accessed.pop(fingerprint, None)
+        self.total_bytes += stored_size - (previous[0] if previous else 0)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+        self._maybe_commit()
+
+    def _evict(self):
+        """按最近访问时间淘汰条目，直到总大小不超过上限的90%"""
+        self._flush_accessed()
+        target = self.max_bytes * 0.9
+        evicted = evicted_bytes = 0
+        while self.total_bytes > target:
+            rows = self.conn.execute(
+                "SELECT fingerprint, stored_size FROM responses ORDER BY accessed_at LIMIT 100").fetchall()
+            if not rows:
+                break
+            victims = []
+            for fingerprint, stored_size in rows:
+                if self.total_bytes <= target:
+                    break
+                victims.append((fingerprint,))
+                self.total_bytes -= stored_size
+                evicted_bytes += stored_size
+            self.conn.executemany("DELETE FROM responses WHERE fingerprint = ?", victims)
+            evicted += len(victims)
+        self.stats.inc_value('httpcache/evictions', evicted)
+        self.stats.inc_value('httpcache/evicted_bytes', evicted_bytes)
+        logger.info(f"HTTP cache over {self.max_bytes / 1024 / 1024:.0f}MB, evicted {evicted} entries "
+                    f"({evicted_bytes / 1024 / 1024:.1f}MB)")
+
+    def _flush_accessed(self):
+        if self.accessed:
+            self.conn.executemany("UPDATE responses SET accessed_at = ? WHERE fingerprint = ?",
+                                  [(accessed_at, fingerprint) for fingerprint, accessed_at in self.accessed.items()])
+            self.accessed.clear()
+
+    def _maybe_commit(self):
+        if time.monotonic() - self.last_commit >= self.commit_interval:
+            self._commit()
+
+    def _commit(self):
+        self._flush_accessed()
+        self.conn.commit()
+        self.last_commit = time.monotonic()
+
+    def response_received(self, response, request, spider):
+        if b'If-None-Match' in request.headers or b'If-Modified-Since' in request.headers:
+            self.stats.inc_value('httpcache/conditional')
+        if 'cached' not in response.flags or self.conn is None:
+            return
+        if response.status in self.uncached_codes:  # 旧版本缓存的错误页，不算节省
+            return
+        self.stats.inc_value('httpcache/bytes_saved', len(response.body))
+
+
+class RevalidatingPolicy(DummyPolicy):
+    """未过期直接命中，过期后用条件请求重新验证（HTTPCACHE_POLICY）"""
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.expiration_secs = settings.getint('HTTPCACHE_EXPIRATION_SECS')
+        self.uncached_codes = uncached_codes(settings)
+
+    def should_cache_response(self, response, request):
+        # 429/5xx 交给 RetryMiddleware 延迟重试，缓存后重试请求会直接命中缓存的错误页
+        return response.status not in self.uncached_codes
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        if request.meta.get(ANTIBOT_RETRY_KEY):
+            # 缓存的是拦截页（ResponseValidationMiddleware 在缓存之后检查）：不带条件头整页重新下载，新响应覆盖该条目
+            return False
+        if cachedresponse.status in self.uncached_codes:
+            # 旧版本缓存的错误页：整页重新下载
+            return False
+        stored_at = request.meta.get(STORED_AT_KEY)
+        if stored_at is None or not self.expiration_secs or time.time() - stored_at < self.expiration_secs:
+            return True
+        etag = cachedresponse.headers.get(b'ETag')
+        last_modified = cachedresponse.headers.get(b'Last-Modified')
+        if etag:
+            request.headers[b'If-None-Match'] = etag
+        if last_modified:
+            request.headers[b'If-Modified-Since'] = last_modified
+        # 没有验证头的过期条目整页重新下载
+        return False
+
+    def is_cached_response_valid(self, cachedresponse, response, request):
+        # 304时Scrapy刷新缓存响应的响应头并重新保存（store_response 的 cached 分支更新保存时间）
+        return response.status == 304
@@ -62,9 +62,11 @@ class PostItem(scrapy.Item):
         input_processor=MapCompose(clean_text),
         output_processor=TakeFirst()
     )  # 帖子内容
+    matched_rules = scrapy.Field()  # 命中的过滤规则（FilterPipeline 标记模式）
     
     # 爬取信息
     page_num = scrapy.Field()  # 来源页码
+    board_id = scrapy.Field()  # 来源板块ID（FORUM_BOARDS）
     crawl_time = scrapy.Field()  # 爬取时间
 
 
@@ -92,6 +94,8 @@ class ReplyItem(scrapy.Item):
         input_processor=MapCompose(clean_text),
         output_processor=TakeFirst()
     )  # 回复内容
+    duplicate_of = scrapy.Field()  # 内容近似重复的已有回复（post_id_floor_num），由SimHash去重标记
+    matched_rules = scrapy.Field()  # 命中的过滤规则（FilterPipeline 标记模式）
     
     # 爬取信息
     crawl_time = scrapy.Field()  # 爬取时间 
\ No newline at end of file
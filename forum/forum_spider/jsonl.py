@@ -0,0 +1,123 @@
+"""
+JSON Lines 流式输出工具
+
+- JsonLinesWriter: 每条数据到达即写入一行，定期刷新到磁盘，可选gzip/zstd压缩
+- jsonl_to_json: 把JSONL文件转换为旧版的JSON数组文件（posts.json / replies.json）
+
+命令行转换:
+    python -m forum_spider.jsonl output/posts.jsonl output/posts.json
+"""
+
+import gzip
+import json
+import time
+import logging
+import argparse
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，仅在使用zstd压缩时需要
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_SUFFIXES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def compressed_path(path, compression=None):
+    """根据压缩方式返回带后缀的文件路径"""
+    if not compression:
+        return path
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unsupported JSONL compression: {compression}")
+    return path + COMPRESSION_SUFFIXES[compression]
+
+
+def open_jsonl(path, mode='r', compression=None):
+    """以文本模式打开JSONL文件，未指定压缩方式时按文件后缀判断"""
+    if compression is None:
+        for name, suffix in COMPRESSION_SUFFIXES.items():
+            if path.endswith(suffix):
+                compression = name
+                break
+
+    if compression == 'gzip':
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+        return zstandard.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def iter_jsonl(path):
+    """逐条读取JSONL文件中的记录"""
+    with open_jsonl(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def jsonl_to_json(src, dst, indent=2):
+    """流式转换JSONL为JSON数组文件，不把全部记录载入内存，返回记录数"""
+    count = 0
+    pad = ' ' * indent
+    with open(dst, 'w', encoding='utf-8') as out:
+        out.write('[')
+        for record in iter_jsonl(src):
+            text = json.dumps(record, ensure_ascii=False, indent=indent)
+            out.write(',\n' if count else '\n')
+            out.write('\n'.join(pad + line for line in text.split('\n')))
+            count += 1
+        out.write('\n]' if count else ']')
+    return count
+
+
+class JsonLinesWriter:
+    """JSON Lines 流式写入器"""
+
+    def __init__(self, path, compression=None, flush_every=100, flush_interval=5.0, append=False):
+        self.path = compressed_path(path, compression)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        # 断点续爬时追加到上次的输出（gzip/zstd追加为新的压缩帧，读取时连续解压）
+        self.file = open_jsonl(self.path, 'a' if append else 'w', compression)
+        self.count = 0
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+        self.pending += 1
+        if self.pending >= self.flush_every or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.file.close()
+        logger.info(f"JSONL file closed: {self.path} ({self.count} records)")
+
+
+def main():
+    """命令行入口：JSONL -> JSON数组"""
+    parser = argparse.ArgumentParser(description='把JSONL文件转换为JSON数组文件')
+    parser.add_argument('src', help='JSONL文件路径（支持 .gz / .zst）')
+    parser.add_argument('dst', help='输出的JSON文件路径')
+    parser.add_argument('--indent', type=int, default=2, help='缩进空格数 (默认: 2)')
+    args = parser.parse_args()
+
+    count = jsonl_to_json(args.src, args.dst, indent=args.indent)
+    print(f"已转换 {count} 条记录: {args.src} -> {args.dst}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Aho-Corasick 关键词匹配
+
+把关键词表编译成自动机，一次扫描文本即可找出所有命中的关键词，
+耗时与文本长度成正比，与关键词数量无关。
+
+关键词文件格式（UTF-8，每行一条，# 开头为注释）::
+
+    代理
+    加微信	广告
+    淘宝店	广告
+
+每行为 ``关键词`` 或 ``关键词<Tab>规则名``，未写规则名时以关键词本身作为规则名。
+匹配不区分大小写。
+"""
+
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+def load_rules(path):
+    """读取关键词文件，返回 [(关键词, 规则名)]"""
+    rules = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            keyword, _, rule = line.partition('\t')
+            keyword = keyword.strip()
+            if keyword:
+                rules.append((keyword, rule.strip() or keyword))
+    return rules
+
+
+class KeywordAutomaton:
+    """关键词自动机"""
+
+    def __init__(self, rules):
+        self.goto = [{}]  # 状态 -> {字符: 下一状态}
+        self.fail = [0]
+        self.outputs = [()]  # 状态 -> 到达该状态时命中的规则（已合并失败链上的输出）
+        self.size = 0
+
+        for keyword, rule in rules:
+            self._insert(keyword.lower(), rule)
+        self._build_failure_links()
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load_rules(path))
+
+    def __len__(self):
+        return self.size
+
+    def _insert(self, keyword, rule):
+        state = 0
+        for char in keyword:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append(())
+            state = next_state
+        if rule not in self.outputs[state]:
+            self.outputs[state] += (rule,)
+        self.size += 1
+
+    def _build_failure_links(self):
+        """按层次遍历设置失败指针"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                if self.outputs[self.fail[next_state]]:
+                    merged = self.outputs[next_state] + tuple(
+                        rule for rule in self.outputs[self.fail[next_state]]
+                        if rule not in self.outputs[next_state])
+                    self.outputs[next_state] = merged
+
+    def find_rules(self, *texts):
+        """扫描文本，返回命中的规则名集合（多段文本之间不会跨段匹配）"""
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        matched = set()
+        for text in texts:
+            if not text:
+                continue
+            state = 0
+            for char in text.lower():
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                if outputs[state]:
+                    matched.update(outputs[state])
+        return matched
@@ -0,0 +1,310 @@
+"""
+实时爬取指标
+
+LiveMetrics 扩展在爬取过程中按滑动窗口汇总以下指标，并每隔 METRICS_INTERVAL 秒
+写入 Prometheus textfile（供 node_exporter 的 textfile collector 采集）和 JSON 快照：
+
+- 各item类型的每秒条数（以及丢弃数）
+- 下载延迟分位数（p50/p90/p99）
+- 响应字节数/秒
+- 各Pipeline阶段的每条平均耗时（由 pipelines.timed_stage 写入的统计项计算）
+- 调度队列、下载中和处理中的请求数
+
+爬虫关闭时额外写出 statistics.json（替代原 StatisticsPipeline 的结束统计）。
+"""
+
+import os
+import json
+import time
+import logging
+from collections import defaultdict, deque
+from datetime import datetime
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+logger = logging.getLogger(__name__)
+
+LATENCY_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class RollingCounter:
+    """按秒分桶的滑动窗口计数器"""
+
+    def __init__(self, window):
+        self.window = window
+        self.buckets = deque()  # [秒, 计数]
+        self.total = 0
+
+    def add(self, value=1, now=None):
+        second = int(now if now is not None else time.monotonic())
+        if self.buckets and self.buckets[-1][0] == second:
+            self.buckets[-1][1] += value
+        else:
+            self.buckets.append([second, value])
+        self.total += value
+
+    def rate(self, now, elapsed):
+        """窗口内的每秒平均值；运行时间不足一个窗口时按实际运行时间计算"""
+        while self.buckets and self.buckets[0][0] <= now - self.window:
+            self.buckets.popleft()
+        span = min(self.window, elapsed)
+        return sum(count for _, count in self.buckets) / span if span > 0 else 0.0
+
+
+class RollingSamples:
+    """滑动窗口内的样本，用于计算分位数"""
+
+    def __init__(self, window):
+        self.window = window
+        self.samples = deque()  # (时间, 值)
+
+    def add(self, value, now=None):
+        self.samples.append((now if now is not None else time.monotonic(), value))
+
+    def quantiles(self, now, quantiles=LATENCY_QUANTILES):
+        while self.samples and self.samples[0][0] <= now - self.window:
+            self.samples.popleft()
+        if not self.samples:
+            return {}
+        values = sorted(value for _, value in self.samples)
+        # 最近秩法
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in quantiles}
+
+
+class LiveMetrics:
+    """周期性输出滑动窗口爬取指标的扩展"""
+
+    def __init__(self, crawler, output_dir, interval=10.0, window=60.0,
+                 prometheus_file='metrics.prom', json_file='metrics.json', statistics_file='statistics.json'):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.interval = interval
+        self.window = window
+        self.prometheus_path = os.path.join(output_dir, prometheus_file) if prometheus_file else None
+        self.json_path = os.path.join(output_dir, json_file) if json_file else None
+        self.statistics_path = os.path.join(output_dir, statistics_file) if statistics_file else None
+        self.output_dir = output_dir
+
+        self.items = defaultdict(lambda: RollingCounter(window))
+        self.dropped = defaultdict(lambda: RollingCounter(window))
+        self.responses = RollingCounter(window)
+        self.response_bytes = RollingCounter(window)
+        self.latency = RollingSamples(window)
+        self.stage_history = deque()  # (时间, {阶段: (条数, 秒数)})
+
+        self.spider_name = None
+        self.start_time = None
+        self.start_monotonic = None
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        custom_settings = crawler.settings.get('CUSTOM_SETTINGS', {})
+        if not custom_settings.get('METRICS_ENABLED', True):
+            raise NotConfigured
+        ext = cls(
+            crawler,
+            custom_settings.get('OUTPUT_DIR', 'output'),
+            interval=custom_settings.get('METRICS_INTERVAL', 10.0),
+            window=custom_settings.get('METRICS_WINDOW', 60.0),
+            prometheus_file=custom_settings.get('METRICS_PROMETHEUS_FILE', 'metrics.prom'),
+            json_file=custom_settings.get('METRICS_JSON_FILE', 'metrics.json'),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(ext.item_dropped, signal=signals.item_dropped)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        return ext
+
+    def spider_opened(self, spider):
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        self.spider_name = spider.name
+        self.start_time = datetime.now()
+        self.start_monotonic = time.monotonic()
+        self.task = task.LoopingCall(self.write_snapshot)
+        self.task.start(self.interval, now=False)
+        logger.info(f"Live metrics every {self.interval}s (window {self.window}s): "
+                    f"{self.prometheus_path}, {self.json_path}")
+
+    def spider_closed(self, spider, reason):
+        if self.start_time is None:
+            # 爬虫启动失败，spider_opened未执行
+            return
+        if self.task and self.task.running:
+            self.task.stop()
+        snapshot = self.write_snapshot()
+        self._write_statistics(snapshot)
+
+    def item_scraped(self, item, response, spider):
+        self.items[item.__class__.__name__].add()
+
+    def item_dropped(self, item, response, exception, spider):
+        self.dropped[item.__class__.__name__].add()
+
+    def response_received(self, response, request, spider):
+        now = time.monotonic()
+        self.responses.add(now=now)
+        self.response_bytes.add(len(response.body), now=now)
+        # 来自HTTP缓存的响应没有下载延迟
+        latency = request.meta.get('download_latency')
+        if latency is not None:
+            self.latency.add(latency, now=now)
+
+    def snapshot(self):
+        """当前窗口的指标"""
+        now = time.monotonic()
+        elapsed = now - self.start_monotonic
+        item_types = sorted(set(self.items) | set(self.dropped))
+        latency = self.latency.quantiles(now)
+
+        return {
+            'spider': self.spider_name,
+            'timestamp': datetime.now().isoformat(),
+            'uptime_seconds': round(elapsed, 1),
+            'window_seconds': self.window,
+            'items': {
+                item_type: {
+                    'total': self.items[item_type].total,
+                    'per_second': round(self.items[item_type].rate(now, elapsed), 3),
+                    'dropped_total': self.dropped[item_type].total,
+                    'dropped_per_second': round(self.dropped[item_type].rate(now, elapsed), 3),
+                }
+                for item_type in item_types
+            },
+            'download': {
+                'responses_total': self.responses.total,
+                'responses_per_second': round(self.responses.rate(now, elapsed), 3),
+                'bytes_total': self.response_bytes.total,
+                'bytes_per_second': round(self.response_bytes.rate(now, elapsed), 1),
+                'latency_seconds': {f'p{int(q * 100)}': round(value, 4) for q, value in latency.items()},
+                'latency_samples': len(self.latency.samples),
+            },
+            'pipeline': self._stage_metrics(now),
+            'queue': self._queue_depth(),
+        }
+
+    def _stage_metrics(self, now):
+        """各Pipeline阶段在窗口内的平均耗时（统计项快照之差）"""
+        current = {}
+        for key, value in self.stats.get_stats().items():
+            if key.startswith('pipeline/') and key.endswith('/seconds'):
+                stage = key[len('pipeline/'):-len('/seconds')]
+                current[stage] = (self.stats.get_value(f'pipeline/{stage}/items', 0), value)
+
+        self.stage_history.append((now, current))
+        # 保留一个不晚于窗口起点的快照作为基准
+        while len(self.stage_history) > 1 and self.stage_history[1][0] <= now - self.window:
+            self.stage_history.popleft()
+        baseline = self.stage_history[0][1] if len(self.stage_history) > 1 else {}
+
+        metrics = {}
+        for stage, (items, seconds) in sorted(current.items()):
+            base_items, base_seconds = baseline.get(stage, (0, 0.0))
+            window_items = items - base_items
+            window_seconds = seconds - base_seconds
+            metrics[stage] = {
+                'items_total': items,
+                'seconds_total': round(seconds, 6),
+                'ms_per_item': round(window_seconds / window_items * 1000, 3) if window_items else 0.0,
+            }
+        return metrics
+
+    def _queue_depth(self):
+        engine = self.crawler.engine
+        if engine is None:
+            return {}
+        slot = getattr(engine, '_slot', None) or getattr(engine, 'slot', None)
+        scheduler = getattr(slot, 'scheduler', None)
+        scraper_slot = getattr(engine.scraper, 'slot', None)
+        return {
+            'scheduler': len(scheduler) if scheduler is not None and hasattr(scheduler, '__len__') else 0,
+            'downloader': len(engine.downloader.active),
+            'scraper': len(scraper_slot.active) if scraper_slot is not None else 0,
+        }
+
+    def write_snapshot(self):
+        snapshot = self.snapshot()
+        if self.json_path:
+            self._write_atomic(self.json_path, json.dumps(snapshot, ensure_ascii=False, indent=2))
+        if self.prometheus_path:
+            self._write_atomic(self.prometheus_path, self._prometheus_text(snapshot))
+
+        items_rate = ', '.join(f"{item_type} {values['per_second']}/s"
+                               for item_type, values in snapshot['items'].items())
+        download = snapshot['download']
+        logger.info(f"Live metrics: {items_rate or 'no items'}, "
+                    f"{download['responses_per_second']} responses/s, "
+                    f"{download['bytes_per_second'] / 1024:.1f} KiB/s, "
+                    f"latency p90 {download['latency_seconds'].get('p90', 0)}s, "
+                    f"queue {snapshot['queue']}")
+        return snapshot
+
+    def _prometheus_text(self, snapshot):
+        spider = snapshot['spider']
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f'# HELP scrapy_{name} {help_text}')
+            lines.append(f'# TYPE scrapy_{name} {metric_type}')
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{v}"' for k, v in (('spider', spider),) + labels)
+                lines.append(f'scrapy_{name}{{{label_text}}} {value}')
+
+        items = snapshot['items']
+        download = snapshot['download']
+        pipeline = snapshot['pipeline']
+        metric('items_total', 'counter', 'Items scraped.',
+               [((('type', t),), v['total']) for t, v in items.items()])
+        metric('items_per_second', 'gauge', 'Items scraped per second over the rolling window.',
+               [((('type', t),), v['per_second']) for t, v in items.items()])
+        metric('items_dropped_total', 'counter', 'Items dropped by pipelines.',
+               [((('type', t),), v['dropped_total']) for t, v in items.items()])
+        metric('responses_per_second', 'gauge', 'Responses received per second over the rolling window.',
+               [((), download['responses_per_second'])])
+        metric('response_bytes_total', 'counter', 'Response body bytes received.',
+               [((), download['bytes_total'])])
+        metric('response_bytes_per_second', 'gauge', 'Response body bytes per second over the rolling window.',
+               [((), download['bytes_per_second'])])
+        metric('download_latency_seconds', 'gauge', 'Download latency quantiles over the rolling window.',
+               [((('quantile', str(int(q[1:]) / 100)),), v) for q, v in download['latency_seconds'].items()])
+        metric('pipeline_seconds_total', 'counter', 'Time spent in each item pipeline stage.',
+               [((('stage', s),), v['seconds_total']) for s, v in pipeline.items()])
+        metric('pipeline_ms_per_item', 'gauge', 'Average pipeline stage time per item over the rolling window.',
+               [((('stage', s),), v['ms_per_item']) for s, v in pipeline.items()])
+        metric('queue_depth', 'gauge', 'Requests waiting in the scheduler, downloading or being processed.',
+               [((('queue', q),), v) for q, v in snapshot['queue'].items()])
+        return '\n'.join(lines) + '\n'
+
+    def _write_statistics(self, snapshot):
+        """结束统计（与原 StatisticsPipeline 的 statistics.json 字段兼容）"""
+        if not self.statistics_path:
+            return
+        end_time = datetime.now()
+        duration = (end_time - self.start_time).total_seconds()
+        posts = self.items['PostItem'].total
+        replies = self.items['ReplyItem'].total
+        stats_info = {
+            'total_posts': posts,
+            'total_replies': replies,
+            'start_time': self.start_time.isoformat(),
+            'end_time': end_time.isoformat(),
+            'duration_seconds': duration,
+            'avg_posts_per_minute': posts / (duration / 60) if duration > 0 else 0,
+            'avg_replies_per_minute': replies / (duration / 60) if duration > 0 else 0,
+            'final_metrics': snapshot,
+        }
+        with open(self.statistics_path, 'w', encoding='utf-8') as f:
+            json.dump(stats_info, f, ensure_ascii=False, indent=2)
+        logger.info(f"Crawling completed! Posts: {posts}, Replies: {replies}, Duration: {duration:.1f}s")
+
+    @staticmethod
+    def _write_atomic(path, text):
+        """先写临时文件再替换，采集方不会读到写了一半的文件"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
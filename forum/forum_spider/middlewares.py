@@ -1,10 +1,20 @@
+import time
 import random
 import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
 from scrapy import signals
-from scrapy.http import HtmlResponse
-from scrapy.downloadermiddlewares.retry import RetryMiddleware
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from twisted.internet import defer, reactor
+from twisted.internet.task import deferLater
+from scrapy.http import HtmlResponse, TextResponse
+from scrapy.downloadermiddlewares.retry import RetryMiddleware, get_retry_request
 from scrapy.utils.response import response_status_message
 
+from forum_spider.retry_queue import delay_request
+from forum_spider.proxy_pool import ProxyPool, load_proxies
+
 logger = logging.getLogger(__name__)
 
 
@@ -60,38 +70,173 @@ class RotateUserAgentMiddleware:
 
 
 class ProxyMiddleware:
-    """代理中间件（可选使用）"""
+    """代理中间件（可选使用）：从 PROXY_LIST_FILE 加载代理，按健康度分配请求（见 proxy_pool.ProxyPool）
     
-    def __init__(self):
-        # 代理列表（需要自己添加有效代理）
-        self.proxy_list = [
-            # 'http://proxy1:port',
-            # 'http://proxy2:port',
-            # 添加更多代理...
-        ]
-        self.proxy_index = 0
+    位于下载器之前（HTTP缓存之后），缓存命中的请求不占用代理；每个代理单独作为一个下载slot，
+    AIMD并发控制因此按代理分别调整。代理列表为空时不启用。
+    """
+    
+    def __init__(self, crawler, pool, ban_codes=(403, 407, 429), pin_list_pages=False):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.pool = pool
+        self.ban_codes = set(ban_codes)
+        self.pin_list_pages = pin_list_pages
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        custom_settings = crawler.settings.get('CUSTOM_SETTINGS', {})
+        proxies = load_proxies(custom_settings.get('PROXY_LIST_FILE', 'proxies.txt'))
+        if not proxies:
+            raise NotConfigured
+        pool = ProxyPool(
+            proxies,
+            crawler.stats,
+            max_concurrency=custom_settings.get('PROXY_MAX_CONCURRENCY', 2),
+            alpha=custom_settings.get('PROXY_EWMA_ALPHA', 0.3),
+            quarantine_failures=custom_settings.get('PROXY_QUARANTINE_FAILURES', 3),
+            max_failure_rate=custom_settings.get('PROXY_MAX_FAILURE_RATE', 0.5),
+            min_samples=custom_settings.get('PROXY_MIN_SAMPLES', 5),
+            quarantine_base=custom_settings.get('PROXY_QUARANTINE_BASE', 60.0),
+            quarantine_max=custom_settings.get('PROXY_QUARANTINE_MAX', 1800.0),
+        )
+        logger.info(f"Loaded {len(pool)} proxies")
+        middleware = cls(
+            crawler,
+            pool,
+            ban_codes=custom_settings.get('PROXY_BAN_CODES', [403, 407, 429]),
+            pin_list_pages=custom_settings.get('PROXY_PIN_LIST_PAGES', False),
+        )
+        # ResponseValidationMiddleware 通过 crawler.proxy_pool 报告拦截页
+        crawler.proxy_pool = pool
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
 
     def process_request(self, request, spider):
-        if self.proxy_list:
-            proxy = self.proxy_list[self.proxy_index]
-            self.proxy_index = (self.proxy_index + 1) % len(self.proxy_list)
-            request.meta['proxy'] = proxy
-            logger.info(f'Using proxy: {proxy}')
+        if 'proxy' in request.meta and 'proxy_pool' not in request.meta:
+            # 请求自行指定了代理
+            return None
+        if self.pin_list_pages and request.meta.get('list_page'):
+            request.meta.setdefault('proxy_pin', request.url)
+        proxy = self.pool.acquire(request.meta.get('proxy_pin'))
+        if proxy is None:
+            self.stats.inc_value('proxy/waits')
+            d = self.pool.wait(request.meta.get('proxy_pin'))
+            d.addCallback(lambda proxy: self._use(request, proxy))
+            return d
+        return self._use(request, proxy)
+
+    def _use(self, request, proxy):
+        request.meta['proxy'] = proxy.url
+        request.meta['proxy_pool'] = proxy.url
+        request.meta['proxy_pool_active'] = True  # 本次下载结束时归还名额（重试的请求副本会带着旧的标记）
+        request.meta['download_slot'] = f"{urlparse(request.url).hostname} via {proxy.name}"
+        if proxy.auth:
+            request.headers['Proxy-Authorization'] = proxy.auth
+        else:
+            request.headers.pop('Proxy-Authorization', None)
+        logger.debug(f'Using proxy {proxy.name} for {request.url}')
+        return None
+
+    def _release(self, request, failed, latency=None):
+        if request.meta.pop('proxy_pool_active', False):
+            self.pool.release(self.pool.proxies[request.meta['proxy_pool']], latency=latency, failed=failed)
+
+    def process_response(self, request, response, spider):
+        self._release(request, response.status in self.ban_codes, request.meta.get('download_latency'))
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self._release(request, not isinstance(exception, IgnoreRequest))
+        return None
+
+    def spider_closed(self, spider, reason):
+        self.pool.report()
+
+
+class ListPageCancelMiddleware:
+    """列表页取消中间件
+    
+    并行模式下1..MAX_PAGES的列表页一次性调度。请求进入下载器时即经过中间件，之后才在下载槽中排队，
+    因此这里用信号量按每域名并发数放行列表页，等待放行的页在所属板块收集到足够帖子（spider.list_page_cancelled）后直接丢弃。
+    所有板块共用一个信号量，多板块爬取时同时下载的列表页数仍受每域名并发数限制。
+    """
+    
+    def __init__(self, stats, concurrency):
+        self.stats = stats
+        self.semaphore = defer.DeferredSemaphore(max(1, concurrency))
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats, crawler.settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN'))
+
+    def process_request(self, request, spider):
+        if not request.meta.get('list_page'):
+            return None
+        # 被后面的中间件在 process_response 中重新入队的请求没有经过这里的 process_response，先归还其名额
+        self._release(request)
+        self._check_cancelled(request, spider)
+        d = self.semaphore.acquire()
+        d.addCallback(self._admit, request, spider)
+        return d
+
+    def _admit(self, _, request, spider):
+        try:
+            self._check_cancelled(request, spider)
+        except IgnoreRequest:
+            self.semaphore.release()
+            raise
+        request.meta['list_page_admitted'] = True
+        return None
+
+    def _check_cancelled(self, request, spider):
+        if spider.list_page_cancelled(request):
+            self.stats.inc_value('list_crawl/pages_cancelled')
+            self.stats.inc_value(f"boards/{request.meta.get('board_id')}/pages_cancelled")
+            logger.debug(f"List crawl finished, cancelling {request.url}")
+            raise IgnoreRequest(f"List crawl finished: {request.url}")
+
+    def _release(self, request):
+        if request.meta.pop('list_page_admitted', False):
+            self.semaphore.release()
+
+    def process_response(self, request, response, spider):
+        self._release(request)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self._release(request)
         return None
 
 
 class CustomRetryMiddleware(RetryMiddleware):
-    """自定义重试中间件"""
+    """自定义重试中间件：按域名的抖动指数退避，支持 Retry-After
+    
+    重试请求不会立即重新下载：等待时间写入 meta['retry_not_before']，由 retry_queue.DelayedRetryQueue
+    暂存到延迟队列，到期后再调度（不阻塞reactor，不占用下载并发名额）。响应带有 Retry-After 头
+    （秒数或HTTP日期）时按其等待，最长 RETRY_AFTER_MAX 秒；否则按该域名连续失败次数 n 计算
+    d = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2^(n-1))，在 [d/2, d] 内随机取值，
+    避免大量请求同时重试。域名返回不需要重试的响应后连续失败次数清零。
+    """
     
-    def __init__(self, settings):
+    def __init__(self, settings, base_delay=2.0, max_delay=60.0, retry_after_max=600.0):
         super().__init__(settings)
-        self.max_retry_times = settings.getint('RETRY_TIMES')
-        self.retry_http_codes = set(int(x) for x in settings.getlist('RETRY_HTTP_CODES'))
-        self.priority_adjust = settings.getint('RETRY_PRIORITY_ADJUST')
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_after_max = retry_after_max
+        self.failures = {}  # 域名 -> 连续失败次数
 
     @classmethod
     def from_crawler(cls, crawler):
-        return cls(crawler.settings)
+        custom_settings = crawler.settings.get('CUSTOM_SETTINGS', {})
+        o = cls(
+            crawler.settings,
+            base_delay=custom_settings.get('RETRY_BACKOFF_BASE', 2.0),
+            max_delay=custom_settings.get('RETRY_BACKOFF_MAX', 60.0),
+            retry_after_max=custom_settings.get('RETRY_AFTER_MAX', 600.0),
+        )
+        o.crawler = crawler
+        return o
 
     def process_response(self, request, response, spider):
         if request.meta.get('dont_retry', False):
@@ -99,45 +244,192 @@ class CustomRetryMiddleware(RetryMiddleware):
             
         if response.status in self.retry_http_codes:
             reason = response_status_message(response.status)
-            return self._retry(request, reason, spider) or response
-            
+            return self._retry(request, reason, spider, response) or response
+        
+        self.failures.pop(urlparse(request.url).hostname or '', None)
         return response
 
     def process_exception(self, request, exception, spider):
-        if isinstance(exception, self.EXCEPTIONS_TO_RETRY) and not request.meta.get('dont_retry', False):
+        if isinstance(exception, self.exceptions_to_retry) and not request.meta.get('dont_retry', False):
             return self._retry(request, exception, spider)
 
-    def _retry(self, request, reason, spider):
-        retries = request.meta.get('retry_times', 0) + 1
+    def _retry(self, request, reason, spider, response=None):
+        retryreq = get_retry_request(
+            request,
+            reason=reason,
+            spider=spider,
+            max_retry_times=request.meta.get('max_retry_times', self.max_retry_times),
+            priority_adjust=request.meta.get('priority_adjust', self.priority_adjust),
+        )
+        if retryreq is None:
+            return None
         
-        if retries <= self.max_retry_times:
-            logger.warning(f"Retrying {request.url} (failed {retries} times): {reason}")
-            retryreq = request.copy()
-            retryreq.meta['retry_times'] = retries
-            retryreq.dont_filter = True
-            retryreq.priority = request.priority + self.priority_adjust
-            
-            # 增加重试延迟
-            if retries > 1:
-                delay = min(2 ** retries, 60)  # 指数退避，最大60秒
-                retryreq.meta['download_delay'] = delay
-                
-            return retryreq
+        domain = urlparse(request.url).hostname or ''
+        self.failures[domain] = self.failures.get(domain, 0) + 1
+        retry_after = self.retry_after(response)
+        if retry_after is not None:
+            delay = retry_after
+            self.crawler.stats.inc_value('retry/retry_after')
+        else:
+            ceiling = min(self.max_delay, self.base_delay * 2 ** (self.failures[domain] - 1))
+            delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+        logger.info(f"Retrying {request.url} in {delay:.1f}s (attempt {retryreq.meta['retry_times']}): {reason}")
+        return delay_request(retryreq, delay)
+
+    def retry_after(self, response):
+        """Retry-After 头的等待秒数（限制在 RETRY_AFTER_MAX 以内），没有或无法解析时返回None"""
+        if response is None:
+            return None
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        value = value.decode('latin-1').strip()
+        if value.isdigit():
+            seconds = float(value)
         else:
-            logger.error(f"Gave up retrying {request.url} (failed {retries} times): {reason}")
+            try:
+                seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                return None
+        return min(max(seconds, 0.0), self.retry_after_max)
 
 
 class ResponseValidationMiddleware:
-    """响应验证中间件"""
+    """响应验证中间件：反爬虫页面检测和每域名熔断
+    
+    只在响应体开头 ANTIBOT_SCAN_BYTES 字节内按字节查找 ANTIBOT_MARKERS（不解码整个响应），
+    响应体过短也视为拦截页。检测到拦截页时把请求经延迟重试队列重新入队（dont_filter，等待 ANTIBOT_RETRY_DELAY 秒
+    或熔断暂停结束），每个请求最多 ANTIBOT_MAX_RETRIES 次，
+    超过后以 IgnoreRequest 交给errback。同一域名连续检测到 CIRCUIT_BREAKER_THRESHOLD 次后熔断：
+    暂停该域名的新请求（在 process_request 中延迟放行，不阻塞reactor），暂停时间按熔断次数指数增长；
+    熔断后第一个正常响应恢复该域名。HTTP缓存命中的响应（flags中有 'cached'）不计入也不恢复熔断，
+    检测到拦截页时照样重新入队，重试的请求（meta['antibot_retries']）跳过缓存条目重新下载并覆盖它。
+    """
     
+    def __init__(self, crawler, markers, scan_bytes=16 * 1024, min_body_bytes=100, max_retries=2,
+                 threshold=3, base_pause=30.0, max_pause=600.0, retry_delay=5.0):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        # 标记按UTF-8和GBK编码后直接在字节中查找（Discuz站点常见这两种编码）
+        self.patterns = set()
+        for marker in markers:
+            for encoding in ('utf-8', 'gbk'):
+                try:
+                    self.patterns.add(marker.encode(encoding))
+                except UnicodeEncodeError:
+                    pass
+        self.scan_bytes = scan_bytes
+        self.min_body_bytes = min_body_bytes
+        self.max_retries = max_retries
+        self.threshold = threshold
+        self.base_pause = base_pause
+        self.max_pause = max_pause
+        self.retry_delay = retry_delay
+        self.checked = 0
+        self.detected = 0
+        self.domains = {}  # 域名 -> {'consecutive', 'trips', 'paused_until'}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        custom_settings = crawler.settings.get('CUSTOM_SETTINGS', {})
+        return cls(
+            crawler,
+            custom_settings.get('ANTIBOT_MARKERS', ['访问被拒绝', '验证码']),
+            scan_bytes=custom_settings.get('ANTIBOT_SCAN_BYTES', 16 * 1024),
+            min_body_bytes=custom_settings.get('ANTIBOT_MIN_BODY_BYTES', 100),
+            max_retries=custom_settings.get('ANTIBOT_MAX_RETRIES', 2),
+            threshold=custom_settings.get('CIRCUIT_BREAKER_THRESHOLD', 3),
+            base_pause=custom_settings.get('CIRCUIT_BREAKER_BASE_PAUSE', 30.0),
+            max_pause=custom_settings.get('CIRCUIT_BREAKER_MAX_PAUSE', 600.0),
+            retry_delay=custom_settings.get('ANTIBOT_RETRY_DELAY', 5.0),
+        )
+
+    def _domain(self, request):
+        return urlparse(request.url).hostname or ''
+
+    def _state(self, domain):
+        return self.domains.setdefault(domain, {'consecutive': 0, 'trips': 0, 'paused_until': 0.0})
+
+    def process_request(self, request, spider):
+        state = self.domains.get(self._domain(request))
+        if state is None:
+            return None
+        remaining = state['paused_until'] - time.monotonic()
+        if remaining <= 0:
+            return None
+        # 熔断中：延迟到暂停结束后再放行，期间该请求占用下载器的并发名额
+        self.stats.inc_value('antibot/paused_requests')
+        return deferLater(reactor, remaining, lambda: None)
+
+    def is_blocked(self, response):
+        """只检查响应体开头的有限字节窗口"""
+        body = response.body
+        if len(body) < self.min_body_bytes:
+            return True
+        window = body[:self.scan_bytes]
+        return any(pattern in window for pattern in self.patterns)
+
     def process_response(self, request, response, spider):
-        # 检查响应是否有效
-        if response.status == 200:
-            # 检查是否被反爬虫拦截
-            if '访问被拒绝' in response.text or '验证码' in response.text or len(response.text) < 100:
-                logger.warning(f"Possible anti-spider detected for {request.url}")
-                # 可以选择重试或跳过
-                request.meta['retry_times'] = request.meta.get('retry_times', 0) + 1
-                return request
-                
-        return response 
\ No newline at end of file
+        if response.status != 200 or not isinstance(response, TextResponse):
+            return response
+        
+        domain = self._domain(request)
+        cached = 'cached' in response.flags  # 缓存中的旧响应，不反映服务器当前的状态
+        self.checked += 1
+        self.stats.inc_value('antibot/checked')
+        if not self.is_blocked(response):
+            state = self.domains.get(domain)
+            if not cached and state and (state['consecutive'] or state['trips']):
+                if state['trips']:
+                    logger.info(f"Circuit breaker for {domain} closed after a normal response")
+                state['consecutive'] = 0
+                state['trips'] = 0
+            self._record_rate()
+            return response
+        
+        self.detected += 1
+        self.stats.inc_value('antibot/detected')
+        self.stats.inc_value(f'antibot/detected/{domain}')
+        self._record_rate()
+        if cached:
+            self.stats.inc_value('antibot/detected_cached')
+            return self._reenqueue(request, f"cached anti-spider page ({len(response.body)} bytes)")
+        pool = getattr(self.crawler, 'proxy_pool', None)
+        if pool is not None and request.meta.get('proxy_pool'):
+            # 拦截页说明该代理被封，计入代理失败
+            pool.record_ban(request.meta['proxy_pool'])
+        state = self._state(domain)
+        state['consecutive'] += 1
+        if state['consecutive'] >= self.threshold:
+            self._trip(domain, state)
+        
+        return self._reenqueue(request, f"anti-spider page detected ({len(response.body)} bytes)")
+
+    def _trip(self, domain, state):
+        state['trips'] += 1
+        state['consecutive'] = 0
+        pause = min(self.base_pause * 2 ** (state['trips'] - 1), self.max_pause)
+        state['paused_until'] = time.monotonic() + pause
+        self.stats.inc_value('antibot/circuit_breaker_trips')
+        self.stats.inc_value('antibot/paused_seconds', pause)
+        logger.warning(f"Circuit breaker for {domain} opened (trip {state['trips']}), pausing for {pause:.0f}s")
+
+    def _reenqueue(self, request, reason):
+        retries = request.meta.get('antibot_retries', 0) + 1
+        if retries > self.max_retries:
+            self.stats.inc_value('antibot/gave_up')
+            logger.error(f"Gave up on {request.url} after {retries - 1} anti-spider retries")
+            raise IgnoreRequest(f"Anti-spider page: {request.url}")
+        
+        logger.warning(f"Possible anti-spider page for {request.url}, re-enqueueing ({retries}/{self.max_retries}): {reason}")
+        self.stats.inc_value('antibot/retries')
+        retryreq = request.copy()
+        retryreq.meta['antibot_retries'] = retries
+        retryreq.dont_filter = True
+        # 经延迟队列重新调度：熔断中等到暂停结束，否则等待 ANTIBOT_RETRY_DELAY 秒（随机抖动）
+        state = self.domains.get(self._domain(request))
+        remaining = state['paused_until'] - time.monotonic() if state else 0.0
+        return delay_request(retryreq, max(remaining, self.retry_delay * random.uniform(0.5, 1.0)))
+
+    def _record_rate(self):
+        self.stats.set_value('antibot/block_rate', round(self.detected / self.checked, 4))
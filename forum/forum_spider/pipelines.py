@@ -1,11 +1,21 @@
-import json
+import io
 import csv
 import os
+import time
 import logging
+import functools
 from datetime import datetime
 from scrapy.exceptions import DropItem
+from scrapy.utils.misc import load_object
 from itemadapter import ItemAdapter
 import re
+from forum_spider.buffered_writer import BufferedFileWriter
+from forum_spider.jsonl import JsonLinesWriter, jsonl_to_json
+from forum_spider.storage import SqliteStore
+from forum_spider.seen_store import POST, REPLY
+from forum_spider.frontier import resuming, connect_checkpoint, disconnect_checkpoint
+from forum_spider.simhash import SimHashIndex, normalize, simhash
+from forum_spider.keywords import KeywordAutomaton
 
 logger = logging.getLogger(__name__)
 
@@ -22,13 +32,35 @@ def clean_filename(filename):
     return filename.strip()
 
 
+def timed_stage(process_item):
+    """记录Pipeline处理耗时到统计项 pipeline/<类名>/items|seconds（运行中由 LiveMetrics 扩展按窗口汇总）"""
+    @functools.wraps(process_item)
+    def wrapper(self, item, spider):
+        start = time.perf_counter()
+        try:
+            return process_item(self, item, spider)
+        finally:
+            stats = getattr(spider.crawler, 'stats', None)
+            if stats is not None:
+                stage = type(self).__name__
+                stats.inc_value(f'pipeline/{stage}/items')
+                stats.inc_value(f'pipeline/{stage}/seconds', time.perf_counter() - start)
+    return wrapper
+
+
 class TxtWriterPipeline:
     """TXT格式输出Pipeline - 按论坛结构组织，帖子和回复合并到一个文件"""
     
+    # 帖子ID -> 目录名 的持久化清单，避免每次启动和每条回复都扫描输出目录
+    POST_INDEX_FILE = '.post_index.tsv'
+
     def __init__(self):
         self.forum_name = "HomeAssistant综合讨论区"
         self.base_output_dir = None
         self.processed_posts = set()  # 跟踪已处理的帖子
+        self.post_dirs = {}  # 帖子ID -> 帖子目录名
+        self.index_file = None
+        self.writer = None  # 带缓冲的TXT写入器
 
     def open_spider(self, spider):
         # 创建基础输出目录结构
@@ -39,20 +71,56 @@ class TxtWriterPipeline:
         if not os.path.exists(self.base_output_dir):
             os.makedirs(self.base_output_dir)
             
-        # 获取已存在的帖子目录，用于跳过
-        existing_dirs = [d for d in os.listdir(self.base_output_dir) 
-                        if os.path.isdir(os.path.join(self.base_output_dir, d))]
+        # 回复写入先缓冲，按大小/时间阈值批量落盘
+        self.writer = BufferedFileWriter(
+            flush_bytes=custom_settings.get('TXT_FLUSH_BYTES', 64 * 1024),
+            flush_interval=custom_settings.get('TXT_FLUSH_INTERVAL', 5.0),
+            max_open_files=custom_settings.get('TXT_MAX_OPEN_FILES', 64),
+        )
+            
+        # 加载帖子目录索引
+        self._load_post_index()
         
-        spider.existing_post_ids = set()
-        for dir_name in existing_dirs:
-            if '_' in dir_name:
-                post_id = dir_name.split('_')[0]
-                spider.existing_post_ids.add(post_id)
-                logger.info(f"Found existing post directory: {dir_name} (ID: {post_id})")
+        # 首次启用已见集合时，把已有帖子目录导入，后续运行直接查询已见集合跳过
+        seen_store = getattr(spider, 'seen_store', None)
+        if seen_store and self.post_dirs and seen_store.is_empty(POST):
+            seen_store.add_many(POST, self.post_dirs)
+            logger.info(f"Seeded seen store with {len(self.post_dirs)} existing posts")
         
+        connect_checkpoint(spider.crawler, self.checkpoint)
         logger.info(f"TXT output directory initialized: {self.base_output_dir}")
-        logger.info(f"Found {len(spider.existing_post_ids)} existing posts to skip")
 
+    def checkpoint(self):
+        """断点续爬的检查点：缓冲的回复写入磁盘"""
+        self.writer.flush()
+
+    def _load_post_index(self):
+        """加载帖子目录索引；清单不存在时扫描一次输出目录并生成清单"""
+        index_path = os.path.join(self.base_output_dir, self.POST_INDEX_FILE)
+        self.post_dirs = {}
+        
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    post_id, _, dir_name = line.rstrip('\n').partition('\t')
+                    if post_id and dir_name:
+                        self.post_dirs[post_id] = dir_name
+            logger.info(f"Loaded {len(self.post_dirs)} post directories from index: {index_path}")
+        else:
+            with os.scandir(self.base_output_dir) as entries:
+                for entry in entries:
+                    if entry.is_dir() and '_' in entry.name:
+                        post_id = entry.name.split('_')[0]
+                        self.post_dirs.setdefault(post_id, entry.name)
+            with open(index_path, 'w', encoding='utf-8') as f:
+                for post_id, dir_name in self.post_dirs.items():
+                    f.write(f"{post_id}\t{dir_name}\n")
+            logger.info(f"Built post directory index with {len(self.post_dirs)} entries: {index_path}")
+        
+        # 行缓冲追加，新帖子立即落盘，进程中断也不会丢失索引
+        self.index_file = open(index_path, 'a', encoding='utf-8', buffering=1)
+
+    @timed_stage
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
         
@@ -73,9 +141,13 @@ class TxtWriterPipeline:
             if post_id in self.processed_posts:
                 return
             
-            # 创建帖子目录
-            clean_title = clean_filename(title)
-            post_dir_name = f"{post_id}_{clean_title}"
+            # 创建帖子目录（已有目录的帖子沿用原目录）
+            post_dir_name = self.post_dirs.get(post_id)
+            if not post_dir_name:
+                clean_title = clean_filename(title)
+                post_dir_name = f"{post_id}_{clean_title}"
+                self.post_dirs[post_id] = post_dir_name
+                self.index_file.write(f"{post_id}\t{post_dir_name}\n")
             post_dir = os.path.join(self.base_output_dir, post_dir_name)
             
             if not os.path.exists(post_dir):
@@ -83,7 +155,7 @@ class TxtWriterPipeline:
             
             # 创建合并的内容文件
             content_file = os.path.join(post_dir, "完整内容.txt")
-            with open(content_file, 'w', encoding='utf-8') as f:
+            with io.StringIO() as f:
                 # 写入帖子头部信息
                 f.write("=" * 60 + "\n")
                 f.write(f"帖子标题: {title}\n")
@@ -107,6 +179,7 @@ class TxtWriterPipeline:
                 f.write("\n" + "=" * 60 + "\n")
                 f.write("【回复内容】\n")
                 f.write("=" * 60 + "\n")
+                self.writer.write(content_file, f.getvalue())
                 
             self.processed_posts.add(post_id)
             logger.info(f"Post initialized: {content_file}")
@@ -119,24 +192,24 @@ class TxtWriterPipeline:
         try:
             post_id = adapter.get('post_id', [''])[0] if isinstance(adapter.get('post_id'), list) else adapter.get('post_id', '')
             
-            # 找到对应的帖子目录
-            post_dirs = [d for d in os.listdir(self.base_output_dir) 
-                        if os.path.isdir(os.path.join(self.base_output_dir, d)) and d.startswith(f"{post_id}_")]
+            # 通过索引找到对应的帖子目录
+            post_dir_name = self.post_dirs.get(post_id)
             
-            if not post_dirs:
+            if not post_dir_name:
                 logger.warning(f"No post directory found for post_id: {post_id}")
                 return
                 
-            post_dir = os.path.join(self.base_output_dir, post_dirs[0])
+            post_dir = os.path.join(self.base_output_dir, post_dir_name)
             content_file = os.path.join(post_dir, "完整内容.txt")
             
-            # 追加回复内容
-            with open(content_file, 'a', encoding='utf-8') as f:
+            # 追加回复内容（写入缓冲区）
+            with io.StringIO() as f:
                 f.write(f"\n【{adapter.get('floor_num', 0)}楼】 - {adapter.get('author', '未知用户')}\n")
                 f.write(f"回复时间: {adapter.get('reply_time', '未知')}\n")
                 f.write("-" * 40 + "\n")
                 f.write(f"{adapter.get('content', '暂无内容')}\n")
                 f.write("-" * 40 + "\n")
+                self.writer.append(content_file, f.getvalue())
                 
             logger.info(f"Reply appended to: {content_file} (Floor: {adapter.get('floor_num')})")
             
@@ -144,6 +217,12 @@ class TxtWriterPipeline:
             logger.error(f"Error appending reply to TXT: {e}")
 
     def close_spider(self, spider):
+        disconnect_checkpoint(spider.crawler, self.checkpoint)
+        # 确保所有缓冲的回复都写入磁盘
+        if self.writer:
+            self.writer.close()
+        if self.index_file:
+            self.index_file.close()
         logger.info(f"TXT files saved in forum structure under: {self.base_output_dir}")
         logger.info(f"Total posts processed in this session: {len(self.processed_posts)}")
 
@@ -151,6 +230,7 @@ class TxtWriterPipeline:
 class ValidationPipeline:
     """数据验证Pipeline"""
     
+    @timed_stage
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
         
@@ -174,12 +254,69 @@ class ValidationPipeline:
 
 
 class DuplicatesPipeline:
-    """智能去重Pipeline"""
+    """智能去重Pipeline - 优先使用spider的持久化已见集合，实现跨运行去重"""
     
     def __init__(self):
         self.seen_posts = set()
         self.seen_replies = set()
+        self.seen_store = None
+        
+        # 回复内容的SimHash近似去重（可选）
+        self.simhash_index = None
+        self.simhash_action = 'flag'
+        self.simhash_ngram = 3
+        self.simhash_min_length = 1
+        self.stats = None
+
+    def open_spider(self, spider):
+        self.seen_store = getattr(spider, 'seen_store', None)
+        if self.seen_store:
+            logger.info("Duplicates pipeline using persistent seen store")
+        
+        custom_settings = spider.settings.get('CUSTOM_SETTINGS', {})
+        if custom_settings.get('SIMHASH_ENABLED', False):
+            self.simhash_index = SimHashIndex(custom_settings.get('SIMHASH_MAX_DISTANCE', 3))
+            self.simhash_action = custom_settings.get('SIMHASH_ACTION', 'flag')
+            self.simhash_ngram = custom_settings.get('SIMHASH_NGRAM', 3)
+            self.simhash_min_length = custom_settings.get('SIMHASH_MIN_LENGTH', 1)
+            self.stats = spider.crawler.stats
+            logger.info(f"SimHash near-duplicate detection enabled "
+                        f"(max distance {self.simhash_index.max_distance}, action {self.simhash_action})")
 
+    def close_spider(self, spider):
+        if self.simhash_index is not None:
+            self.stats.set_value('simhash/indexed', len(self.simhash_index))
+
+    def _check_near_duplicate(self, adapter, reply_key):
+        """按回复内容的SimHash查找近似重复，按配置丢弃或在 duplicate_of 字段中标记"""
+        content = normalize(adapter.get('content'))
+        if len(content) < self.simhash_min_length:
+            return
+        
+        fingerprint = simhash(content, self.simhash_ngram)
+        original_key = self.simhash_index.find(fingerprint)
+        if original_key is None:
+            self.simhash_index.add(fingerprint, reply_key)
+            return
+        
+        self.stats.inc_value('simhash/near_duplicates')
+        if self.simhash_action == 'drop':
+            logger.debug(f"Near-duplicate reply {reply_key} of {original_key}, dropping")
+            raise DropItem(f"Near-duplicate reply {reply_key} of {original_key}")
+        adapter['duplicate_of'] = original_key
+        logger.debug(f"Near-duplicate reply {reply_key} of {original_key}, flagged")
+
+    def _is_new(self, kind, key):
+        """记录键并返回是否首次出现"""
+        if self.seen_store:
+            return self.seen_store.add(kind, key)
+        seen = self.seen_posts if kind == POST else self.seen_replies
+        if key in seen:
+            return False
+        seen.add(key)
+        return True
+
+    @timed_stage
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
         
@@ -191,11 +328,10 @@ class DuplicatesPipeline:
                 logger.warning("PostItem without post_id, dropping")
                 raise DropItem("Missing post_id")
                 
-            if post_id_str in self.seen_posts:
+            if not self._is_new(POST, post_id_str):
                 logger.info(f"Duplicate post found: {post_id_str}")
                 raise DropItem(f"Duplicate post found: {post_id_str}")
             else:
-                self.seen_posts.add(post_id_str)
                 logger.info(f"New post accepted: {post_id_str}")
                 
         elif item.__class__.__name__ == 'ReplyItem':
@@ -208,57 +344,74 @@ class DuplicatesPipeline:
                 raise DropItem("Missing post_id in reply")
                 
             reply_key = f"{post_id_str}_{floor_num}"
-            if reply_key in self.seen_replies:
+            if not self._is_new(REPLY, reply_key):
                 logger.debug(f"Duplicate reply found: {reply_key}")
                 raise DropItem(f"Duplicate reply found: {reply_key}")
             else:
-                self.seen_replies.add(reply_key)
                 logger.debug(f"New reply accepted: {reply_key}")
+            
+            if self.simhash_index is not None:
+                self._check_near_duplicate(adapter, reply_key)
         
         return item
 
 
 class JsonWriterPipeline:
-    """JSON输出Pipeline"""
+    """JSON输出Pipeline - 以JSON Lines流式写入，结束时可转换为旧版JSON数组文件"""
     
     def __init__(self):
-        self.posts_file = None
-        self.replies_file = None
-        self.posts_data = []
-        self.replies_data = []
+        self.output_dir = None
+        self.posts_writer = None
+        self.replies_writer = None
+        self.legacy_export = True
 
     def open_spider(self, spider):
         # 创建输出目录
-        output_dir = spider.settings.get('CUSTOM_SETTINGS', {}).get('OUTPUT_DIR', 'output')
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        custom_settings = spider.settings.get('CUSTOM_SETTINGS', {})
+        self.output_dir = custom_settings.get('OUTPUT_DIR', 'output')
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
             
-        # 初始化文件
-        self.posts_file = open(f'{output_dir}/posts.json', 'w', encoding='utf-8')
-        self.replies_file = open(f'{output_dir}/replies.json', 'w', encoding='utf-8')
+        # 初始化流式写入器（从断点恢复时追加到上次的输出）
+        writer_options = {
+            'compression': custom_settings.get('JSONL_COMPRESSION'),
+            'flush_every': custom_settings.get('JSONL_FLUSH_EVERY', 100),
+            'flush_interval': custom_settings.get('JSONL_FLUSH_INTERVAL', 5.0),
+            'append': resuming(spider.crawler),
+        }
+        self.posts_writer = JsonLinesWriter(os.path.join(self.output_dir, 'posts.jsonl'), **writer_options)
+        self.replies_writer = JsonLinesWriter(os.path.join(self.output_dir, 'replies.jsonl'), **writer_options)
+        self.legacy_export = custom_settings.get('JSON_LEGACY_EXPORT', True)
+        connect_checkpoint(spider.crawler, self.checkpoint)
         
-        logger.info("JSON files initialized")
+        logger.info("JSONL files initialized")
+
+    def checkpoint(self):
+        self.posts_writer.flush()
+        self.replies_writer.flush()
 
     def close_spider(self, spider):
-        # 写入数据
-        if self.posts_data:
-            json.dump(self.posts_data, self.posts_file, ensure_ascii=False, indent=2)
-        if self.replies_data:
-            json.dump(self.replies_data, self.replies_file, ensure_ascii=False, indent=2)
-            
+        disconnect_checkpoint(spider.crawler, self.checkpoint)
         # 关闭文件
-        self.posts_file.close()
-        self.replies_file.close()
+        self.posts_writer.close()
+        self.replies_writer.close()
         
-        logger.info(f"Saved {len(self.posts_data)} posts and {len(self.replies_data)} replies to JSON files")
+        logger.info(f"Saved {self.posts_writer.count} posts and {self.replies_writer.count} replies to JSONL files")
+        
+        # 生成旧版JSON数组文件
+        if self.legacy_export:
+            jsonl_to_json(self.posts_writer.path, os.path.join(self.output_dir, 'posts.json'))
+            jsonl_to_json(self.replies_writer.path, os.path.join(self.output_dir, 'replies.json'))
+            logger.info("Legacy JSON files exported")
 
+    @timed_stage
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
         
         if item.__class__.__name__ == 'PostItem':
-            self.posts_data.append(dict(adapter))
+            self.posts_writer.write(dict(adapter))
         elif item.__class__.__name__ == 'ReplyItem':
-            self.replies_data.append(dict(adapter))
+            self.replies_writer.write(dict(adapter))
             
         return item
 
@@ -279,30 +432,42 @@ class CsvWriterPipeline:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
             
-        # 打开CSV文件
-        self.posts_file = open(f'{output_dir}/posts.csv', 'w', newline='', encoding='utf-8')
-        self.replies_file = open(f'{output_dir}/replies.csv', 'w', newline='', encoding='utf-8')
+        # 打开CSV文件（从断点恢复时追加，不再写表头）
+        mode = 'a' if resuming(spider.crawler) else 'w'
+        self.posts_file = open(f'{output_dir}/posts.csv', mode, newline='', encoding='utf-8')
+        self.replies_file = open(f'{output_dir}/replies.csv', mode, newline='', encoding='utf-8')
+        self.posts_written = self.posts_file.tell() > 0
+        self.replies_written = self.replies_file.tell() > 0
+        connect_checkpoint(spider.crawler, self.checkpoint)
         
         logger.info("CSV files initialized")
 
+    def checkpoint(self):
+        self.posts_file.flush()
+        self.replies_file.flush()
+
     def close_spider(self, spider):
+        disconnect_checkpoint(spider.crawler, self.checkpoint)
         self.posts_file.close()
         self.replies_file.close()
         logger.info("CSV files closed")
 
+    @timed_stage
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
         
         if item.__class__.__name__ == 'PostItem':
-            if not self.posts_written:
+            if self.posts_writer is None:
                 self.posts_writer = csv.DictWriter(self.posts_file, fieldnames=adapter.field_names())
+            if not self.posts_written:
                 self.posts_writer.writeheader()
                 self.posts_written = True
             self.posts_writer.writerow(dict(adapter))
             
         elif item.__class__.__name__ == 'ReplyItem':
-            if not self.replies_written:
+            if self.replies_writer is None:
                 self.replies_writer = csv.DictWriter(self.replies_file, fieldnames=adapter.field_names())
+            if not self.replies_written:
                 self.replies_writer.writeheader()
                 self.replies_written = True
             self.replies_writer.writerow(dict(adapter))
@@ -310,69 +475,175 @@ class CsvWriterPipeline:
         return item
 
 
-class StatisticsPipeline:
-    """统计Pipeline"""
+class SqliteStoragePipeline:
+    """SQLite存储Pipeline - WAL模式，批量upsert帖子和回复"""
     
     def __init__(self):
-        self.posts_count = 0
-        self.replies_count = 0
-        self.start_time = None
+        self.store = None
 
     def open_spider(self, spider):
-        self.start_time = datetime.now()
-        logger.info("Statistics pipeline started")
+        self.store = SqliteStore.from_spider(spider)
+        self.store.open()
+        connect_checkpoint(spider.crawler, self.checkpoint)
+
+    def checkpoint(self):
+        self.store.flush()
 
     def close_spider(self, spider):
-        end_time = datetime.now()
-        duration = end_time - self.start_time
-        
-        stats_info = {
-            'total_posts': self.posts_count,
-            'total_replies': self.replies_count,
-            'start_time': self.start_time.isoformat(),
-            'end_time': end_time.isoformat(),
-            'duration_seconds': duration.total_seconds(),
-            'avg_posts_per_minute': self.posts_count / (duration.total_seconds() / 60) if duration.total_seconds() > 0 else 0,
-            'avg_replies_per_minute': self.replies_count / (duration.total_seconds() / 60) if duration.total_seconds() > 0 else 0,
-        }
-        
-        # 保存统计信息
-        output_dir = spider.settings.get('CUSTOM_SETTINGS', {}).get('OUTPUT_DIR', 'output')
-        with open(f'{output_dir}/statistics.json', 'w', encoding='utf-8') as f:
-            json.dump(stats_info, f, ensure_ascii=False, indent=2)
+        disconnect_checkpoint(spider.crawler, self.checkpoint)
+        self.store.close()
+
+    @timed_stage
+    def process_item(self, item, spider):
+        self.store.add(item.__class__.__name__, ItemAdapter(item).asdict())
+        return item
+
+
+class ExportPipeline:
+    """统一导出Pipeline - 每个item只转换一次，再分发到 EXPORT_SINKS 配置的各个导出目标"""
+    
+    def __init__(self, sink_specs, stats=None):
+        self.sink_specs = sink_specs
+        self.stats = stats
+        self.sinks = []
+        self.counters = {}  # 导出目标名 -> {'records': 条数, 'seconds': 累计耗时, 'errors': 错误数}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.getdict('EXPORT_SINKS'), crawler.stats)
+
+    def open_spider(self, spider):
+        for sink_path, options in self.sink_specs.items():
+            sink_cls = load_object(sink_path)
+            sink = sink_cls(**(options or {}))
+            sink.open(spider)
+            self.sinks.append(sink)
+            self.counters[sink.name] = {'records': 0, 'seconds': 0.0, 'errors': 0}
+        connect_checkpoint(spider.crawler, self.checkpoint)
             
-        logger.info(f"Crawling completed! Posts: {self.posts_count}, Replies: {self.replies_count}, Duration: {duration}")
+        logger.info(f"Export sinks initialized: {', '.join(sink.name for sink in self.sinks)}")
 
+    def checkpoint(self):
+        """断点续爬的检查点：各导出目标缓冲的记录写入磁盘"""
+        for sink in self.sinks:
+            try:
+                sink.flush()
+            except Exception as e:
+                logger.error(f"Export sink {sink.name} failed to flush: {e}")
+
+    @timed_stage
     def process_item(self, item, spider):
-        if item.__class__.__name__ == 'PostItem':
-            self.posts_count += 1
-        elif item.__class__.__name__ == 'ReplyItem':
-            self.replies_count += 1
+        item_type = item.__class__.__name__
+        record = ItemAdapter(item).asdict()
+        
+        for sink in self.sinks:
+            counter = self.counters[sink.name]
+            start = time.perf_counter()
+            try:
+                sink.write(item_type, record)
+                counter['records'] += 1
+            except Exception as e:
+                counter['errors'] += 1
+                logger.error(f"Export sink {sink.name} failed to write {item_type}: {e}")
+            elapsed = time.perf_counter() - start
+            counter['seconds'] += elapsed
+            if self.stats:
+                self.stats.inc_value(f'pipeline/ExportPipeline.{sink.name}/items')
+                self.stats.inc_value(f'pipeline/ExportPipeline.{sink.name}/seconds', elapsed)
             
         return item
 
+    def close_spider(self, spider):
+        disconnect_checkpoint(spider.crawler, self.checkpoint)
+        for sink in self.sinks:
+            try:
+                sink.close(spider)
+            except Exception as e:
+                logger.error(f"Error closing export sink {sink.name}: {e}")
+                
+            counter = self.counters[sink.name]
+            throughput = counter['records'] / counter['seconds'] if counter['seconds'] > 0 else 0
+            if self.stats:
+                self.stats.set_value(f'export/{sink.name}/records', counter['records'])
+                self.stats.set_value(f'export/{sink.name}/errors', counter['errors'])
+                self.stats.set_value(f'export/{sink.name}/seconds', round(counter['seconds'], 3))
+                self.stats.set_value(f'export/{sink.name}/records_per_second', round(throughput, 1))
+            logger.info(f"Export sink {sink.name}: {counter['records']} records, "
+                        f"{counter['errors']} errors, {throughput:.1f} records/s")
+
 
 class FilterPipeline:
-    """内容过滤Pipeline"""
+    """内容过滤Pipeline - 关键词表编译为Aho-Corasick自动机，标题和内容一次扫描；关键词文件修改后自动重新加载"""
     
-    def __init__(self):
-        # 可以添加需要过滤的关键词
-        self.blocked_keywords = [
-            # '广告', '推广', '代理'  # 示例关键词
-        ]
+    def __init__(self, keywords_file=None, action='drop', reload_interval=10.0, min_content_length=10, stats=None):
+        self.keywords_file = keywords_file
+        self.action = action  # 'drop' 丢弃 / 'flag' 在 matched_rules 字段中标记
+        self.reload_interval = reload_interval
+        self.min_content_length = min_content_length
+        self.stats = stats
+        self.automaton = KeywordAutomaton([])
+        self.keywords_mtime = None
+        self.last_reload_check = 0.0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        custom_settings = crawler.settings.get('CUSTOM_SETTINGS', {})
+        return cls(
+            keywords_file=custom_settings.get('FILTER_KEYWORDS_FILE'),
+            action=custom_settings.get('FILTER_ACTION', 'drop'),
+            reload_interval=custom_settings.get('FILTER_RELOAD_INTERVAL', 10.0),
+            min_content_length=custom_settings.get('FILTER_MIN_CONTENT_LENGTH', 10),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        self._reload_keywords()
 
+    def _reload_keywords(self):
+        """关键词文件的修改时间变化时重新编译自动机，加载失败则继续使用旧的自动机"""
+        self.last_reload_check = time.monotonic()
+        if not self.keywords_file:
+            return
+        try:
+            mtime = os.path.getmtime(self.keywords_file)
+        except OSError:
+            if self.keywords_mtime is None:
+                logger.warning(f"Filter keywords file not found: {self.keywords_file}")
+                self.keywords_mtime = 0
+            return
+        if mtime == self.keywords_mtime:
+            return
+        
+        try:
+            automaton = KeywordAutomaton.from_file(self.keywords_file)
+        except (OSError, UnicodeDecodeError) as e:
+            logger.error(f"Failed to load filter keywords {self.keywords_file}: {e}")
+            return
+        self.automaton = automaton
+        self.keywords_mtime = mtime
+        logger.info(f"Filter keywords loaded: {len(automaton)} keywords from {self.keywords_file}")
+
+    @timed_stage
     def process_item(self, item, spider):
+        if time.monotonic() - self.last_reload_check >= self.reload_interval:
+            self._reload_keywords()
+        
         adapter = ItemAdapter(item)
-        content = adapter.get('content', '')
-        title = adapter.get('title', '')
+        content = adapter.get('content') or ''
+        title = adapter.get('title') or ''
         
         # 检查是否包含屏蔽关键词
-        for keyword in self.blocked_keywords:
-            if keyword in content or keyword in title:
-                raise DropItem(f"Item contains blocked keyword: {keyword}")
+        matched_rules = sorted(self.automaton.find_rules(title, content))
+        if matched_rules:
+            if self.stats:
+                for rule in matched_rules:
+                    self.stats.inc_value(f'filter/rules/{rule}')
+            if self.action == 'drop':
+                raise DropItem(f"Item matched filter rules: {', '.join(matched_rules)}")
+            adapter['matched_rules'] = matched_rules
                 
         # 过滤空内容
-        if not content or len(content.strip()) < 10:
+        if len(content.strip()) < self.min_content_length:
             raise DropItem("Item content too short or empty")
             
-        return item 
\ No newline at end of file
+        return item 
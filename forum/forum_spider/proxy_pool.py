@@ -0,0 +1,233 @@
+"""
+健康度评分的代理池
+
+ProxyPool 记录每个代理的延迟EWMA、失败率EWMA和正在进行的请求数，供 middlewares.ProxyMiddleware 选择代理：
+
+- 选择“预计完成时间”最短的代理：延迟EWMA × (进行中请求数 + 1) / (1 - 失败率)，
+  因此请求按速度分配到各代理，慢代理只分到少量请求；每个代理最多 PROXY_MAX_CONCURRENCY 个并发请求，
+  所有代理都满时请求等待（不阻塞reactor），吞吐量随代理数量增长。
+- 连接错误、超时、PROXY_BAN_CODES 状态码和反爬虫拦截页计为失败。连续失败 PROXY_QUARANTINE_FAILURES 次、
+  或失败率超过 PROXY_MAX_FAILURE_RATE（至少 PROXY_MIN_SAMPLES 个请求后）时隔离该代理
+  PROXY_QUARANTINE_BASE 秒，连续隔离时翻倍（最长 PROXY_QUARANTINE_MAX）；隔离结束后第一个请求再失败立即重新隔离。
+- meta['proxy_pin'] 相同的请求使用同一个代理（该代理被隔离后改用其它代理）。PROXY_PIN_LIST_PAGES 开启时
+  列表页以自身URL作为 proxy_pin，ProxyPinMiddleware 把 proxy_pin 传给回调产生的帖子页、回复页请求。
+
+代理列表文件（PROXY_LIST_FILE）每行一个代理URL（可带用户名密码），# 开头的行为注释。
+"""
+
+import os
+import logging
+from collections import deque
+from urllib.parse import urlparse, unquote
+
+from scrapy import Request
+from twisted.internet import defer
+from w3lib.http import basic_auth_header
+
+logger = logging.getLogger(__name__)
+
+
+def load_proxies(path):
+    """读取代理列表文件，文件不存在时返回空列表"""
+    if not path or not os.path.exists(path):
+        return []
+    proxies = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                proxies.append(line if '://' in line else f'http://{line}')
+    return proxies
+
+
+class Proxy:
+    """单个代理的健康状态"""
+
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.name = f'{parsed.hostname}:{parsed.port}' if parsed.port else parsed.hostname
+        # meta['proxy'] 不带用户名密码，认证信息单独放在 Proxy-Authorization 头中
+        self.url = f'{parsed.scheme}://{self.name}'
+        self.auth = basic_auth_header(unquote(parsed.username), unquote(parsed.password or '')) if parsed.username else None
+        self.latency = None  # 延迟EWMA（秒）
+        self.failure_rate = 0.0  # 失败率EWMA
+        self.samples = 0  # 上次隔离以来的请求数
+        self.consecutive_failures = 0
+        self.inflight = 0
+        self.requests = 0
+        self.failures = 0
+        self.quarantines = 0  # 连续隔离次数（决定隔离时长）
+        self.quarantined_until = 0.0
+        self.probation = False
+
+
+class ProxyPool:
+    """按健康度分配请求的代理池"""
+
+    def __init__(self, urls, stats, max_concurrency=2, alpha=0.3, quarantine_failures=3, max_failure_rate=0.5,
+                 min_samples=5, quarantine_base=60.0, quarantine_max=1800.0, clock=None):
+        self.proxies = {}
+        for url in urls:
+            proxy = Proxy(url)
+            self.proxies[proxy.url] = proxy
+        self.stats = stats
+        self.max_concurrency = max_concurrency
+        self.alpha = alpha
+        self.quarantine_failures = quarantine_failures
+        self.max_failure_rate = max_failure_rate
+        self.min_samples = min_samples
+        self.quarantine_base = quarantine_base
+        self.quarantine_max = quarantine_max
+        self.clock = clock
+        self.pins = {}  # proxy_pin -> 代理URL
+        self.waiters = deque()  # (Deferred, proxy_pin)，按到达顺序
+
+    def _now(self):
+        if self.clock is None:
+            from twisted.internet import reactor
+            self.clock = reactor
+        return self.clock.seconds()
+
+    def __len__(self):
+        return len(self.proxies)
+
+    def _usable(self, proxy, now):
+        return proxy.quarantined_until <= now
+
+    def _default_latency(self):
+        known = [proxy.latency for proxy in self.proxies.values() if proxy.latency is not None]
+        return sum(known) / len(known) if known else 1.0
+
+    def score(self, proxy, default_latency=None):
+        """把下一个请求交给该代理的预计完成时间，越小越好"""
+        latency = proxy.latency if proxy.latency is not None else (default_latency or self._default_latency())
+        return latency * (proxy.inflight + 1) / max(0.05, 1.0 - proxy.failure_rate)
+
+    def acquire(self, pin=None):
+        """选出一个代理并占用一个并发名额，没有可用代理时返回None"""
+        now = self._now()
+        if pin is not None and pin in self.pins:
+            proxy = self.proxies[self.pins[pin]]
+            if self._usable(proxy, now):
+                if proxy.inflight >= self.max_concurrency:
+                    return None
+                return self._take(proxy, now)
+        default_latency = self._default_latency()
+        candidates = [proxy for proxy in self.proxies.values()
+                      if self._usable(proxy, now) and proxy.inflight < self.max_concurrency]
+        if not candidates:
+            return None
+        proxy = min(candidates, key=lambda candidate: self.score(candidate, default_latency))
+        if pin is not None:
+            self.pins[pin] = proxy.url
+        return self._take(proxy, now)
+
+    def _take(self, proxy, now):
+        if proxy.quarantines and proxy.quarantined_until and not proxy.probation:
+            # 隔离结束后的第一个请求
+            proxy.probation = True
+            proxy.quarantined_until = 0.0
+            logger.info(f"Proxy {proxy.name} back from quarantine (on probation)")
+        proxy.inflight += 1
+        proxy.requests += 1
+        self.stats.inc_value('proxy/requests')
+        return proxy
+
+    def release(self, proxy, latency=None, failed=False):
+        """请求结束：归还并发名额并更新健康度"""
+        proxy.inflight -= 1
+        self._record(proxy, latency, failed)
+        self._wake()
+
+    def record_ban(self, url):
+        """请求已结束但响应被判定为拦截页（反爬虫检测），按失败计入"""
+        proxy = self.proxies.get(url)
+        if proxy is not None:
+            self.stats.inc_value('proxy/bans')
+            self._record(proxy, None, True)
+
+    def _record(self, proxy, latency, failed):
+        if latency is not None and not failed:
+            proxy.latency = latency if proxy.latency is None else proxy.latency + self.alpha * (latency - proxy.latency)
+        proxy.failure_rate += self.alpha * ((1.0 if failed else 0.0) - proxy.failure_rate)
+        proxy.samples += 1
+        if not failed:
+            proxy.consecutive_failures = 0
+            if proxy.probation:
+                proxy.probation = False
+                proxy.quarantines = max(0, proxy.quarantines - 1)
+            return
+        proxy.failures += 1
+        proxy.consecutive_failures += 1
+        self.stats.inc_value('proxy/failures')
+        if proxy.quarantined_until > self._now():
+            return
+        if (proxy.probation or proxy.consecutive_failures >= self.quarantine_failures
+                or (proxy.samples >= self.min_samples and proxy.failure_rate > self.max_failure_rate)):
+            self._quarantine(proxy)
+
+    def _quarantine(self, proxy):
+        proxy.quarantines += 1
+        duration = min(self.quarantine_base * 2 ** (proxy.quarantines - 1), self.quarantine_max)
+        proxy.quarantined_until = self._now() + duration
+        proxy.probation = False
+        proxy.consecutive_failures = 0
+        proxy.failure_rate = 0.0
+        proxy.samples = 0
+        self.stats.inc_value('proxy/quarantined')
+        logger.warning(f"Proxy {proxy.name} quarantined for {duration:.0f}s "
+                       f"({proxy.failures}/{proxy.requests} failed, quarantine #{proxy.quarantines})")
+        # 隔离结束时唤醒等待中的请求
+        self.clock.callLater(duration, self._wake)
+        if all(not self._usable(other, self._now()) for other in self.proxies.values()):
+            logger.warning("All proxies are quarantined, requests wait until one comes back")
+
+    def wait(self, pin=None):
+        """等待代理可用（释放并发名额或隔离结束），返回的Deferred以分配到的代理触发"""
+        d = defer.Deferred()
+        self.waiters.append((d, pin))
+        return d
+
+    def _wake(self):
+        """按到达顺序把空出的名额分给等待中的请求；绑定的代理仍然满载的请求留在原位，不占用其它代理空出的名额"""
+        # 原地轮转：回调中可能同步归还名额并再次进入 _wake
+        for _ in range(len(self.waiters)):
+            if not self.waiters:
+                break
+            d, pin = self.waiters.popleft()
+            if d.called:
+                # 已被取消
+                continue
+            proxy = self.acquire(pin)
+            if proxy is None:
+                self.waiters.append((d, pin))
+                continue
+            d.callback(proxy)
+
+    def report(self):
+        """每个代理的统计，写入stats"""
+        for proxy in self.proxies.values():
+            prefix = f'proxy/{proxy.name}'
+            self.stats.set_value(f'{prefix}/requests', proxy.requests)
+            self.stats.set_value(f'{prefix}/failures', proxy.failures)
+            self.stats.set_value(f'{prefix}/quarantines', proxy.quarantines)
+            if proxy.latency is not None:
+                self.stats.set_value(f'{prefix}/latency_ms', round(proxy.latency * 1000))
+
+
+class ProxyPinMiddleware:
+    """Spider中间件：回调产生的请求继承响应请求的 meta['proxy_pin']（已设置的不覆盖）"""
+
+    def process_spider_output(self, response, result, spider):
+        pin = response.meta.get('proxy_pin')
+        for output in result:
+            if pin is not None and isinstance(output, Request):
+                output.meta.setdefault('proxy_pin', pin)
+            yield output
+
+    async def process_spider_output_async(self, response, result, spider):
+        pin = response.meta.get('proxy_pin')
+        async for output in result:
+            if pin is not None and isinstance(output, Request):
+                output.meta.setdefault('proxy_pin', pin)
+            yield output
@@ -0,0 +1,66 @@
+"""
+回复分页重组
+
+帖子的回复页并发请求，响应到达顺序不确定。ReplyReassembler 按帖子缓存已到达的回复页，
+只有当前面的页都已到达（或失败）时才按页码顺序放出回复，保证Pipeline收到的回复按楼层递增，
+并在放出时执行每帖回复数上限。
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ReplyReassembler:
+    """按楼层顺序放出并发抓取的回复页"""
+
+    def __init__(self, max_replies):
+        self.max_replies = max_replies
+        self.threads = {}  # 帖子ID -> 重组状态
+
+    def expect(self, post_id, num_pages, first_page=1):
+        """登记帖子需要抓取的回复页 first_page..num_pages（增量重爬时从第一个未见楼层所在页开始）"""
+        self.threads[post_id] = {
+            'pending': set(range(first_page, num_pages + 1)),
+            'buffer': {},  # 页码 -> 回复列表
+            'next_page': first_page,
+            'emitted': 0,
+        }
+
+    def add(self, post_id, page, replies):
+        """加入一页回复，返回现在可以按顺序放出的回复"""
+        state = self.threads.get(post_id)
+        if state is None or page not in state['pending']:
+            logger.warning(f"Unexpected reply page {page} for post {post_id}, ignoring")
+            return []
+        state['pending'].discard(page)
+        state['buffer'][page] = replies
+        return self._release(post_id, state)
+
+    def fail(self, post_id, page):
+        """回复页抓取失败，按空页处理，避免阻塞后续页"""
+        logger.warning(f"Reply page {page} of post {post_id} failed, skipping its replies")
+        return self.add(post_id, page, [])
+
+    def _release(self, post_id, state):
+        released = []
+        buffer = state['buffer']
+        while state['next_page'] in buffer:
+            for reply in buffer.pop(state['next_page']):
+                if state['emitted'] >= self.max_replies:
+                    break
+                released.append(reply)
+                state['emitted'] += 1
+            state['next_page'] += 1
+
+        if not state['pending'] and not buffer:
+            del self.threads[post_id]
+        return released
+
+    def is_pending(self, post_id):
+        """帖子是否还有回复页未到达"""
+        return post_id in self.threads
+
+    def incomplete(self):
+        """仍在等待回复页的帖子：帖子ID -> 未到达的页码"""
+        return {post_id: sorted(state['pending']) for post_id, state in self.threads.items()}
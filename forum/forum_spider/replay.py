@@ -0,0 +1,385 @@
+"""
+离线回放模式
+
+从已录制的语料（HTTP缓存数据库、Scrapy缓存目录，或WARC文件/目录）直接返回响应，不访问网络、没有下载延迟和限速，
+用于在成千上万个页面上快速对比提取改动的耗时和结果。
+
+- ReplayMiddleware（下载器中间件）：按请求URL从语料中取出响应；语料中没有的请求以 IgnoreRequest 结束，
+  交给请求的errback处理。HTTP缓存按记录的请求URL建立索引，不依赖请求指纹，
+  因此请求头或指纹算法变化后仍能命中，也不受 HTTPCACHE_EXPIRATION_SECS 限制。
+- ReplayTimingMiddleware（爬虫中间件）：统计回调解析的耗时，结束时报告吞吐量；
+  PipelineTimerStart / PipelineTimerEnd 排在所有Pipeline的首尾，统计item在Pipeline中的耗时。
+
+这些组件都已在 settings.py 中注册，CUSTOM_SETTINGS 的 REPLAY_ENABLED 为False时不启用。
+apply_replay_settings() 切换到回放模式：关闭下载延迟、AutoThrottle、重试、HTTP缓存和断点续爬，
+并移除 http/https 下载处理器，确保不会发出真实请求。WARC语料需要安装 warcio。
+"""
+
+import os
+import ast
+import gzip
+import time
+import sqlite3
+import logging
+
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from w3lib.http import headers_raw_to_dict
+from w3lib.url import canonicalize_url
+
+from forum_spider.httpcache import cache_db_path, decompress
+
+try:
+    from warcio.archiveiterator import ArchiveIterator
+except ImportError:  # 可选依赖，只有WARC语料需要
+    ArchiveIterator = None
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b'\x1f\x8b'
+SQLITE_MAGIC = b'SQLite format 3\x00'
+
+
+def apply_replay_settings(settings, source=None, priority='cmdline'):
+    """把 settings 切换为回放模式，source 为语料路径（默认为该爬虫的HTTP缓存目录）"""
+    custom_settings = dict(settings.get('CUSTOM_SETTINGS', {}))
+    custom_settings['REPLAY_ENABLED'] = True
+    custom_settings['AIMD_ENABLED'] = False
+    custom_settings['FRONTIER_ENABLED'] = False
+    if source:
+        custom_settings['REPLAY_SOURCE'] = source
+    settings.set('CUSTOM_SETTINGS', custom_settings, priority=priority)
+    concurrency = custom_settings.get('REPLAY_CONCURRENT_REQUESTS', 64)
+    settings.set('DOWNLOAD_DELAY', 0, priority=priority)
+    settings.set('RANDOMIZE_DOWNLOAD_DELAY', False, priority=priority)
+    settings.set('AUTOTHROTTLE_ENABLED', False, priority=priority)
+    settings.set('RETRY_ENABLED', False, priority=priority)
+    settings.set('HTTPCACHE_ENABLED', False, priority=priority)
+    settings.set('CONCURRENT_REQUESTS', concurrency, priority=priority)
+    settings.set('CONCURRENT_REQUESTS_PER_DOMAIN', concurrency, priority=priority)
+    settings.set('CONCURRENT_REQUESTS_PER_IP', 0, priority=priority)
+    settings.set('DOWNLOAD_HANDLERS', {'http': None, 'https': None}, priority=priority)
+
+
+def default_source(settings, spider_name):
+    """默认语料：该爬虫的SQLite缓存数据库，不存在时为文件系统缓存目录"""
+    path = cache_db_path(settings, spider_name)
+    if os.path.exists(path):
+        return path
+    return os.path.join(data_path(settings.get('HTTPCACHE_DIR', 'httpcache')), spider_name)
+
+
+def replay_enabled(settings):
+    return settings.get('CUSTOM_SETTINGS', {}).get('REPLAY_ENABLED', False)
+
+
+def _url_key(method, url):
+    return method.upper(), canonicalize_url(url)
+
+
+class HttpCacheCorpus:
+    """Scrapy FilesystemCacheStorage 目录：(请求方法, URL) -> 缓存条目目录，同一URL保留最新的条目"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}  # (方法, 规范化URL) -> (meta, 条目目录, 是否gzip)
+
+    def load(self):
+        for root, _, files in os.walk(self.path):
+            if 'meta' not in files or 'response_body' not in files:
+                continue
+            meta, compressed = self._read_meta(root)
+            if meta is None:
+                continue
+            key = _url_key(meta.get('method', 'GET'), meta['url'])
+            if key not in self.entries or self.entries[key][0].get('timestamp', 0) < meta.get('timestamp', 0):
+                self.entries[key] = (meta, root, compressed)
+        return self
+
+    @staticmethod
+    def _read(root, name, compressed):
+        """读取缓存文件；HTTPCACHE_GZIP 写入的文件整体是gzip格式"""
+        with open(os.path.join(root, name), 'rb') as f:
+            data = f.read()
+        return gzip.decompress(data) if compressed else data
+
+    def _read_meta(self, root):
+        with open(os.path.join(root, 'meta'), 'rb') as f:
+            data = f.read()
+        compressed = data[:2] == GZIP_MAGIC
+        if compressed:
+            data = gzip.decompress(data)
+        try:
+            meta = ast.literal_eval(data.decode('utf-8'))
+        except (ValueError, SyntaxError, UnicodeDecodeError):
+            logger.warning(f"Unreadable cache meta in {root}")
+            return None, compressed
+        return (meta if isinstance(meta, dict) and meta.get('url') else None), compressed
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, method, url):
+        """返回 (状态码, 响应URL, 响应头, 响应体)，没有该URL时返回None"""
+        entry = self.entries.get(_url_key(method, url))
+        if entry is None:
+            return None
+        meta, root, compressed = entry
+        return (meta['status'], meta.get('response_url') or meta['url'],
+                headers_raw_to_dict(self._read(root, 'response_headers', compressed)),
+                self._read(root, 'response_body', compressed))
+
+
+class SqliteCacheCorpus:
+    """httpcache.SqliteCacheStorage 的缓存数据库：(请求方法, URL) -> 条目指纹，同一URL保留最新的条目"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.entries = {}
+
+    def load(self):
+        self.conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+        for fingerprint, method, url in self.conn.execute(
+                "SELECT fingerprint, method, request_url FROM responses ORDER BY stored_at"):
+            self.entries[_url_key(method, url)] = fingerprint
+        return self
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, method, url):
+        fingerprint = self.entries.get(_url_key(method, url))
+        if fingerprint is None:
+            return None
+        status, response_url, headers, body, codec = self.conn.execute(
+            "SELECT status, url, headers, body, codec FROM responses WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        return status, response_url, headers_raw_to_dict(headers), decompress(body, codec)
+
+
+class WarcCorpus:
+    """WARC文件（或目录下的所有 .warc / .warc.gz 文件）中的 response 记录：(方法, URL) -> (文件, 偏移)"""
+
+    def __init__(self, path):
+        if ArchiveIterator is None:
+            raise RuntimeError("WARC replay requires the 'warcio' package")
+        self.path = path
+        self.entries = {}
+
+    def _files(self):
+        if os.path.isfile(self.path):
+            return [self.path]
+        return sorted(os.path.join(root, name) for root, _, files in os.walk(self.path)
+                      for name in files if name.endswith(('.warc', '.warc.gz')))
+
+    def load(self):
+        for path in self._files():
+            with open(path, 'rb') as f:
+                records = ArchiveIterator(f)
+                for record in records:
+                    if record.rec_type != 'response':
+                        continue
+                    url = record.rec_headers.get_header('WARC-Target-URI')
+                    if url:
+                        # 后出现的记录覆盖先出现的，与HTTP缓存保留最新条目一致
+                        self.entries[_url_key('GET', url)] = (path, records.get_record_offset())
+        return self
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, method, url):
+        entry = self.entries.get(_url_key(method, url))
+        if entry is None:
+            return None
+        path, offset = entry
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            record = next(iter(ArchiveIterator(f)))
+            headers = {name: value for name, value in record.http_headers.headers}
+            # warcio 已解除分块传输编码，Content-Encoding 由 HttpCompressionMiddleware 处理
+            headers.pop('Transfer-Encoding', None)
+            status = int(record.http_headers.get_statuscode())
+            return status, url, headers, record.content_stream().read()
+
+
+def load_corpus(path):
+    """按路径判断语料类型：SQLite缓存数据库、.warc/.warc.gz 文件或含WARC文件的目录为WARC，否则为HTTP缓存目录"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Replay corpus not found: {path}")
+    if os.path.isfile(path):
+        with open(path, 'rb') as f:
+            if f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC:
+                return SqliteCacheCorpus(path).load()
+    if os.path.isfile(path) or any(name.endswith(('.warc', '.warc.gz')) for name in os.listdir(path)):
+        return WarcCorpus(path).load()
+    return HttpCacheCorpus(path).load()
+
+
+class ReplayMiddleware:
+    """从录制的语料返回响应，语料中没有的请求直接忽略"""
+
+    def __init__(self, crawler, source):
+        self.crawler = crawler
+        self.source = source
+        self.corpus = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not replay_enabled(crawler.settings):
+            raise NotConfigured
+        source = crawler.settings.get('CUSTOM_SETTINGS', {}).get('REPLAY_SOURCE') or default_source(
+            crawler.settings, crawler.spidercls.name)
+        middleware = cls(crawler, source)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        return middleware
+
+    def spider_opened(self, spider):
+        start = time.perf_counter()
+        self.corpus = load_corpus(self.source)
+        seconds = time.perf_counter() - start
+        self.crawler.stats.set_value('replay/corpus_entries', len(self.corpus))
+        logger.info(f"Replay corpus {self.source}: {len(self.corpus)} responses indexed in {seconds:.2f}s")
+
+    def process_request(self, request, spider):
+        stats = self.crawler.stats
+        recorded = self.corpus.get(request.method, request.url)
+        if recorded is None:
+            stats.inc_value('replay/misses')
+            logger.debug(f"Not in replay corpus: {request.url}")
+            raise IgnoreRequest(f"Not in replay corpus: {request.url}")
+
+        status, url, headers, body = recorded
+        headers = Headers(headers)
+        response_cls = responsetypes.from_args(headers=headers, url=url, body=body)
+        stats.inc_value('replay/responses')
+        stats.inc_value('replay/response_bytes', len(body))
+        request.meta['download_latency'] = 0
+        return response_cls(url=url, status=status, headers=headers, body=body, request=request,
+                            flags=['replay'])
+
+
+class ReplayTimer:
+    """回放吞吐量统计，由 ReplayTimingMiddleware 和两个Pipeline计时器共用（每个crawler一个）"""
+
+    def __init__(self):
+        self.parse_seconds = 0.0
+        self.pipeline_seconds = 0.0
+        self.pages = 0
+        self.items = 0
+        self.started = None
+        self.item_started = {}  # id(item) -> 进入第一个Pipeline的时间
+
+    @classmethod
+    def of(cls, crawler):
+        if getattr(crawler, 'replay_timer', None) is None:
+            crawler.replay_timer = cls()
+        return crawler.replay_timer
+
+    def item_done(self, item):
+        start = self.item_started.pop(id(item), None)
+        if start is not None:
+            self.pipeline_seconds += time.perf_counter() - start
+
+
+class ReplayTimingMiddleware:
+    """统计回调解析耗时（迭代回调输出的时间），结束时报告吞吐量"""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.timer = ReplayTimer.of(crawler)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not replay_enabled(crawler.settings):
+            raise NotConfigured
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_opened(self, spider):
+        self.timer.started = time.perf_counter()
+
+    def process_spider_output(self, response, result, spider):
+        self.timer.pages += 1
+        iterator = iter(result)
+        while True:
+            start = time.perf_counter()
+            try:
+                output = next(iterator)
+            except StopIteration:
+                self.timer.parse_seconds += time.perf_counter() - start
+                return
+            self.timer.parse_seconds += time.perf_counter() - start
+            yield output
+
+    async def process_spider_output_async(self, response, result, spider):
+        self.timer.pages += 1
+        iterator = result.__aiter__()
+        while True:
+            start = time.perf_counter()
+            try:
+                output = await iterator.__anext__()
+            except StopAsyncIteration:
+                self.timer.parse_seconds += time.perf_counter() - start
+                return
+            self.timer.parse_seconds += time.perf_counter() - start
+            yield output
+
+    def spider_closed(self, spider, reason):
+        timer = self.timer
+        stats = self.crawler.stats
+        wall_seconds = time.perf_counter() - timer.started if timer.started else 0.0
+        stats.set_value('replay/wall_seconds', round(wall_seconds, 3))
+        stats.set_value('replay/parse_seconds', round(timer.parse_seconds, 3))
+        stats.set_value('replay/pipeline_seconds', round(timer.pipeline_seconds, 3))
+        stats.set_value('replay/pages_per_second', round(timer.pages / wall_seconds, 1) if wall_seconds else 0)
+        stats.set_value('replay/items_per_second', round(timer.items / wall_seconds, 1) if wall_seconds else 0)
+        logger.info(
+            f"Replay: {timer.pages} pages, {timer.items} items in {wall_seconds:.2f}s "
+            f"({timer.pages / max(wall_seconds, 1e-9):.1f} pages/s, {timer.items / max(wall_seconds, 1e-9):.1f} items/s); "
+            f"parse {timer.parse_seconds:.2f}s ({timer.pages / max(timer.parse_seconds, 1e-9):.1f} pages/s), "
+            f"pipelines {timer.pipeline_seconds:.2f}s ({timer.items / max(timer.pipeline_seconds, 1e-9):.1f} items/s)")
+
+
+class PipelineTimerStart:
+    """排在所有Pipeline之前，记录item进入Pipeline的时间"""
+
+    def __init__(self, timer):
+        self.timer = timer
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not replay_enabled(crawler.settings):
+            raise NotConfigured
+        timer = ReplayTimer.of(crawler)
+        # 被中途丢弃或出错的item在信号中结束计时
+        for signal in (signals.item_dropped, signals.item_error):
+            crawler.signals.connect(lambda item, **kwargs: timer.item_done(item), signal=signal, weak=False)
+        return cls(timer)
+
+    def process_item(self, item, spider):
+        self.timer.items += 1
+        self.timer.item_started[id(item)] = time.perf_counter()
+        return item
+
+
+class PipelineTimerEnd:
+    """排在所有Pipeline之后，累计item在Pipeline中的耗时"""
+
+    def __init__(self, timer):
+        self.timer = timer
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not replay_enabled(crawler.settings):
+            raise NotConfigured
+        return cls(ReplayTimer.of(crawler))
+
+    def process_item(self, item, spider):
+        self.timer.item_done(item)
+        return item
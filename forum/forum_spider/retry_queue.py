@@ -0,0 +1,94 @@
+"""
+延迟重试队列
+
+CustomRetryMiddleware 和 ResponseValidationMiddleware 重新入队的请求在 meta['retry_not_before']
+中记录最早可下载的时间（time.time()）。DelayedRetryQueue 扩展在 request_scheduled 信号中拦截这些请求，
+放入按到期时间排序的堆，不进入调度器、不占用下载器的并发名额；定时器每隔 RETRY_QUEUE_INTERVAL 秒
+把到期的请求重新交给引擎调度。整个过程不阻塞reactor，其它请求照常下载。
+
+队列非空时爬虫不会因空闲而关闭；爬虫关闭时仍在队列中的请求数记入 retry/parked_at_close。
+"""
+
+import time
+import heapq
+import itertools
+import logging
+
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest
+from twisted.internet import task
+
+logger = logging.getLogger(__name__)
+
+NOT_BEFORE_KEY = 'retry_not_before'
+
+
+def delay_request(request, delay):
+    """标记请求至少 delay 秒后才能下载（由 DelayedRetryQueue 暂存）"""
+    if delay > 0:
+        request.meta[NOT_BEFORE_KEY] = time.time() + delay
+    return request
+
+
+class DelayedRetryQueue:
+    """按到期时间暂存重试请求的扩展"""
+
+    def __init__(self, crawler, interval=0.5):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.interval = interval
+        self.heap = []  # (到期时间, 序号, 请求)
+        self.counter = itertools.count()
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        custom_settings = crawler.settings.get('CUSTOM_SETTINGS', {})
+        ext = cls(crawler, interval=custom_settings.get('RETRY_QUEUE_INTERVAL', 0.5))
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(ext.request_scheduled, signal=signals.request_scheduled)
+        return ext
+
+    def spider_opened(self, spider):
+        self.task = task.LoopingCall(self.release_due)
+        self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+        if self.heap:
+            self.stats.set_value('retry/parked_at_close', len(self.heap))
+            logger.warning(f"{len(self.heap)} delayed retries were still waiting when the spider closed")
+            self.heap.clear()
+
+    def spider_idle(self, spider):
+        if self.heap:
+            raise DontCloseSpider
+
+    def request_scheduled(self, request, spider):
+        not_before = request.meta.pop(NOT_BEFORE_KEY, None)
+        if not_before is None:
+            return
+        wait = not_before - time.time()
+        if wait <= 0:
+            return
+        heapq.heappush(self.heap, (not_before, next(self.counter), request))
+        self.stats.inc_value('retry/parked')
+        self.stats.inc_value('retry/wait_seconds', round(wait, 3))
+        self.stats.max_value('retry/max_wait_seconds', round(wait, 3))
+        self.stats.max_value('retry/max_parked', len(self.heap))
+        logger.debug(f"Parked {request.url} for {wait:.1f}s")
+        # 引擎收到 IgnoreRequest 后不把请求交给调度器（也不调用errback），到期后由 release_due 重新调度
+        raise IgnoreRequest(f"Delayed retry: {request.url}")
+
+    def release_due(self):
+        now = time.time()
+        while self.heap and self.heap[0][0] <= now:
+            _, _, request = heapq.heappop(self.heap)
+            self.stats.inc_value('retry/released')
+            self.crawler.engine.crawl(request)
+
+    def __len__(self):
+        return len(self.heap)
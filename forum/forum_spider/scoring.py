@@ -0,0 +1,87 @@
+"""
+帖子热度评分
+
+列表页的每个帖子带有回复数、查看数和最后回复时间。请求预算有限时，应当先抓取每个请求能带来
+更多新回复的帖子：ThreadHotness 汇总这些信息，评分函数（HOTNESS_SCORER，点分路径，
+签名为 ``score(thread) -> float``）返回热度分，爬虫用 to_priority() 换算为详情页请求的优先级。
+
+默认的 reply_yield 按“预计新回复数 / 所需请求数”评分（受 MAX_REPLIES_PER_POST 限制），
+按最后回复时间衰减，查看数只用于区分回复数相近的帖子。
+"""
+
+import re
+import math
+from collections import namedtuple
+from datetime import datetime
+
+from forum_spider.discuz_api import FORUM_TIMEZONE
+
+ThreadHotness = namedtuple('ThreadHotness', [
+    'post_id',
+    'replies',  # 列表页显示的回复数，取不到为None
+    'views',  # 查看数，取不到为None
+    'age_hours',  # 距最后回复的小时数，取不到为None
+    'known_replies',  # 已爬取的回复数（增量重爬），新帖子为None
+    'max_replies',  # MAX_REPLIES_PER_POST
+    'posts_per_page',  # 每页楼层数
+])
+
+_ABSOLUTE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})(?:\s+(\d{1,2}):(\d{1,2}))?')
+_RELATIVE = re.compile(r'(\d+|半)\s*(秒|分钟|小时|天)前')
+_RELATIVE_HOURS = {'秒': 1 / 3600, '分钟': 1 / 60, '小时': 1, '天': 24}
+_DAYS_AGO = {'刚刚': 0, '昨天': 24, '前天': 48}
+
+
+def age_hours(text, now=None):
+    """Discuz显示的时间（“2025-8-1 12:05”、“3 小时前”、“昨天 12:00”等）距现在的小时数，无法识别时返回None"""
+    if not text:
+        return None
+    now = now or datetime.now(FORUM_TIMEZONE)
+    match = _ABSOLUTE.search(text)
+    if match:
+        year, month, day, hour, minute = (int(value) if value else 0 for value in match.groups())
+        try:
+            moment = datetime(year, month, day, hour, minute, tzinfo=FORUM_TIMEZONE)
+        except ValueError:
+            return None
+        return max(0.0, (now - moment).total_seconds() / 3600)
+    match = _RELATIVE.search(text)
+    if match:
+        count = 0.5 if match.group(1) == '半' else int(match.group(1))
+        return count * _RELATIVE_HOURS[match.group(2)]
+    for word, hours in _DAYS_AGO.items():
+        if word in text:
+            return hours
+    return None
+
+
+def expected_new_replies(thread):
+    """本次抓取预计得到的新回复数"""
+    if thread.replies is None:
+        return 0
+    new_replies = thread.replies - (thread.known_replies or 0)
+    return max(0, min(new_replies, thread.max_replies))
+
+
+def expected_requests(thread):
+    """抓取预计新回复所需的请求数：新帖子从第1楼（主帖）开始，增量重爬从第一个新楼层所在页开始"""
+    per_page = max(1, thread.posts_per_page)
+    floors = expected_new_replies(thread)
+    if thread.known_replies is None:
+        floors += 1
+    return max(1, math.ceil(floors / per_page))
+
+
+def reply_yield(thread):
+    """每个请求预计得到的新回复数，24小时内有回复的帖子加权，查看数作为次要依据"""
+    score = expected_new_replies(thread) / expected_requests(thread)
+    if thread.age_hours is not None:
+        score *= 1 + 1 / (1 + thread.age_hours / 24)
+    if thread.views:
+        score += 0.1 * math.log10(1 + thread.views)
+    return score
+
+
+def to_priority(score, scale, max_priority):
+    """热度分换算为 [-max_priority-1, -1] 范围内的请求优先级：低于列表页和回复页，热度越高越优先"""
+    return min(max(int(score * scale), 0), max_priority) - max_priority - 1
@@ -0,0 +1,219 @@
+"""
+跨运行持久化的已见集合
+
+帖子ID和回复键保存在SQLite表中（WITHOUT ROWID 主键索引），查询直接走磁盘索引，
+内存中只保留尚未提交的一小批新键，因此启动开销与已有帖子数量无关，内存也不会随回复数增长。
+
+可选启用帖子ID的可扩展布隆过滤器作为第一级判断：过滤器判定不存在时直接返回，
+只有判定可能存在时才查询数据库。
+
+threads 表记录每个帖子上次完整抓取时列表页显示的回复数和最后回复时间，用于增量重爬：
+两者都没有变化的帖子直接跳过，变化的帖子从第一个未见楼层所在的回复页开始抓取
+（按同时记录的该帖子实测的每页楼层数计算页码）。
+
+开启断点续爬（FRONTIER_ENABLED）时不按批量大小/时间自动提交，只在 FrontierScheduler 的检查点提交，
+保证已见集合与输出文件、请求队列处于同一个检查点。
+"""
+
+import os
+import time
+import sqlite3
+import logging
+
+from forum_spider.bloom import ScalableBloomFilter
+from forum_spider.frontier import frontier_enabled
+
+logger = logging.getLogger(__name__)
+
+POST = 'post'
+REPLY = 'reply'
+
+
+class SeenStore:
+    """磁盘持久化的已见键集合"""
+
+    def __init__(self, path, batch_size=1000, commit_interval=5.0,
+                 bloom_path=None, bloom_error_rate=0.001, bloom_capacity=100000, checkpointed=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.checkpointed = checkpointed  # 只在调用 flush() 时提交（断点续爬的检查点）
+        self.conn = None
+        self.pending = set()  # 尚未写入数据库的 (kind, key)
+        self.pending_threads = {}  # 尚未写入数据库的帖子状态：帖子ID -> (回复数, 最后回复时间, 每页楼层数)
+        self.last_commit = time.monotonic()
+        
+        # 帖子ID布隆过滤器（可选）
+        self.bloom_path = bloom_path
+        self.bloom_error_rate = bloom_error_rate
+        self.bloom_capacity = bloom_capacity
+        self.bloom = None
+        self.bloom_counters = {'negatives': 0, 'positives': 0, 'false_positives': 0}
+
+    @classmethod
+    def from_settings(cls, settings):
+        """按 CUSTOM_SETTINGS 创建，数据库文件位于输出目录下"""
+        custom_settings = settings.get('CUSTOM_SETTINGS', {})
+        output_dir = custom_settings.get('OUTPUT_DIR', 'output')
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        bloom_path = None
+        if custom_settings.get('BLOOM_FILTER_ENABLED', False):
+            bloom_path = os.path.join(output_dir, custom_settings.get('BLOOM_FILTER_FILE', 'seen_posts.bloom'))
+        return cls(
+            os.path.join(output_dir, custom_settings.get('SEEN_STORE_DB', 'seen.db')),
+            batch_size=custom_settings.get('SEEN_STORE_BATCH_SIZE', 1000),
+            bloom_path=bloom_path,
+            bloom_error_rate=custom_settings.get('BLOOM_FILTER_ERROR_RATE', 0.001),
+            bloom_capacity=custom_settings.get('BLOOM_FILTER_INITIAL_CAPACITY', 100000),
+            checkpointed=frontier_enabled(settings),
+        )
+
+    def open(self):
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen (kind TEXT NOT NULL, key TEXT NOT NULL, "
+            "PRIMARY KEY (kind, key)) WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS threads (post_id TEXT PRIMARY KEY, reply_count INTEGER, "
+            "last_post TEXT, posts_per_page INTEGER) WITHOUT ROWID"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(threads)")]
+        if 'posts_per_page' not in columns:
+            # 之前的版本创建的数据库
+            self.conn.execute("ALTER TABLE threads ADD COLUMN posts_per_page INTEGER")
+        self.conn.commit()
+        logger.info(f"Seen store opened: {self.path}")
+        
+        if self.bloom_path:
+            self._open_bloom()
+
+    def _open_bloom(self):
+        """加载布隆过滤器；文件不存在或与数据库不同步（如上次异常退出）时从数据库重建"""
+        post_count = self.conn.execute("SELECT COUNT(*) FROM seen WHERE kind = ?", (POST,)).fetchone()[0]
+        
+        if os.path.exists(self.bloom_path):
+            self.bloom = ScalableBloomFilter.load(self.bloom_path)
+            if self.bloom.keys_added == post_count:
+                logger.info(f"Bloom filter loaded: {self.bloom_path} {self.bloom.metrics()}")
+                return
+            logger.warning(f"Bloom filter out of sync ({self.bloom.keys_added} keys, store has {post_count}), rebuilding")
+            self.bloom.close()
+        
+        self.bloom = ScalableBloomFilter(self.bloom_error_rate, self.bloom_capacity)
+        for (key,) in self.conn.execute("SELECT key FROM seen WHERE kind = ?", (POST,)):
+            self.bloom.add(key)
+        logger.info(f"Bloom filter built from seen store: {self.bloom.metrics()}")
+
+    def contains(self, kind, key):
+        # 布隆过滤器判定不存在时一定不存在，无需查询数据库
+        if self.bloom is not None and kind == POST:
+            if key not in self.bloom:
+                self.bloom_counters['negatives'] += 1
+                return False
+            self.bloom_counters['positives'] += 1
+            found = self._contains_exact(kind, key)
+            if not found:
+                self.bloom_counters['false_positives'] += 1
+            return found
+        return self._contains_exact(kind, key)
+
+    def _contains_exact(self, kind, key):
+        if (kind, key) in self.pending:
+            return True
+        row = self.conn.execute("SELECT 1 FROM seen WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        return row is not None
+
+    def add(self, kind, key):
+        """记录一个键，返回它此前是否未出现过"""
+        if self._contains_exact(kind, key):
+            return False
+        self.pending.add((kind, key))
+        if self.bloom is not None and kind == POST:
+            self.bloom.add(key)
+        if not self.checkpointed and (len(self.pending) >= self.batch_size or
+                                      time.monotonic() - self.last_commit >= self.commit_interval):
+            self.flush()
+        return True
+
+    def add_many(self, kind, keys):
+        """批量导入键（用于从旧数据迁移，调用方保证键此前不存在）"""
+        keys = list(keys)
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO seen (kind, key) VALUES (?, ?)",
+                                  ((kind, key) for key in keys))
+        if self.bloom is not None and kind == POST:
+            for key in keys:
+                self.bloom.add(key)
+
+    def thread_state(self, post_id):
+        """上次记录的 (回复数, 最后回复时间)，没有记录时返回None"""
+        state = self._thread_row(post_id)
+        return state[:2] if state else None
+
+    def thread_posts_per_page(self, post_id):
+        """上次抓取时实测的每页楼层数，没有记录时返回None"""
+        state = self._thread_row(post_id)
+        return state[2] if state else None
+
+    def _thread_row(self, post_id):
+        if post_id in self.pending_threads:
+            return self.pending_threads[post_id]
+        row = self.conn.execute("SELECT reply_count, last_post, posts_per_page FROM threads WHERE post_id = ?",
+                                (post_id,)).fetchone()
+        return tuple(row) if row else None
+
+    def set_thread_state(self, post_id, reply_count, last_post, posts_per_page=None):
+        self.pending_threads[post_id] = (reply_count, last_post, posts_per_page)
+        if not self.checkpointed and len(self.pending_threads) >= self.batch_size:
+            self.flush()
+
+    def max_floor(self, post_id):
+        """已记录的最大楼层号（回复键为 "帖子ID_楼层"），只有主帖时为1，帖子未见过时为0"""
+        prefix = f"{post_id}_"
+        # 前缀范围查询走主键索引：'`' 是 '_' 的下一个字符
+        keys = [key for (key,) in self.conn.execute(
+            "SELECT key FROM seen WHERE kind = ? AND key > ? AND key < ?", (REPLY, prefix, f"{post_id}`"))]
+        keys.extend(key for kind, key in self.pending if kind == REPLY and key.startswith(prefix))
+        floors = [int(key[len(prefix):]) for key in keys if key[len(prefix):].isdigit()]
+        if floors:
+            return max(floors)
+        return 1 if self._contains_exact(POST, post_id) else 0
+
+    def bloom_metrics(self):
+        """布隆过滤器的内存、误判率和命中统计"""
+        if self.bloom is None:
+            return {}
+        return {**self.bloom.metrics(), **self.bloom_counters}
+
+    def is_empty(self, kind):
+        if any(pending_kind == kind for pending_kind, _ in self.pending):
+            return False
+        return self.conn.execute("SELECT 1 FROM seen WHERE kind = ? LIMIT 1", (kind,)).fetchone() is None
+
+    def flush(self):
+        if self.pending:
+            with self.conn:
+                self.conn.executemany("INSERT OR IGNORE INTO seen (kind, key) VALUES (?, ?)", self.pending)
+            self.pending = set()
+        if self.pending_threads:
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO threads (post_id, reply_count, last_post, posts_per_page) "
+                                      "VALUES (?, ?, ?, ?)",
+                                      ((post_id, *state) for post_id, state in self.pending_threads.items()))
+            self.pending_threads = {}
+        self.last_commit = time.monotonic()
+
+    def close(self):
+        if self.conn:
+            self.flush()
+            self.conn.close()
+            self.conn = None
+        if self.bloom is not None:
+            self.bloom.save(self.bloom_path)
+            self.bloom.close()
+            logger.info(f"Bloom filter saved: {self.bloom_path} {self.bloom_metrics()}")
+            self.bloom = None
@@ -0,0 +1,93 @@
+"""
+自适应选择器顺序缓存
+
+爬虫对标题、作者、时间、内容和列表链接都有一串从严格到宽松的后备选择器。
+SelectorCache 按站点和字段记录每个选择器的命中次数，下次优先尝试历史上命中最多的选择器，
+统计数据在运行之间持久化到JSON文件。首选选择器未命中时记录日志和统计项，
+网站模板改版时可以从 selector_cache/* 统计中及时发现。
+"""
+
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SelectorCache:
+    """按站点、字段缓存选择器命中统计"""
+
+    def __init__(self, path, site, crawler=None):
+        self.path = path
+        self.site = site
+        self.crawler = crawler  # 统计项在爬取开始后才可用，使用时再取 crawler.stats
+        self.data = {}  # 站点 -> 字段 -> 选择器 -> 命中次数
+        self.orders = {}  # 字段 -> 当前排序（命中统计变化时失效）
+
+    @classmethod
+    def from_crawler(cls, crawler, site):
+        """按 CUSTOM_SETTINGS 创建，统计文件位于输出目录下"""
+        custom_settings = crawler.settings.get('CUSTOM_SETTINGS', {})
+        output_dir = custom_settings.get('OUTPUT_DIR', 'output')
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        return cls(os.path.join(output_dir, custom_settings.get('SELECTOR_CACHE_FILE', 'selector_stats.json')),
+                   site, crawler)
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+                logger.info(f"Selector stats loaded: {self.path}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not load selector stats {self.path}: {e}")
+                self.data = {}
+
+    def save(self):
+        """原子写入统计文件"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _hits(self, field):
+        return self.data.setdefault(self.site, {}).setdefault(field, {})
+
+    def order(self, field, selectors):
+        """按历史命中次数排序的选择器，次数相同时保持原有的从严格到宽松顺序"""
+        order = self.orders.get(field)
+        if order is None:
+            hits = self._hits(field)
+            order = sorted(selectors, key=lambda selector: -hits.get(selector, 0))
+            self.orders[field] = order
+        return order
+
+    def first_match(self, field, selectors, query):
+        """依次用 query(selector) 取值，返回第一个非空结果和命中的选择器"""
+        order = self.order(field, selectors)
+        for selector in order:
+            value = query(selector)
+            if value:
+                self.record(field, selector, order[0])
+                return value, selector
+        self._inc(f'selector_cache/{field}/no_match')
+        return None, None
+
+    def record(self, field, selector, preferred):
+        hits = self._hits(field)
+        hits[selector] = hits.get(selector, 0) + 1
+        if selector == preferred:
+            self._inc(f'selector_cache/{field}/preferred_hit')
+            return
+
+        self._inc(f'selector_cache/{field}/preferred_miss')
+        logger.info(f"Preferred {field} selector missed on {self.site}: "
+                    f"{preferred!r} -> matched {selector!r}")
+        # 命中次数超过当前首选时调整顺序
+        if hits[selector] > hits.get(preferred, 0):
+            self.orders.pop(field, None)
+
+    def _inc(self, key):
+        if self.crawler is not None:
+            self.crawler.stats.inc_value(key)
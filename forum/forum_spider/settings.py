@@ -9,16 +9,16 @@ NEWSPIDER_MODULE = 'forum_spider.spiders'
 ROBOTSTXT_OBEY = False
 
 # 并发设置
-CONCURRENT_REQUESTS = 8  # 减少并发请求数，避免给服务器造成压力
-CONCURRENT_REQUESTS_PER_DOMAIN = 2  # 每个域名并发数
-CONCURRENT_REQUESTS_PER_IP = 1
+CONCURRENT_REQUESTS = 16  # 全局并发上限，每个域名的并发数由 AdaptiveConcurrencyMiddleware 调整（AIMD_MAX_CONCURRENCY）
+CONCURRENT_REQUESTS_PER_DOMAIN = 2  # 每个域名并发数（关闭AIMD时使用）
+CONCURRENT_REQUESTS_PER_IP = 0  # 按域名分下载槽（非0时按IP分槽，每域名并发数和AIMD都不生效）
 
 # 下载延迟设置 (单位：秒)
-DOWNLOAD_DELAY = 2  # 2秒延迟，模拟人类行为
+DOWNLOAD_DELAY = 2  # 初始延迟，AIMD在响应正常时逐步降低（关闭AIMD时为固定延迟）
 RANDOMIZE_DOWNLOAD_DELAY = 0.5  # 随机延迟 (0.5 * to 1.5 * DOWNLOAD_DELAY)
 
-# AutoThrottle 自动调节
-AUTOTHROTTLE_ENABLED = True
+# AutoThrottle 自动调节（由 AdaptiveConcurrencyMiddleware 替代，关闭 AIMD_ENABLED 时可重新开启）
+AUTOTHROTTLE_ENABLED = False
 AUTOTHROTTLE_START_DELAY = 1
 AUTOTHROTTLE_MAX_DELAY = 10
 AUTOTHROTTLE_TARGET_CONCURRENCY = 2.0
@@ -36,30 +36,53 @@ DEFAULT_REQUEST_HEADERS = {
     'Upgrade-Insecure-Requests': '1',
 }
 
+# 调度器：SQLite持久化的请求队列，进程中断后重新运行即从断点继续（见 FRONTIER_* 设置）
+SCHEDULER = 'forum_spider.frontier.FrontierScheduler'
+
 # 中间件设置
 SPIDER_MIDDLEWARES = {
+    'forum_spider.frontier.FrontierMiddleware': 10,  # 回调结果处理完后把请求标记为已完成（最靠近引擎）
+    'forum_spider.proxy_pool.ProxyPinMiddleware': 540,  # 回调产生的请求继承 meta['proxy_pin']
     'forum_spider.middlewares.ForumSpiderMiddleware': 543,
+    'forum_spider.replay.ReplayTimingMiddleware': 950,  # 回放模式下统计解析和Pipeline耗时（REPLAY_ENABLED）
 }
 
 DOWNLOADER_MIDDLEWARES = {
+    'forum_spider.replay.ReplayMiddleware': 1,  # 回放模式下从录制的语料返回响应（REPLAY_ENABLED）
+    'forum_spider.middlewares.ListPageCancelMiddleware': 50,  # 帖子数量满足后取消剩余列表页
     'forum_spider.middlewares.RotateUserAgentMiddleware': 400,  # 轮换User-Agent
-    'forum_spider.middlewares.ProxyMiddleware': 410,  # 代理中间件（可选）
+    'forum_spider.middlewares.CustomRetryMiddleware': 550,  # 抖动指数退避和Retry-After，重试请求进入延迟队列
+    'forum_spider.middlewares.ResponseValidationMiddleware': 560,  # 反爬虫页面检测和每域名熔断（在解压之后检查响应体）
+    'forum_spider.middlewares.ProxyMiddleware': 950,  # 代理池（PROXY_LIST_FILE 为空时不启用），在HTTP缓存之后、紧靠下载器
+    'forum_spider.concurrency.AdaptiveConcurrencyMiddleware': 960,  # 每域名AIMD并发控制（最靠近下载器，看到原始状态码和异常）
+    'scrapy.downloadermiddlewares.retry.RetryMiddleware': None,  # 由CustomRetryMiddleware替代
     'scrapy.downloadermiddlewares.useragent.UserAgentMiddleware': None,  # 禁用默认UA中间件
 }
 
 # Pipeline 设置
 ITEM_PIPELINES = {
+    'forum_spider.replay.PipelineTimerStart': 1,  # 回放模式下统计Pipeline耗时（REPLAY_ENABLED）
     'forum_spider.pipelines.ValidationPipeline': 300,  # 数据验证
     'forum_spider.pipelines.DuplicatesPipeline': 350,  # 去重处理
-    'forum_spider.pipelines.TxtWriterPipeline': 400,   # TXT输出（主要）
-    'forum_spider.pipelines.JsonWriterPipeline': 450,  # JSON输出（备份）
-    # 'forum_spider.pipelines.CsvWriterPipeline': 500, # CSV输出（禁用）
+    # 'forum_spider.pipelines.FilterPipeline': 370,  # 关键词过滤（见 FILTER_* 设置）
+    'forum_spider.pipelines.ExportPipeline': 400,      # 统一导出（见 EXPORT_SINKS）
+    'forum_spider.replay.PipelineTimerEnd': 999,
+}
+
+# 导出目标：每个item只转换一次，按顺序分发到以下Sink（值为Sink构造参数）
+EXPORT_SINKS = {
+    'forum_spider.exporters.TxtSink': {},        # TXT输出（主要）
+    'forum_spider.exporters.JsonLinesSink': {},  # JSONL输出（备份，结束时生成 posts.json / replies.json）
+    'forum_spider.exporters.CsvSink': {},        # CSV输出（posts.csv / replies.csv）
+    # 'forum_spider.exporters.SqliteSink': {},  # SQLite输出（可选，见 SQLITE_* 设置）
 }
 
 # 缓存设置（开发时建议开启，生产环境可关闭）
 HTTPCACHE_ENABLED = True
-HTTPCACHE_EXPIRATION_SECS = 3600  # 1小时缓存
+HTTPCACHE_EXPIRATION_SECS = 3600  # 1小时内直接命中，过期后用 If-None-Match / If-Modified-Since 重新验证
 HTTPCACHE_DIR = 'httpcache'
+HTTPCACHE_STORAGE = 'forum_spider.httpcache.SqliteCacheStorage'  # 单个压缩SQLite文件（见 HTTPCACHE_* 自定义设置）
+HTTPCACHE_POLICY = 'forum_spider.httpcache.RevalidatingPolicy'
 
 # 日志设置
 LOG_LEVEL = 'INFO'
@@ -79,13 +102,133 @@ CUSTOM_SETTINGS = {
     'MAX_PAGES': 1,  # 最大爬取页数（1页通常包含10+个帖子）
     'MAX_POSTS_PER_PAGE': 10,  # 每页最大爬取帖子数
     'MAX_REPLIES_PER_POST': 20,  # 每个帖子最大爬取回复数
+    'THREAD_POSTS_PER_PAGE': 10,  # 帖子每页楼层数（无法从页面或接口实测、增量重爬也没有记录时使用，用于计算各回复页的起始楼层）
     'FORUM_BASE_URL': 'https://bbs.hassbian.com',
     'FORUM_LIST_URL': 'https://bbs.hassbian.com/forum-38-{}.html',  # 论坛列表页URL模板
+    'LIST_CRAWL_MODE': 'parallel',  # 'parallel' 一次调度1..MAX_PAGES / 'sequential' 解析完一页再请求下一页
+    # 同一进程中爬取的板块：板块ID列表，或 {板块ID: {'max_pages': N, 'max_posts': M}}（未写的配额使用 MAX_PAGES / MAX_POSTS_PER_PAGE），
+    # 列表页URL由 FORUM_LIST_URL 替换板块ID得到；为空时只爬取 FORUM_LIST_URL 的板块
+    'FORUM_BOARDS': [],
+    # 详情页请求优先级的热度评分函数（点分路径，签名 score(thread) -> float，见 forum_spider/scoring.py），
+    # 为None时各帖子按列表页顺序下载
+    'HOTNESS_SCORER': 'forum_spider.scoring.reply_yield',
+    'HOTNESS_PRIORITY_SCALE': 10,  # 优先级 = 热度分 × 该系数（取整）
+    'HOTNESS_MAX_PRIORITY': 1000,  # 优先级上限，详情页优先级始终低于列表页和回复页
+    'EXTRACTION_BACKEND': 'css',  # 帖子页提取：'css' 逐字段CSS选择器 / 'lxml' 单次遍历lxml树（更快，结果相同）
+    'DISCUZ_API_ENABLED': False,  # 使用Discuz移动端JSON API（forumdisplay/viewthread）代替HTML页面，单个请求失败时回退到HTML
+    'DISCUZ_API_MAX_FAILURES': 3,  # API连续失败N次后本次运行不再使用
+    'SELECTOR_CACHE_FILE': 'selector_stats.json',  # 后备选择器命中统计（位于OUTPUT_DIR下，按站点、字段优先尝试历史命中最多的选择器）
     
     # 输出文件设置
     'OUTPUT_DIR': 'output',
     'JSON_FILE': 'forum_data.json',
     'CSV_FILE': 'forum_data.csv',
+    
+    # TXT输出缓冲设置
+    'TXT_FLUSH_BYTES': 64 * 1024,  # 单个帖子文件缓冲超过该字符数时写盘
+    'TXT_FLUSH_INTERVAL': 5.0,  # 缓冲最长保留秒数
+    'TXT_MAX_OPEN_FILES': 64,  # 同时保持打开的文件句柄数（LRU）
+    
+    # JSONL流式输出设置
+    'JSONL_COMPRESSION': None,  # None / 'gzip' / 'zstd'（zstd需要安装zstandard）
+    'JSONL_FLUSH_EVERY': 100,  # 每写入N条刷新一次
+    'JSONL_FLUSH_INTERVAL': 5.0,  # 最长刷新间隔（秒）
+    'JSON_LEGACY_EXPORT': True,  # 结束时生成旧版 posts.json / replies.json
+    
+    # SQLite存储设置（SqliteSink / SqliteStoragePipeline）
+    'SQLITE_DB': 'forum_data.db',  # 数据库文件（位于OUTPUT_DIR下）
+    'SQLITE_SOURCE': None,  # 数据来源标识，默认使用爬虫的域名
+    'SQLITE_BATCH_SIZE': 500,  # 每N条批量提交一次
+    'SQLITE_COMMIT_INTERVAL': 5.0,  # 最长提交间隔（秒）
+    
+    # 跨运行已见集合（去重和跳过已爬帖子）
+    'SEEN_STORE_DB': 'seen.db',  # 数据库文件（位于OUTPUT_DIR下），删除即可重新爬取全部帖子
+    'SEEN_STORE_BATCH_SIZE': 1000,  # 新键每N条批量写入
+    'INCREMENTAL_RECRAWL': True,  # 已爬帖子的列表页回复数/最后回复时间变化时，从第一个未见楼层所在页开始抓取新楼层并追加到原输出
+    
+    # 已见帖子ID的布隆过滤器预判（归档规模很大时启用）
+    'BLOOM_FILTER_ENABLED': False,
+    'BLOOM_FILTER_FILE': 'seen_posts.bloom',  # 过滤器文件（位于OUTPUT_DIR下，启动时mmap加载）
+    'BLOOM_FILTER_ERROR_RATE': 0.001,  # 目标误判率
+    'BLOOM_FILTER_INITIAL_CAPACITY': 100000,  # 首个分片容量，用满后按2倍扩容
+    
+    # 回复内容SimHash近似去重（"顶"、"mark"、引用转帖等）
+    'SIMHASH_ENABLED': False,
+    'SIMHASH_MAX_DISTANCE': 3,  # 汉明距离不超过该值视为近似重复
+    'SIMHASH_ACTION': 'flag',  # 'flag' 写入 duplicate_of 字段 / 'drop' 直接丢弃
+    'SIMHASH_NGRAM': 3,  # 字符n-gram长度
+    'SIMHASH_MIN_LENGTH': 1,  # 去除空白后短于该长度的回复不参与比较
+    
+    # 实时指标（LiveMetrics扩展）
+    'METRICS_ENABLED': True,
+    'METRICS_INTERVAL': 10.0,  # 写出间隔（秒）
+    'METRICS_WINDOW': 60.0,  # 滑动窗口长度（秒）
+    'METRICS_PROMETHEUS_FILE': 'metrics.prom',  # Prometheus textfile（位于OUTPUT_DIR下，None为不输出）
+    'METRICS_JSON_FILE': 'metrics.json',  # JSON快照（位于OUTPUT_DIR下，None为不输出）
+    
+    # 反爬虫页面检测和熔断（ResponseValidationMiddleware）
+    'ANTIBOT_MARKERS': ['访问被拒绝', '验证码'],  # 拦截页标记（按UTF-8和GBK字节查找）
+    'ANTIBOT_SCAN_BYTES': 16 * 1024,  # 只检查响应体开头的字节数
+    'ANTIBOT_MIN_BODY_BYTES': 100,  # 短于该字节数的200响应视为拦截页
+    'ANTIBOT_MAX_RETRIES': 2,  # 每个请求因拦截页重新入队的最大次数
+    'ANTIBOT_RETRY_DELAY': 5.0,  # 拦截页重新入队前的等待秒数（随机取其50%~100%，熔断中等到暂停结束）
+    'CIRCUIT_BREAKER_THRESHOLD': 3,  # 同一域名连续检测到N次后熔断
+    'CIRCUIT_BREAKER_BASE_PAUSE': 30.0,  # 首次熔断暂停秒数，之后每次翻倍
+    'CIRCUIT_BREAKER_MAX_PAUSE': 600.0,  # 最长暂停秒数
+    
+    # 每域名自适应并发（AdaptiveConcurrencyMiddleware）
+    'AIMD_ENABLED': True,
+    'AIMD_START_CONCURRENCY': 1,  # 初始并发数（初始延迟为 DOWNLOAD_DELAY）
+    'AIMD_MIN_CONCURRENCY': 1,
+    'AIMD_MAX_CONCURRENCY': 8,  # 每个域名的最大并发数
+    'AIMD_INCREASE': 1,  # 每个正常窗口增加的并发数（延迟降到 AIMD_MIN_DELAY 之后）
+    'AIMD_DECREASE_FACTOR': 0.5,  # 429/5xx、下载异常或延迟突增时并发数乘以该系数
+    'AIMD_WINDOW': 5,  # 每个评估窗口至少包含的响应数
+    'AIMD_MIN_DELAY': 0.05,  # 下载延迟下限（秒），保留很小的间隔避免同一slot的请求在同一时刻突发
+    'AIMD_MAX_DELAY': 10.0,  # 并发数已最小时延迟加倍的上限（秒）
+    'AIMD_LATENCY_FACTOR': 2.0,  # 窗口平均延迟超过基线的倍数视为延迟突增
+    'AIMD_LATENCY_FLOOR': 0.25,  # 平均延迟低于该秒数时不视为突增
+    
+    # 代理池（ProxyMiddleware）
+    'PROXY_LIST_FILE': 'proxies.txt',  # 每行一个代理URL（可带用户名密码），文件不存在或为空时不使用代理
+    'PROXY_MAX_CONCURRENCY': 2,  # 每个代理的最大并发请求数
+    'PROXY_EWMA_ALPHA': 0.3,  # 延迟和失败率EWMA的平滑系数
+    'PROXY_BAN_CODES': [403, 407, 429],  # 计为代理失败的状态码（连接错误、超时和反爬虫拦截页也计为失败）
+    'PROXY_QUARANTINE_FAILURES': 3,  # 连续失败N次后隔离
+    'PROXY_MAX_FAILURE_RATE': 0.5,  # 失败率EWMA超过该值后隔离
+    'PROXY_MIN_SAMPLES': 5,  # 按失败率隔离前至少需要的请求数
+    'PROXY_QUARANTINE_BASE': 60.0,  # 首次隔离秒数，连续隔离时翻倍
+    'PROXY_QUARANTINE_MAX': 1800.0,  # 最长隔离秒数
+    'PROXY_PIN_LIST_PAGES': False,  # 列表页及其帖子页、回复页使用同一个代理
+    
+    # 延迟重试（CustomRetryMiddleware + DelayedRetryQueue）
+    'RETRY_BACKOFF_BASE': 2.0,  # 域名首次失败的退避秒数上限，之后每次连续失败翻倍（在上限的50%~100%内随机）
+    'RETRY_BACKOFF_MAX': 60.0,  # 退避秒数上限
+    'RETRY_AFTER_MAX': 600.0,  # Retry-After 最长等待秒数
+    'RETRY_QUEUE_INTERVAL': 0.5,  # 检查延迟队列到期请求的间隔（秒）
+    
+    # HTTP缓存（SqliteCacheStorage，数据库为 .scrapy/<HTTPCACHE_DIR>/<爬虫名>.sqlite3）
+    'HTTPCACHE_COMPRESSION': 'zstd',  # 'zstd'（需要安装zstandard，否则退回zlib）/ 'zlib' / 'none'
+    'HTTPCACHE_MAX_MB': 512,  # 数据库大小上限，超过后按最近访问时间淘汰（LRU）
+    'HTTPCACHE_COMMIT_INTERVAL': 5.0,  # 提交间隔（秒）
+    
+    # 离线回放（run.py --replay）：从HTTP缓存目录或WARC语料返回响应，不访问网络、不限速
+    'REPLAY_ENABLED': False,
+    'REPLAY_SOURCE': None,  # 语料路径，默认为 .scrapy/<HTTPCACHE_DIR>/<爬虫名>.sqlite3（不存在时为同名缓存目录）；.warc/.warc.gz 文件或目录需要安装warcio
+    'REPLAY_CONCURRENT_REQUESTS': 64,  # 回放时的并发请求数
+    
+    # 断点续爬（FrontierScheduler）：待下载请求、已调度请求的指纹和爬虫状态保存在SQLite中，
+    # 上次运行没有正常结束时自动从最后一个检查点继续，输出文件改为追加
+    'FRONTIER_ENABLED': True,  # False 使用Scrapy默认的内存调度器
+    'FRONTIER_DB': 'frontier_{spider}.db',  # 数据库文件（位于OUTPUT_DIR下，{spider}为爬虫名）
+    'FRONTIER_RESUME': True,  # False（run.py --fresh）丢弃上次未完成的爬取，重新开始
+    'FRONTIER_CHECKPOINT_INTERVAL': 10.0,  # 检查点间隔（秒）：输出落盘、提交已见集合和请求队列
+    
+    # 关键词过滤（FilterPipeline）
+    'FILTER_KEYWORDS_FILE': 'filter_keywords.txt',  # 每行“关键词”或“关键词<Tab>规则名”
+    'FILTER_ACTION': 'drop',  # 'drop' 丢弃 / 'flag' 写入 matched_rules 字段
+    'FILTER_RELOAD_INTERVAL': 10.0,  # 检查关键词文件是否修改的间隔（秒），修改后自动重新加载
+    'FILTER_MIN_CONTENT_LENGTH': 10,  # 内容短于该长度的item丢弃
 }
 
 # Telnet Console (enabled by default)
@@ -96,28 +239,10 @@ EXTENSIONS = {
     'scrapy.extensions.telnet.TelnetConsole': None,
     'scrapy.extensions.corestats.CoreStats': 300,  # 核心统计
     'scrapy.extensions.memusage.MemoryUsage': 200,  # 内存使用监控
+    'forum_spider.metrics.LiveMetrics': 500,  # 实时指标（metrics.prom / metrics.json / statistics.json）
+    'forum_spider.retry_queue.DelayedRetryQueue': 510,  # 延迟重试队列（retry_not_before）
 }
 
 # 内存使用限制 (MB)
 MEMUSAGE_LIMIT_MB = 2048
 MEMUSAGE_WARNING_MB = 1024
-
-# Feed 导出设置
-FEEDS = {
-    'output/posts.json': {
-        'format': 'json',
-        'encoding': 'utf8',
-        'indent': 2,
-        'item_classes': ['forum_spider.items.PostItem'],
-    },
-    'output/replies.json': {
-        'format': 'json', 
-        'encoding': 'utf8',
-        'indent': 2,
-        'item_classes': ['forum_spider.items.ReplyItem'],
-    },
-    'output/forum_data.csv': {
-        'format': 'csv',
-        'encoding': 'utf8',
-    }
-} 
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""
+SimHash 近似重复检测
+
+对清理后的回复内容按字符n-gram计算64位SimHash指纹，并用分段索引查找
+汉明距离不超过 max_distance 的已有指纹：把64位切成 max_distance + 1 段，
+根据抽屉原理，距离不超过阈值的两个指纹至少有一段完全相同，只需比较同段桶内的候选。
+"""
+
+import re
+import hashlib
+
+HASH_BITS = 64
+HASH_BYTES = HASH_BITS // 8
+
+# 第i张表把字节值映射为其第i位（0/1），配合 bytes.translate().count() 按位计数
+_BIT_TABLES = [bytes((value >> bit) & 1 for value in range(256)) for bit in range(8)]
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _feature_digest(feature):
+    """特征的64位哈希"""
+    return hashlib.blake2b(feature.encode('utf-8'), digest_size=HASH_BYTES).digest()
+
+
+def normalize(text):
+    """统一大小写并去除空白"""
+    return _WHITESPACE.sub('', (text or '').lower())
+
+
+def features(text, ngram=3):
+    """字符n-gram特征（可重复，重复次数即权重），短文本整体作为一个特征"""
+    text = normalize(text)
+    if len(text) <= ngram:
+        return [text] if text else []
+    return [text[i:i + ngram] for i in range(len(text) - ngram + 1)]
+
+
+def simhash(text, ngram=3):
+    """计算文本的64位SimHash指纹
+
+    所有特征哈希拼接成一个字节串，按字节位置切片后用C层面的 translate/count
+    统计每一位为1的特征数，避免在Python循环中逐位累加。
+    """
+    feature_list = features(text, ngram)
+    if not feature_list:
+        return 0
+
+    total = len(feature_list)
+    digests = b''.join(map(_feature_digest, feature_list))
+    fingerprint = 0
+    for byte_index in range(HASH_BYTES):
+        column = digests[byte_index::HASH_BYTES]
+        for bit, table in enumerate(_BIT_TABLES):
+            # 该位为1的特征超过一半时，指纹该位取1
+            if column.translate(table).count(1) * 2 > total:
+                fingerprint |= 1 << (byte_index * 8 + bit)
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class SimHashIndex:
+    """分段索引：按 max_distance + 1 段分桶，查找汉明距离不超过阈值的指纹"""
+
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        num_bands = max_distance + 1
+        width = HASH_BITS // num_bands
+        self.bands = []  # (起始位, 掩码)
+        for i in range(num_bands):
+            start = i * width
+            end = HASH_BITS if i == num_bands - 1 else start + width
+            self.bands.append((start, (1 << (end - start)) - 1))
+        self.tables = [{} for _ in self.bands]  # 段值 -> 指纹列表
+        self.keys = {}  # 指纹 -> 首次出现的键
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, fingerprint):
+        """返回距离不超过阈值的已有指纹对应的键，没有则返回None"""
+        key = self.keys.get(fingerprint)
+        if key is not None:
+            return key
+        for (start, mask), table in zip(self.bands, self.tables):
+            for candidate in table.get((fingerprint >> start) & mask, ()):
+                if hamming_distance(candidate, fingerprint) <= self.max_distance:
+                    return self.keys[candidate]
+        return None
+
+    def add(self, fingerprint, key):
+        if fingerprint in self.keys:
+            return
+        self.keys[fingerprint] = key
+        for (start, mask), table in zip(self.bands, self.tables):
+            table.setdefault((fingerprint >> start) & mask, []).append(fingerprint)
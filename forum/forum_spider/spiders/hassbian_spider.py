@@ -1,7 +1,17 @@
 import scrapy
 import re
+import math
+import time
 from urllib.parse import urljoin, urlparse, parse_qs
 from forum_spider.items import PostItem, ReplyItem
+from forum_spider.seen_store import SeenStore, POST
+from forum_spider.reassembly import ReplyReassembler
+from forum_spider.selector_cache import SelectorCache
+from forum_spider.extraction import ThreadPageExtractor
+from forum_spider.boards import load_boards
+from forum_spider import discuz_api, scoring
+from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.misc import load_object
 from itemloaders import ItemLoader
 import logging
 
@@ -23,11 +33,45 @@ class HassbianSpider(scrapy.Spider):
         self.max_posts_per_page = 10
         self.max_replies = 20
         self.base_url = 'https://bbs.hassbian.com'
-        self.list_url_template = 'https://bbs.hassbian.com/forum-38-{}.html'
         
-        # 初始化已存在帖子ID集合（将在Pipeline中设置）
-        self.existing_post_ids = set()
-        self.found_posts_count = 0  # 跟踪找到的新帖子数量
+        # 跨运行持久化的已见集合（在from_crawler中打开，Pipeline共用）
+        self.seen_store = None
+        
+        # 列表页爬取状态：各板块（FORUM_BOARDS）独立的配额和页码顺序，并行模式下各页可能乱序到达，按页码顺序消费
+        self.list_crawl_mode = 'parallel'
+        self.boards = {}  # 板块ID -> Board，按配置顺序
+        self.list_seen_post_ids = set()  # 所有板块共用：同一帖子只爬取一次
+        self.post_boards = {}  # 帖子ID -> 板块ID，用于按板块统计回复数
+        self.list_crawl_started = None
+        
+        # 回复页并发抓取后按楼层顺序放出
+        self.posts_per_page = 10
+        self.reassembler = None
+        
+        # 增量重爬：列表页显示的回复数/最后回复时间与已记录状态不同的已爬帖子，只抓取新楼层
+        self.incremental_recrawl = True
+        self.list_thread_stats = {}  # 帖子ID -> (回复数, 最后回复时间)，来自列表页
+        self.list_thread_views = {}  # 帖子ID -> 查看数，来自列表页
+        self.thread_states = {}  # 帖子ID -> 抓取完成后要记录的列表页状态
+        self.updating_threads = set()  # 本次增量抓取的帖子
+        self.failed_threads = set()  # 有回复页抓取失败的帖子（不记录状态，下次重试）
+        
+        # 后备选择器链的历史命中统计（按站点、字段），优先尝试命中最多的选择器
+        self.selector_cache = None
+        
+        # 帖子页提取后端：css（逐字段CSS选择器）或 lxml（单次遍历）
+        self.extraction_backend = 'css'
+        self._page_extractor = None  # (response, ThreadPageExtractor)，同一页的主帖和回复共用一次遍历
+        
+        # 详情页请求优先级：按列表页的回复数、查看数和最后回复时间评分（HOTNESS_SCORER），为None时按板块内顺序
+        self.hotness_scorer = None
+        self.hotness_scale = 10
+        self.hotness_max_priority = 1000
+        
+        # Discuz移动端JSON API：单个请求解析失败时回退到HTML页面，连续失败多次后本次运行不再使用API
+        self.api_enabled = False
+        self.api_failures = 0
+        self.api_max_failures = 3
         
         logger.info(f"Spider initialized with single_url: {self.single_url}")
 
@@ -42,9 +86,30 @@ class HassbianSpider(scrapy.Spider):
         spider.max_posts_per_page = custom_settings.get('MAX_POSTS_PER_PAGE', 10)
         spider.max_replies = custom_settings.get('MAX_REPLIES_PER_POST', 20)
         spider.base_url = custom_settings.get('FORUM_BASE_URL', 'https://bbs.hassbian.com')
-        spider.list_url_template = custom_settings.get('FORUM_LIST_URL', 'https://bbs.hassbian.com/forum-38-{}.html')
+        spider.list_crawl_mode = custom_settings.get('LIST_CRAWL_MODE', 'parallel')
+        spider.posts_per_page = custom_settings.get('THREAD_POSTS_PER_PAGE', 10)
+        spider.reassembler = ReplyReassembler(spider.max_replies)
+        spider.incremental_recrawl = custom_settings.get('INCREMENTAL_RECRAWL', True)
+        spider.api_enabled = custom_settings.get('DISCUZ_API_ENABLED', False)
+        spider.api_max_failures = custom_settings.get('DISCUZ_API_MAX_FAILURES', 3)
+        spider.boards = {board.board_id: board for board in load_boards(custom_settings)}
+        spider.extraction_backend = custom_settings.get('EXTRACTION_BACKEND', 'css')
+        scorer = custom_settings.get('HOTNESS_SCORER', 'forum_spider.scoring.reply_yield')
+        spider.hotness_scorer = load_object(scorer) if scorer else None
+        spider.hotness_scale = custom_settings.get('HOTNESS_PRIORITY_SCALE', 10)
+        spider.hotness_max_priority = custom_settings.get('HOTNESS_MAX_PRIORITY', 1000)
+        if spider.extraction_backend not in ('css', 'lxml'):
+            raise ValueError(f"Unknown EXTRACTION_BACKEND: {spider.extraction_backend!r}")
+        
+        spider.seen_store = SeenStore.from_settings(crawler.settings)
+        spider.seen_store.open()
+        
+        spider.selector_cache = SelectorCache.from_crawler(crawler, spider.allowed_domains[0])
+        spider.selector_cache.load()
         
         logger.info(f"Spider configured: max_pages={spider.max_pages}, max_posts_per_page={spider.max_posts_per_page}, max_replies={spider.max_replies}")
+        if len(spider.boards) > 1:
+            logger.info(f"Boards: {list(spider.boards.values())}")
         if spider.single_url:
             logger.info(f"Single URL mode: {spider.single_url}")
             
@@ -54,31 +119,113 @@ class HassbianSpider(scrapy.Spider):
         """生成初始请求"""
         # 如果提供了单个URL，只爬取这个帖子
         if self.single_url:
-            yield scrapy.Request(
-                url=self.single_url,
-                callback=self.parse_post_detail,
-                meta={'page_num': 1},
-                dont_filter=False
-            )
+            post_id = self.extract_post_id(self.single_url)
+            if post_id:
+                yield self.thread_page_request(post_id, 1, self.parse_post_detail, html_url=self.single_url,
+                                               meta={'page_num': 1, 'post_id': post_id}, dont_filter=False)
+            else:
+                yield scrapy.Request(
+                    url=self.single_url,
+                    callback=self.parse_post_detail,
+                    meta={'page_num': 1},
+                    dont_filter=False
+                )
         else:
-            # 默认模式：从第1页开始爬取论坛列表页
-            url = self.list_url_template.format(1)
-            yield scrapy.Request(
-                url=url,
-                callback=self.parse_forum_list,
-                meta={'page_num': 1},
-                dont_filter=False
-            )
+            # 默认模式：爬取论坛列表页
+            self.list_crawl_started = time.monotonic()
+            if self.list_crawl_mode == 'parallel':
+                # 一次调度各板块的 1..max_pages，由每域名并发数限制同时下载的页数，靠前的页优先；
+                # 各板块同一页码的优先级相同，按轮次交替下载（所有板块的第1页先于任何板块的第2页）
+                for board in self.boards.values():
+                    logger.info(f"Scheduling list pages 1-{board.max_pages} of board {board.board_id} in parallel")
+                for page_num in range(1, self.list_max_pages() + 1):
+                    for board in self.boards.values():
+                        if page_num <= board.max_pages:
+                            yield self.list_page_request(board, page_num)
+            else:
+                for board in self.boards.values():
+                    yield self.list_page_request(board, 1)
+
+    def list_max_pages(self):
+        return max((board.max_pages for board in self.boards.values()), default=self.max_pages)
+
+    def list_page_request(self, board, page_num):
+        api_url = None
+        if board.forum_id:
+            api_url = discuz_api.forumdisplay_url(self.base_url, board.forum_id, page_num)
+        return self.page_request(
+            board.list_url(page_num),
+            api_url,
+            callback=self.parse_forum_list,
+            errback=self.list_page_failed,
+            priority=self.list_max_pages() - page_num + 1,
+            meta={'page_num': page_num, 'list_page': True, 'board_id': board.board_id},
+            dont_filter=False
+        )
+
+    def list_page_cancelled(self, request):
+        """列表页所属板块已完成时取消（ListPageCancelMiddleware调用）"""
+        board = self.boards.get(request.meta.get('board_id'))
+        return board is None or board.done
+
+    def thread_page_request(self, post_id, page, callback, html_url=None, **kwargs):
+        """帖子第page页的请求（API模式下为 viewthread 接口）"""
+        html_url = html_url or urljoin(self.base_url, f'thread-{post_id}-{page}-1.html')
+        return self.page_request(html_url, discuz_api.viewthread_url(self.base_url, post_id, page), callback, **kwargs)
+
+    def page_request(self, html_url, api_url, callback, errback=None, meta=None, **kwargs):
+        """API模式下请求移动端API，meta中记录HTML页面的地址和回调以便回退；否则直接请求HTML页面"""
+        if not self.api_enabled or api_url is None:
+            return scrapy.Request(html_url, callback=callback, errback=errback, meta=meta, **kwargs)
+        meta = dict(meta or {}, html_url=html_url, html_callback=callback.__name__,
+                    html_errback=errback.__name__ if errback else None)
+        return scrapy.Request(api_url, callback=self.parse_api, errback=self.api_failed, meta=meta, **kwargs)
+
+    def parse_api(self, response):
+        """解析API响应并交给对应的 <HTML回调>_api 方法；没有可用数据时回退到HTML页面"""
+        variables = discuz_api.variables(response)
+        if variables is None:
+            yield self.api_fallback(response.request, f"no data (message: {discuz_api.message_of(response)})")
+            return
+        
+        self.api_failures = 0
+        stats = self.crawler.stats
+        stats.inc_value('discuz_api/responses')
+        stats.inc_value('discuz_api/response_bytes', len(response.body))
+        yield from getattr(self, f"{response.meta['html_callback']}_api")(response, variables)
+
+    def api_failed(self, failure):
+        if failure.check(IgnoreRequest):
+            # 被中间件取消（如列表页已足够）的请求不回退，直接交给HTML请求的errback
+            errback = failure.request.meta.get('html_errback')
+            if errback:
+                yield from getattr(self, errback)(failure) or ()
+            return
+        yield self.api_fallback(failure.request, repr(failure.value))
+
+    def api_fallback(self, request, reason):
+        """改为请求同一页面的HTML版本"""
+        meta = request.meta
+        self.crawler.stats.inc_value('discuz_api/fallbacks')
+        self.api_failures += 1
+        logger.warning(f"Discuz API unavailable for {request.url}: {reason}, falling back to {meta['html_url']}")
+        if self.api_enabled and self.api_failures >= self.api_max_failures:
+            self.api_enabled = False
+            logger.warning(f"Discuz API failed {self.api_failures} times in a row, using HTML pages for the rest of the run")
+        
+        errback = getattr(self, meta['html_errback']) if meta.get('html_errback') else None
+        return request.replace(url=meta['html_url'], callback=getattr(self, meta['html_callback']),
+                               errback=errback, dont_filter=True)
 
     def parse_forum_list(self, response):
         """解析论坛列表页"""
         page_num = response.meta['page_num']
-        logger.info(f"Parsing forum list page {page_num}: {response.url}")
-        logger.info(f"Current found posts: {self.found_posts_count}, target: {self.max_posts_per_page}")
+        board = self.boards[response.meta['board_id']]
+        logger.info(f"Parsing forum list page {page_num} of board {board.board_id}: {response.url}")
         
-        # 如果已经找到足够的帖子，停止处理
-        if self.found_posts_count >= self.max_posts_per_page:
-            logger.info(f"Already found {self.found_posts_count} posts, stopping")
+        # 如果该板块已经找到足够的帖子，停止处理
+        if board.done:
+            logger.info(f"Board {board.board_id} already finished ({board.found_posts_count} posts), ignoring page {page_num}")
             return
         
         # 提取帖子链接，使用更精确的选择器
@@ -94,15 +241,141 @@ class HassbianSpider(scrapy.Spider):
             'a[href*="thread-"][href*=".html"]::attr(href)'
         ]
         
-        for selector in selectors:
-            post_links = response.css(selector).getall()
-            if post_links:
-                logger.info(f"Using selector: {selector}")
-                break
+        post_links, selector = self.selector_cache.first_match(
+            'list_links', selectors, lambda selector: response.css(selector).getall())
+        if post_links:
+            logger.info(f"Using selector: {selector}")
+        else:
+            post_links = []
+        
+        yield from self.list_page_parsed(response, board, page_num, post_links,
+                                         self.parse_thread_stats(response), self.parse_thread_views(response))
+
+    def parse_forum_list_api(self, response, variables):
+        """解析 forumdisplay 接口返回的主题列表"""
+        page_num = response.meta['page_num']
+        board = self.boards[response.meta['board_id']]
+        logger.info(f"Parsing forum list page {page_num} of board {board.board_id} from API: {response.url}")
+        if board.done:
+            logger.info(f"Board {board.board_id} already finished ({board.found_posts_count} posts), ignoring page {page_num}")
+            return
+        
+        threads = discuz_api.thread_list(variables)
+        post_links = [f'thread-{post_id}-1-1.html' for post_id, _, _, _ in threads]
+        thread_stats = {post_id: (reply_count, last_post) for post_id, reply_count, last_post, _ in threads
+                        if reply_count is not None or last_post}
+        thread_views = {post_id: views for post_id, _, _, views in threads if views is not None}
+        yield from self.list_page_parsed(response, board, page_num, post_links, thread_stats, thread_views)
+
+    def list_page_parsed(self, response, board, page_num, post_links, thread_stats, thread_views):
+        """记录列表页耗时和帖子状态，按页码顺序消费"""
+        if self.list_crawl_started is None:
+            self.list_crawl_started = time.monotonic()
+        board.page_timings[page_num] = {
+            'latency': response.meta.get('download_latency'),
+            'completed_at': time.monotonic() - self.list_crawl_started,
+            'links': len(post_links),
+        }
+        self.list_thread_stats.update(thread_stats)
+        self.list_thread_views.update(thread_views)
+        board.pages_parsed[page_num] = post_links
+        yield from self.drain_list_pages(board)
+
+    def parse_thread_stats(self, response):
+        """列表页每个帖子的回复数和最后回复时间（Discuz主题列表表格）"""
+        thread_stats = {}
+        for row in response.css('tbody[id^="normalthread_"]'):
+            match = re.search(r'normalthread_(\d+)', row.attrib.get('id', ''))
+            if not match:
+                continue
+            reply_count = row.css('td.num a.xi2::text').re_first(r'\d+')
+            
+            # 最后一个 td.by 是最后回复；近期的时间显示为“1 小时前”，完整时间在 span 的 title 中
+            last_post = None
+            last_by = row.css('td.by')[-1:]
+            if last_by:
+                last_post = last_by[0].css('em span[title]::attr(title)').get() or \
+                            ' '.join(last_by[0].css('em ::text').getall()).strip() or None
+            
+            if reply_count is not None or last_post:
+                thread_stats[match.group(1)] = (int(reply_count) if reply_count is not None else None, last_post)
+        return thread_stats
+
+    def parse_thread_views(self, response):
+        """列表页每个帖子的查看数（td.num 中 em 的数字）"""
+        thread_views = {}
+        for row in response.css('tbody[id^="normalthread_"]'):
+            match = re.search(r'normalthread_(\d+)', row.attrib.get('id', ''))
+            views = row.css('td.num em::text').re_first(r'\d+')
+            if match and views is not None:
+                thread_views[match.group(1)] = int(views)
+        return thread_views
+
+    def thread_priority(self, post_id, default, known_replies=None):
+        """按热度评分的详情页请求优先级，未配置评分函数时返回default"""
+        if self.hotness_scorer is None:
+            return default
+        reply_count, last_post = self.list_thread_stats.get(post_id, (None, None))
+        thread = scoring.ThreadHotness(post_id, reply_count, self.list_thread_views.get(post_id),
+                                       scoring.age_hours(last_post), known_replies, self.max_replies,
+                                       self.posts_per_page)
+        score = self.hotness_scorer(thread)
+        priority = scoring.to_priority(score, self.hotness_scale, self.hotness_max_priority)
+        self.crawler.stats.inc_value('hotness/scored')
+        self.crawler.stats.inc_value('hotness/expected_replies', scoring.expected_new_replies(thread))
+        logger.debug(f"Post {post_id} hotness {score:.2f} -> priority {priority}")
+        return priority
+
+    def list_page_failed(self, failure):
+        """列表页下载失败或被取消：记为空页，避免阻塞后续页的顺序消费"""
+        page_num = failure.request.meta['page_num']
+        board = self.boards[failure.request.meta['board_id']]
+        if not board.done:
+            logger.warning(f"Forum list page {page_num} of board {board.board_id} failed: {failure.value!r}")
+        board.pages_parsed[page_num] = None
+        yield from self.drain_list_pages(board)
+
+    def drain_list_pages(self, board):
+        """按页码顺序消费板块已解析的列表页"""
+        while board.next_page in board.pages_parsed:
+            page_num = board.next_page
+            post_links = board.pages_parsed.pop(page_num)
+            board.next_page += 1
+            if board.done or post_links is None:
+                continue
+            
+            yield from self.select_new_posts(board, page_num, post_links)
+            
+            if board.found_posts_count >= board.max_posts:
+                self.finish_list_crawl(board, f"found {board.found_posts_count}/{board.max_posts} posts")
+            elif not post_links:
+                self.finish_list_crawl(board, f"page {page_num} has no posts")
+            elif page_num >= board.max_pages:
+                self.finish_list_crawl(board, f"reached max pages ({board.max_pages})")
+            elif self.list_crawl_mode != 'parallel':
+                logger.info(f"Board {board.board_id} needs more posts ({board.found_posts_count}/{board.max_posts}), "
+                            f"going to page {page_num + 1}")
+                yield self.list_page_request(board, page_num + 1)
+
+    def finish_list_crawl(self, board, reason):
+        board.done = True
+        logger.info(f"Finished collecting posts of board {board.board_id}: "
+                    f"{board.found_posts_count}/{board.max_posts} ({reason})")
+
+    @property
+    def list_crawl_done(self):
+        """所有板块都已完成"""
+        return all(board.done for board in self.boards.values())
+
+    def select_new_posts(self, board, page_num, post_links):
+        """从列表页链接中挑选未爬取过的帖子并生成详情页请求"""
+        logger.info(f"Board {board.board_id} found posts: {board.found_posts_count}, target: {board.max_posts}")
         
         # 提取帖子ID并过滤，优先选择第一页的帖子
         new_posts = []
         seen_posts = set()
+        skipped_count = 0
+        update_requests = []
         
         for link in post_links:
             if not link or 'thread-' not in link:
@@ -116,9 +389,19 @@ class HassbianSpider(scrapy.Spider):
             if not post_id:
                 continue
                 
-            # 跳过已存在的帖子
-            if post_id in self.existing_post_ids:
-                logger.info(f"Skipping existing post: {post_id}")
+            # 跳过前面的列表页已经选中的帖子（翻页期间有新帖时帖子会顺延到下一页）
+            if post_id in self.list_seen_post_ids:
+                continue
+            
+            # 已存在的帖子：列表页状态有变化时增量抓取新楼层，否则跳过
+            if self.is_existing_post(post_id):
+                self.list_seen_post_ids.add(post_id)
+                update_request = self.thread_update_request(board, post_id, page_num)
+                if update_request:
+                    update_requests.append(update_request)
+                else:
+                    logger.info(f"Skipping existing post: {post_id}")
+                    skipped_count += 1
                 continue
                 
             # 跳过重复的帖子（优先保留主题帖）
@@ -134,43 +417,78 @@ class HassbianSpider(scrapy.Spider):
             new_posts.append((post_id, link))
             
             # 如果找到足够的新帖子，停止
-            if len(new_posts) >= (self.max_posts_per_page - self.found_posts_count):
+            if len(new_posts) >= (board.max_posts - board.found_posts_count):
                 break
         
         # 按链接类型排序，主题帖优先
         new_posts.sort(key=lambda x: (not x[1].endswith('-1-1.html'), x[0]))
+        self.list_seen_post_ids.update(seen_posts)
         
-        logger.info(f"Found {len(new_posts)} new posts on page {page_num} (skipped {len(self.existing_post_ids)} existing)")
+        logger.info(f"Found {len(new_posts)} new posts on page {page_num} "
+                    f"(skipped {skipped_count} existing, {len(update_requests)} updated)")
         
-        # 处理新帖子
+        # 处理新帖子：按热度评分设置优先级，热门帖子先下载；未配置评分函数时优先级为负的板块内序号，
+        # 各板块的第i个帖子优先级相同，详情页在板块之间轮流下载
         for i, (post_id, link) in enumerate(new_posts, 1):
             full_url = urljoin(self.base_url, link)
-            logger.info(f"Processing new post {self.found_posts_count + i}/{self.max_posts_per_page}: {post_id} - {full_url}")
+            post_index = board.found_posts_count + i
+            logger.info(f"Processing new post {post_index}/{board.max_posts} of board {board.board_id}: "
+                        f"{post_id} - {full_url}")
+            self.post_boards[post_id] = board.board_id
             
-            yield scrapy.Request(
-                url=full_url,
-                callback=self.parse_post_detail,
-                meta={'page_num': page_num, 'post_index': self.found_posts_count + i, 'post_id': post_id},
+            yield self.thread_page_request(
+                post_id, 1, self.parse_post_detail,
+                html_url=full_url,
+                priority=self.thread_priority(post_id, -post_index),
+                meta={'page_num': page_num, 'post_index': post_index, 'post_id': post_id,
+                      'board_id': board.board_id, 'thread_state': self.list_thread_stats.get(post_id)},
                 dont_filter=False
             )
         
         # 更新计数
-        self.found_posts_count += len(new_posts)
-        
-        # 如果还需要更多帖子并且当前页有帖子，继续下一页
-        if self.found_posts_count < self.max_posts_per_page and len(post_links) > 0 and page_num < 10:
-            next_page = page_num + 1
-            next_url = self.list_url_template.format(next_page)
-            logger.info(f"Need more posts ({self.found_posts_count}/{self.max_posts_per_page}), going to page {next_page}")
-            
-            yield scrapy.Request(
-                url=next_url,
-                callback=self.parse_forum_list,
-                meta={'page_num': next_page},
-                dont_filter=False
-            )
-        else:
-            logger.info(f"Finished collecting posts: {self.found_posts_count}/{self.max_posts_per_page}")
+        board.found_posts_count += len(new_posts)
+        self.crawler.stats.inc_value(f'boards/{board.board_id}/posts', len(new_posts))
+        
+        yield from update_requests
+
+    def thread_update_request(self, board, post_id, page_num):
+        """已爬帖子的列表页状态有变化时，返回从第一个未见楼层所在页开始的请求"""
+        thread_stats = self.list_thread_stats.get(post_id)
+        if not self.incremental_recrawl or thread_stats is None:
+            return None
+        
+        stats = self.crawler.stats
+        state = self.seen_store.thread_state(post_id)
+        if state is None:
+            # 之前的版本爬取的帖子没有记录状态：以当前列表页状态为基线，之后有变化时再增量抓取
+            self.seen_store.set_thread_state(post_id, *thread_stats)
+            stats.inc_value('incremental/threads_baselined')
+            return None
+        if state == thread_stats:
+            stats.inc_value('incremental/threads_unchanged')
+            return None
+        
+        first_floor = self.seen_store.max_floor(post_id) + 1
+        per_page = self.seen_store.thread_posts_per_page(post_id) or self.posts_per_page
+        page = (first_floor - 1) // per_page + 1
+        stats.inc_value('incremental/threads_changed')
+        self.post_boards[post_id] = board.board_id
+        logger.info(f"Post {post_id} changed (replies/last post {state} -> {thread_stats}), "
+                    f"fetching from floor {first_floor} on page {page}")
+        return self.thread_page_request(
+            post_id, page, self.parse_thread_update,
+            errback=self.reply_page_failed,
+            priority=self.thread_priority(post_id, 0, known_replies=max(0, first_floor - 2)),
+            meta={
+                'post_id': post_id,
+                'reply_page': page,
+                'posts_per_page': per_page,  # 上次抓取时实测的每页楼层数，解析时按本页实测值校正
+                'first_floor': first_floor,
+                'thread_state': thread_stats,
+                'page_num': page_num,
+                'board_id': board.board_id
+            }
+        )
 
     def parse_post_detail(self, response):
         """解析帖子详情页"""
@@ -186,23 +504,51 @@ class HassbianSpider(scrapy.Spider):
         post_item = self.extract_post_info(response, post_id)
         if post_item:
             post_item['page_num'] = response.meta['page_num']
+            if response.meta.get('board_id'):
+                post_item['board_id'] = response.meta['board_id']
             yield post_item
         
-        # 提取回复信息（前20楼）
+        # 提取第1页回复，并根据分页器的总页数并发请求所需的其余回复页
         replies = self.extract_replies(response, post_id)
-        for reply in replies[:self.max_replies]:
-            yield reply
-        
-        # 如果有下一页回复，继续爬取
-        next_page_links = response.css('a.nxt::attr(href)').getall()
-        if next_page_links and len(replies) >= self.max_replies:
-            next_url = urljoin(self.base_url, next_page_links[0])
-            yield scrapy.Request(
-                url=next_url,
-                callback=self.parse_post_replies,
+        num_pages, per_page = self.reply_pages_needed(response)
+        yield from self.fan_out_reply_pages(response, post_id, replies, num_pages, per_page)
+
+    def parse_post_detail_api(self, response, variables):
+        """解析 viewthread 接口返回的帖子第1页"""
+        post_id = response.meta.get('post_id') or self.extract_post_id(response.meta['html_url'])
+        logger.info(f"Parsing post detail from API: {post_id}")
+        
+        thread = variables.get('thread') or {}
+        postlist = variables.get('postlist') or []
+        post_item = self.api_post_item(response, post_id, thread, postlist)
+        if post_item:
+            post_item['page_num'] = response.meta['page_num']
+            if response.meta.get('board_id'):
+                post_item['board_id'] = response.meta['board_id']
+            yield post_item
+        
+        replies = self.api_replies(post_id, postlist, start_floor=1)
+        per_page = discuz_api.posts_per_page(variables, self.posts_per_page)
+        total_pages = discuz_api.total_pages(variables, per_page)
+        num_pages = self.pages_for_replies(total_pages, per_page) if total_pages > 1 else 1
+        yield from self.fan_out_reply_pages(response, post_id, replies, num_pages, per_page)
+
+    def fan_out_reply_pages(self, response, post_id, replies, num_pages, per_page):
+        """放出第1页回复，并发请求第2..num_pages页"""
+        self.reassembler.expect(post_id, num_pages)
+        if response.meta.get('thread_state'):
+            self.thread_states[post_id] = (*response.meta['thread_state'], per_page)
+        yield from self.release_replies(post_id, self.reassembler.add(post_id, 1, replies))
+        
+        for page in range(2, num_pages + 1):
+            self.crawler.stats.inc_value('reply_pages/scheduled')
+            yield self.thread_page_request(
+                post_id, page, self.parse_post_replies,
+                errback=self.reply_page_failed,
                 meta={
                     'post_id': post_id,
-                    'current_replies': len(replies),
+                    'reply_page': page,
+                    'start_floor': (page - 1) * per_page + 1,  # 第p页从第 (p-1)*每页楼层数+1 楼开始
                     'page_num': response.meta['page_num']
                 }
             )
@@ -210,18 +556,222 @@ class HassbianSpider(scrapy.Spider):
     def parse_post_replies(self, response):
         """解析帖子回复页（第2页及以后）"""
         post_id = response.meta['post_id']
-        current_replies = response.meta['current_replies']
+        page = response.meta['reply_page']
+        
+        logger.info(f"Parsing replies page {page} for post {post_id}: {response.url}")
+        
+        replies = self.extract_replies(response, post_id, start_floor=response.meta['start_floor'])
+        yield from self.release_replies(post_id, self.reassembler.add(post_id, page, self.unseen_replies(response, replies)))
+
+    def parse_post_replies_api(self, response, variables):
+        """解析 viewthread 接口返回的回复页（楼层按接口的每页楼层数计算）"""
+        post_id = response.meta['post_id']
+        page = response.meta['reply_page']
+        per_page = discuz_api.posts_per_page(variables, self.posts_per_page)
+        replies = self.api_replies(post_id, variables.get('postlist') or [], start_floor=(page - 1) * per_page + 1)
+        yield from self.release_replies(post_id, self.reassembler.add(post_id, page, self.unseen_replies(response, replies)))
+
+    def unseen_replies(self, response, replies):
+        """增量重爬时去掉第一个未见楼层之前的回复"""
+        first_floor = response.meta.get('first_floor')
+        if first_floor is None:
+            return replies
+        return [reply for reply in replies if reply['floor_num'] >= first_floor]
+
+    def parse_thread_update(self, response):
+        """增量重爬：解析第一个未见楼层所在的回复页，并发请求后续新楼层所在的页"""
+        meta = response.meta
+        logger.info(f"Parsing updated post {meta['post_id']} from page {meta['reply_page']}: {response.url}")
+        total_pages = self.parse_page_count(response)
+        # 不是最后一页时本页是满页，楼层数即每页楼层数；最后一页只能沿用上次记录的值
+        per_page = self.count_page_posts(response) if meta['reply_page'] < total_pages else meta['posts_per_page']
+        replies = self.extract_replies(response, meta['post_id'], start_floor=(meta['reply_page'] - 1) * per_page + 1)
+        yield from self.continue_thread_update(response, replies, total_pages, per_page)
+
+    def parse_thread_update_api(self, response, variables):
+        meta = response.meta
+        logger.info(f"Parsing updated post {meta['post_id']} from API page {meta['reply_page']}")
+        per_page = discuz_api.posts_per_page(variables, meta['posts_per_page'])
+        replies = self.api_replies(meta['post_id'], variables.get('postlist') or [],
+                                   start_floor=(meta['reply_page'] - 1) * per_page + 1)
+        yield from self.continue_thread_update(response, replies, discuz_api.total_pages(variables, per_page), per_page)
+
+    def continue_thread_update(self, response, replies, total_pages, per_page):
+        """放出第一个未见楼层及之后的回复，并发请求其余新楼层所在的页（按本页实测的每页楼层数计算）"""
+        meta = response.meta
+        post_id = meta['post_id']
+        page = meta['reply_page']
+        first_floor = meta['first_floor']
         
-        logger.info(f"Parsing replies page for post {post_id}: {response.url}")
+        self.updating_threads.add(post_id)
+        self.thread_states[post_id] = (*meta['thread_state'], per_page)
+        replies = self.unseen_replies(response, replies)
         
-        replies = self.extract_replies(response, post_id, start_floor=current_replies + 1)
+        # 记录的每页楼层数与实测值不同时，第一个未见楼层可能在本页之前的页上
+        first_page = min(page, (first_floor - 1) // per_page + 1)
+        if per_page != meta['posts_per_page']:
+            logger.info(f"Post {post_id} has {per_page} posts per page (expected {meta['posts_per_page']}), "
+                        f"first unseen floor {first_floor} is on page {(first_floor - 1) // per_page + 1}")
         
-        for reply in replies:
-            if current_replies < self.max_replies:
-                yield reply
-                current_replies += 1
-            else:
-                break
+        # 最多抓取 MAX_REPLIES_PER_POST 条新回复
+        last_floor = first_floor + self.max_replies - 1
+        num_pages = max(page, min(total_pages, math.ceil(last_floor / per_page)))
+        self.reassembler.expect(post_id, num_pages, first_page=first_page)
+        self.crawler.stats.inc_value('incremental/pages_fetched')
+        yield from self.release_replies(post_id, self.reassembler.add(post_id, page, replies))
+        
+        for next_page in range(first_page, num_pages + 1):
+            if next_page == page:
+                continue
+            self.crawler.stats.inc_value('incremental/pages_fetched')
+            yield self.thread_page_request(
+                post_id, next_page, self.parse_post_replies,
+                errback=self.reply_page_failed,
+                meta={
+                    'post_id': post_id,
+                    'reply_page': next_page,
+                    'start_floor': (next_page - 1) * per_page + 1,
+                    'first_floor': first_floor,
+                    'page_num': meta['page_num']
+                }
+            )
+
+    def reply_page_failed(self, failure):
+        meta = failure.request.meta
+        post_id = meta['post_id']
+        self.crawler.stats.inc_value('reply_pages/failed')
+        if not self.reassembler.is_pending(post_id):
+            # 增量重爬的首页失败，此时还没有登记回复页，下次运行重新抓取
+            return
+        self.failed_threads.add(post_id)
+        yield from self.release_replies(post_id, self.reassembler.fail(post_id, meta['reply_page']))
+
+    def release_replies(self, post_id, replies):
+        """放出按顺序重组的回复；帖子的回复页全部到达后记录列表页状态"""
+        if post_id in self.updating_threads and replies:
+            self.crawler.stats.inc_value('incremental/new_replies', len(replies))
+        if post_id in self.post_boards and replies:
+            self.crawler.stats.inc_value(f'boards/{self.post_boards[post_id]}/replies', len(replies))
+        yield from replies
+        if self.reassembler.is_pending(post_id):
+            return
+        
+        self.post_boards.pop(post_id, None)
+        state = self.thread_states.pop(post_id, None)
+        self.updating_threads.discard(post_id)
+        if post_id in self.failed_threads:
+            # 有回复页失败时不更新状态，下次运行仍会从第一个未见楼层重新抓取
+            self.failed_threads.discard(post_id)
+        elif state is not None:
+            self.seen_store.set_thread_state(post_id, *state)
+
+    def parse_page_count(self, response):
+        """从Discuz分页器读取总页数（“共 N 页”，没有时取页码链接中的最大值）"""
+        title = response.css('div.pg span[title]::attr(title)').get()
+        match = re.search(r'共\s*(\d+)\s*页', title or '')
+        if match:
+            return int(match.group(1))
+        page_numbers = [int(text) for text in response.css('div.pg a:not(.nxt)::text').re(r'(\d+)')]
+        return max(page_numbers, default=1)
+
+    def count_page_posts(self, response):
+        """当前页的楼层数（即每页楼层数），取不到时使用 THREAD_POSTS_PER_PAGE"""
+        count = len(response.xpath('//div[re:test(@id, "^post_\\d+$")]'))
+        return count or self.posts_per_page
+
+    def reply_pages_needed(self, response):
+        """抓取 MAX_REPLIES_PER_POST 条回复所需的页数（第1楼为主帖）和每页楼层数"""
+        total_pages = self.parse_page_count(response)
+        if total_pages <= 1:
+            return 1, self.posts_per_page
+        per_page = self.count_page_posts(response)  # 不是最后一页，楼层数即每页楼层数
+        return self.pages_for_replies(total_pages, per_page), per_page
+
+    def pages_for_replies(self, total_pages, per_page):
+        return min(total_pages, math.ceil((self.max_replies + 1) / per_page))
+
+    def is_existing_post(self, post_id):
+        """帖子是否已在之前的运行中爬取过"""
+        return self.seen_store.contains(POST, post_id)
+
+    def frontier_state(self):
+        """断点续爬要保存的爬虫状态（FrontierScheduler 在每个检查点保存）"""
+        return {
+            'boards': {board_id: {'found_posts_count': board.found_posts_count, 'done': board.done,
+                                  'pages_parsed': board.pages_parsed, 'next_page': board.next_page}
+                       for board_id, board in self.boards.items()},
+            'list_seen_post_ids': self.list_seen_post_ids,
+            'post_boards': self.post_boards,
+            'list_thread_stats': self.list_thread_stats,
+            'list_thread_views': self.list_thread_views,
+            'thread_states': self.thread_states,
+            'updating_threads': self.updating_threads,
+            'failed_threads': self.failed_threads,
+            'reassembler': self.reassembler.threads,
+            'api_enabled': self.api_enabled,
+            'api_failures': self.api_failures,
+        }
+
+    def restore_frontier_state(self, state):
+        """从断点恢复爬虫状态（配置中已删除的板块忽略）"""
+        for board_id, board_state in state['boards'].items():
+            board = self.boards.get(board_id)
+            if board is not None:
+                board.found_posts_count = board_state['found_posts_count']
+                board.done = board_state['done']
+                board.pages_parsed = board_state['pages_parsed']
+                board.next_page = board_state['next_page']
+        self.list_seen_post_ids = state['list_seen_post_ids']
+        self.post_boards = state['post_boards']
+        self.list_thread_stats = state['list_thread_stats']
+        self.list_thread_views = state['list_thread_views']
+        self.thread_states = state['thread_states']
+        self.updating_threads = state['updating_threads']
+        self.failed_threads = state['failed_threads']
+        self.reassembler.threads = state['reassembler']
+        self.api_enabled = state['api_enabled']
+        self.api_failures = state['api_failures']
+        found = ', '.join(f"{board.board_id}: {board.found_posts_count}/{board.max_posts}"
+                          for board in self.boards.values())
+        logger.info(f"Restored spider state: posts found per board ({found}), "
+                    f"{len(self.reassembler.threads)} posts waiting for reply pages")
+
+    def closed(self, reason):
+        """爬虫关闭时保存已见集合"""
+        self.record_list_timings()
+        incomplete = self.reassembler.incomplete() if self.reassembler else {}
+        if incomplete:
+            logger.warning(f"Reply pages still missing at close: {incomplete}")
+            self.crawler.stats.set_value('reply_pages/incomplete_posts', len(incomplete))
+        if self.selector_cache:
+            self.selector_cache.save()
+        if self.seen_store:
+            for name, value in self.seen_store.bloom_metrics().items():
+                self.crawler.stats.set_value(f'bloom/{name}', value)
+            self.seen_store.close()
+
+    def record_list_timings(self):
+        """列表页耗时统计：墙钟时间与各页下载延迟之和的比值即并行带来的加速"""
+        timings = [timing for board in self.boards.values() for timing in board.page_timings.values()]
+        if not timings:
+            return
+        stats = self.crawler.stats
+        wall_seconds = max(t['completed_at'] for t in timings)
+        latency_sum = sum(t['latency'] or 0 for t in timings)
+        for board in self.boards.values():
+            for page_num, timing in sorted(board.page_timings.items()):
+                logger.info(f"Board {board.board_id} list page {page_num}: latency {timing['latency'] or 0:.2f}s, "
+                            f"completed at {timing['completed_at']:.2f}s, {timing['links']} links")
+            if board.page_timings:
+                stats.set_value(f'boards/{board.board_id}/list_pages', len(board.page_timings))
+                stats.set_value(f'boards/{board.board_id}/wall_seconds',
+                                round(max(t['completed_at'] for t in board.page_timings.values()), 3))
+        stats.set_value('list_crawl/mode', self.list_crawl_mode)
+        stats.set_value('list_crawl/pages_parsed', len(timings))
+        stats.set_value('list_crawl/wall_seconds', round(wall_seconds, 3))
+        stats.set_value('list_crawl/latency_sum_seconds', round(latency_sum, 3))
+        logger.info(f"List crawl ({self.list_crawl_mode}): {len(timings)} pages of {len(self.boards)} boards in {wall_seconds:.2f}s, "
+                    f"sum of page latencies {latency_sum:.2f}s")
 
     def extract_post_id(self, url):
         """从URL中提取帖子ID"""
@@ -235,6 +785,14 @@ class HassbianSpider(scrapy.Spider):
             return match.group(1)
         return None
 
+    def page_extractor(self, response):
+        """lxml后端：返回该页的单次遍历结果，css后端返回None"""
+        if self.extraction_backend != 'lxml':
+            return None
+        if self._page_extractor is None or self._page_extractor[0] is not response:
+            self._page_extractor = (response, ThreadPageExtractor.from_response(response))
+        return self._page_extractor[1]
+
     def extract_post_info(self, response, post_id):
         """提取帖子信息"""
         try:
@@ -244,6 +802,10 @@ class HassbianSpider(scrapy.Spider):
             loader.add_value('post_id', post_id)
             loader.add_value('post_url', response.url)
             
+            # lxml后端：各字段首选选择器的结果，取不到的字段回退到下面的选择器链
+            extractor = self.page_extractor(response)
+            fast = extractor.post_fields() if extractor else {}
+            
             # 标题 - 尝试多种选择器
             title_selectors = [
                 '#thread_subject::text',
@@ -253,11 +815,10 @@ class HassbianSpider(scrapy.Spider):
                 '.threadtitle a::text'
             ]
             
-            title = None
-            for selector in title_selectors:
-                title = response.css(selector).get()
-                if title:
-                    break
+            title = fast.get('title')
+            if not title:
+                title, _ = self.selector_cache.first_match(
+                    'title', title_selectors, lambda selector: response.css(selector).get())
             
             if title:
                 loader.add_value('title', title.strip())
@@ -275,11 +836,10 @@ class HassbianSpider(scrapy.Spider):
                 'td.postauthor .username::text'
             ]
             
-            author = None
-            for selector in author_selectors:
-                author = response.css(selector).get()
-                if author:
-                    break
+            author = fast.get('author')
+            if not author:
+                author, _ = self.selector_cache.first_match(
+                    'author', author_selectors, lambda selector: response.css(selector).get())
             
             if author:
                 loader.add_value('author', author.strip())
@@ -292,11 +852,10 @@ class HassbianSpider(scrapy.Spider):
                 '.postdate::text'
             ]
             
-            post_time = None
-            for selector in time_selectors:
-                post_time = response.css(selector).get()
-                if post_time:
-                    break
+            post_time = fast.get('post_time')
+            if not post_time:
+                post_time, _ = self.selector_cache.first_match(
+                    'post_time', time_selectors, lambda selector: response.css(selector).get())
             
             # 如果没找到，尝试从页面文本中提取
             if not post_time:
@@ -315,15 +874,18 @@ class HassbianSpider(scrapy.Spider):
                 'td[id^="postmessage_"]:first-child'
             ]
             
-            content = None
-            for selector in content_selectors:
+            def first_content(selector):
                 content_elems = response.css(selector)
                 if content_elems:
                     # 获取第一个元素的所有文本内容
                     content_texts = content_elems[0].css('::text').getall()
                     if content_texts:
-                        content = ' '.join([text.strip() for text in content_texts if text.strip()])
-                        break
+                        return ' '.join([text.strip() for text in content_texts if text.strip()])
+                return None
+            
+            content = fast.get('content')
+            if not content:
+                content, _ = self.selector_cache.first_match('content', content_selectors, first_content)
             
             # 如果还是没有内容，尝试更宽泛的选择器
             if not content or len(content.strip()) < 10:
@@ -352,7 +914,7 @@ class HassbianSpider(scrapy.Spider):
                 logger.warning(f"Could not extract content for post {post_id}")
             
             # 统计信息 - 尝试多种格式
-            stats_text = ' '.join(response.css('.postinfo::text').getall())
+            stats_text = fast['stats_text'] if extractor else ' '.join(response.css('.postinfo::text').getall())
             
             # 查看数
             view_patterns = [r'查看[：:]\s*(\d+)', r'浏览[：:]\s*(\d+)', r'(\d+)\s*次查看']
@@ -388,18 +950,26 @@ class HassbianSpider(scrapy.Spider):
         """提取回复信息"""
         replies = []
         
-        # 查找回复元素
-        reply_selectors = [
-            '[id^="post_"]',
-            '.postinfo',
-            'table[id^="pid"]'
-        ]
-        
-        reply_elements = []
-        for selector in reply_selectors:
-            reply_elements = response.css(selector)
-            if reply_elements:
-                break
+        extractor = self.page_extractor(response)
+        self._page_extractor = None
+        if extractor and extractor.blocks:
+            # lxml后端：楼层字段已在单次遍历中收集
+            reply_elements = extractor.blocks
+            reply_fields = extractor.reply_fields
+        else:
+            # 查找回复元素
+            reply_selectors = [
+                '[id^="post_"]',
+                '.postinfo',
+                'table[id^="pid"]'
+            ]
+            
+            reply_elements = []
+            for selector in reply_selectors:
+                reply_elements = response.css(selector)
+                if reply_elements:
+                    break
+            reply_fields = self.reply_fields
         
         if not reply_elements:
             logger.warning(f"No reply elements found for post {post_id}")
@@ -414,46 +984,35 @@ class HassbianSpider(scrapy.Spider):
                     floor_num += 1
                     continue
                 
-                loader = ItemLoader(item=ReplyItem(), selector=elem)
+                fields = reply_fields(elem)
+                loader = ItemLoader(item=ReplyItem())
                 
                 loader.add_value('post_id', post_id)
                 loader.add_value('floor_num', floor_num)
                 
                 # 回复者
-                author = elem.css('.postauthor a::text').get() or \
-                        elem.css('.authi a::text').get() or \
-                        elem.css('[id^="postauthor"] a::text').get()
-                if author:
-                    loader.add_value('author', author.strip())
+                if fields['author']:
+                    loader.add_value('author', fields['author'].strip())
                 
                 # 回复时间
-                reply_time = elem.css('.authi em::text').get() or \
-                           elem.css('.postinfo::text').re_first(r'(\d{4}-\d{1,2}-\d{1,2} \d{1,2}:\d{1,2})')
+                reply_time = fields['reply_time']
+                if not reply_time:
+                    for text in fields['postinfo_texts']:
+                        match = re.search(r'(\d{4}-\d{1,2}-\d{1,2} \d{1,2}:\d{1,2})', text)
+                        if match:
+                            reply_time = match.group(1)
+                            break
                 if reply_time:
                     loader.add_value('reply_time', reply_time.strip())
                 
                 # 回复内容
-                content_selectors = [
-                    '.postcontent .postmessage',
-                    '.t_msgfont', 
-                    '[id^="postmessage_"]',
-                    '.postbody .postmessage'
-                ]
-                
-                content = None
-                for selector in content_selectors:
-                    content_elem = elem.css(selector)
-                    if content_elem:
-                        content = ' '.join(content_elem.css('::text').getall())
-                        break
-                
+                content = fields['content']
                 if content and content.strip():
                     loader.add_value('content', content)
                     
                     # 提取回复ID
-                    reply_id = elem.css('::attr(id)').get()
-                    if reply_id:
-                        loader.add_value('reply_id', reply_id)
+                    if fields['reply_id']:
+                        loader.add_value('reply_id', fields['reply_id'])
                     
                     reply_item = loader.load_item()
                     replies.append(reply_item)
@@ -469,6 +1028,91 @@ class HassbianSpider(scrapy.Spider):
         logger.info(f"Extracted {len(replies)} replies for post {post_id}")
         return replies
 
+    def reply_fields(self, elem):
+        """css后端：用选择器提取一个楼层的字段"""
+        # 回复内容
+        content_selectors = [
+            '.postcontent .postmessage',
+            '.t_msgfont', 
+            '[id^="postmessage_"]',
+            '.postbody .postmessage'
+        ]
+        
+        content = None
+        for selector in content_selectors:
+            content_elem = elem.css(selector)
+            if content_elem:
+                content = ' '.join(content_elem.css('::text').getall())
+                break
+        
+        reply_time = elem.css('.authi em::text').get()
+        return {
+            'author': elem.css('.postauthor a::text').get() or
+                      elem.css('.authi a::text').get() or
+                      elem.css('[id^="postauthor"] a::text').get(),
+            'reply_time': reply_time,
+            'postinfo_texts': [] if reply_time else elem.css('.postinfo::text').getall(),
+            'content': content,
+            'reply_id': elem.css('::attr(id)').get(),
+        }
+
+    def api_post_item(self, response, post_id, thread, postlist):
+        """由 viewthread 接口的主题信息和第1楼生成帖子item"""
+        first = next((post for post in postlist if str(post.get('first')) == '1'), None)
+        if first is None and not thread:
+            logger.warning(f"No thread data in API response for post {post_id}")
+            return None
+        first = first or {}
+        
+        loader = ItemLoader(item=PostItem())
+        loader.add_value('post_id', post_id)
+        loader.add_value('post_url', response.meta['html_url'])
+        loader.add_value('title', discuz_api.text_of(thread.get('subject')) or f'未知标题_{post_id}')
+        
+        author = first.get('author') or thread.get('author')
+        if author:
+            loader.add_value('author', author)
+        post_time = discuz_api.display_time(first.get('dateline'), first.get('dbdateline'))
+        if post_time:
+            loader.add_value('post_time', post_time)
+        loader.add_value('content', discuz_api.text_of(first.get('message')) or '暂无内容')
+        
+        if thread.get('views') is not None:
+            loader.add_value('view_count', discuz_api.to_int(thread['views']))
+        if thread.get('replies') is not None:
+            loader.add_value('reply_count', discuz_api.to_int(thread['replies']))
+        return loader.load_item()
+
+    def api_replies(self, post_id, postlist, start_floor=1):
+        """由 viewthread 接口的 postlist 生成回复item，楼层编号规则与HTML页面相同"""
+        replies = []
+        for floor_num, post in enumerate(postlist, start_floor):
+            # 跳过楼主的帖子
+            if floor_num == 1 and start_floor == 1:
+                continue
+            content = discuz_api.text_of(post.get('message'))
+            if not content:
+                continue
+            
+            loader = ItemLoader(item=ReplyItem())
+            loader.add_value('post_id', post_id)
+            loader.add_value('floor_num', floor_num)
+            if post.get('author'):
+                loader.add_value('author', post['author'])
+            reply_time = discuz_api.display_time(post.get('dateline'), post.get('dbdateline'))
+            if reply_time:
+                loader.add_value('reply_time', reply_time)
+            loader.add_value('content', content)
+            if post.get('pid'):
+                loader.add_value('reply_id', f"post_{post['pid']}")
+            replies.append(loader.load_item())
+            
+            if len(replies) >= self.max_replies:
+                break
+        
+        logger.info(f"Extracted {len(replies)} replies for post {post_id} from API")
+        return replies
+
     def parse(self, response):
         """默认解析方法（如果直接访问帖子URL）"""
         if 'forum-' in response.url:
@@ -0,0 +1,142 @@
+"""
+SQLite 本地存储
+
+帖子、回复和最新主题写入同一个SQLite数据库，按 (source, post_id[, floor_num]) 去重更新。
+数据库使用WAL模式，写入先进入内存批次，每 batch_size 条或每 commit_interval 秒
+用 executemany 批量提交一次。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 表名 -> (列, 主键列)
+TABLES = {
+    'posts': (
+        ['source', 'post_id', 'title', 'author', 'post_time', 'post_url', 'view_count',
+         'reply_count', 'content', 'page_num', 'crawl_time'],
+        ['source', 'post_id'],
+    ),
+    'replies': (
+        ['source', 'post_id', 'floor_num', 'reply_id', 'author', 'reply_time', 'content', 'crawl_time'],
+        ['source', 'post_id', 'floor_num'],
+    ),
+    'latest_topics': (
+        ['source', 'post_id', 'title', 'post_url', 'reply_count', 'view_count', 'category_id',
+         'created_at', 'last_posted_at', 'crawl_time'],
+        ['source', 'post_id'],
+    ),
+}
+
+# item类型 -> 表名
+ITEM_TABLES = {
+    'PostItem': 'posts',
+    'TopicItem': 'posts',
+    'ReplyItem': 'replies',
+    'LatestTopicItem': 'latest_topics',
+}
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_posts_post_time ON posts (source, post_time)",
+    "CREATE INDEX IF NOT EXISTS idx_replies_author ON replies (source, author)",
+]
+
+
+def _to_column(value):
+    """把item字段值转换为SQLite可存储的值"""
+    # ItemLoader未设置输出处理器的字段是单元素列表
+    if isinstance(value, list):
+        value = value[0] if len(value) == 1 else json.dumps(value, ensure_ascii=False)
+    elif isinstance(value, dict):
+        value = json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class SqliteStore:
+    """带批量提交的SQLite存储"""
+
+    def __init__(self, path, source, batch_size=500, commit_interval=5.0):
+        self.path = path
+        self.source = source
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.conn = None
+        self.pending = {table: [] for table in TABLES}
+        self.pending_count = 0
+        self.last_commit = time.monotonic()
+        self.written = {table: 0 for table in TABLES}
+        self.commits = 0
+        self.statements = {table: self._upsert_sql(table) for table in TABLES}
+
+    @classmethod
+    def from_spider(cls, spider, path=None):
+        """按 CUSTOM_SETTINGS 创建存储，数据库文件位于输出目录下"""
+        custom_settings = spider.settings.get('CUSTOM_SETTINGS', {})
+        output_dir = custom_settings.get('OUTPUT_DIR', 'output')
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        return cls(
+            os.path.join(output_dir, path or custom_settings.get('SQLITE_DB', 'forum_data.db')),
+            source=custom_settings.get('SQLITE_SOURCE') or spider.allowed_domains[0],
+            batch_size=custom_settings.get('SQLITE_BATCH_SIZE', 500),
+            commit_interval=custom_settings.get('SQLITE_COMMIT_INTERVAL', 5.0),
+        )
+
+    def open(self):
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for table, (columns, keys) in TABLES.items():
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)}, PRIMARY KEY ({', '.join(keys)}))"
+            )
+        for statement in INDEXES:
+            self.conn.execute(statement)
+        self.conn.commit()
+        logger.info(f"SQLite store opened: {self.path} (source: {self.source})")
+
+    def add(self, item_type, record):
+        """加入一条记录，达到批量阈值时提交；不支持的item类型返回False"""
+        table = ITEM_TABLES.get(item_type)
+        if not table:
+            return False
+
+        row = dict(record, source=self.source)
+        columns = TABLES[table][0]
+        self.pending[table].append(tuple(_to_column(row.get(column)) for column in columns))
+        self.pending_count += 1
+
+        if self.pending_count >= self.batch_size or time.monotonic() - self.last_commit >= self.commit_interval:
+            self.flush()
+        return True
+
+    def flush(self):
+        """批量写入并提交所有待写记录"""
+        if self.pending_count:
+            with self.conn:
+                for table, rows in self.pending.items():
+                    if rows:
+                        self.conn.executemany(self.statements[table], rows)
+                        self.written[table] += len(rows)
+                        self.pending[table] = []
+            self.pending_count = 0
+            self.commits += 1
+        self.last_commit = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+        logger.info(f"SQLite store closed: {self.written} rows written in {self.commits} commits")
+
+    @staticmethod
+    def _upsert_sql(table):
+        columns, keys = TABLES[table]
+        updates = ', '.join(f"{column} = excluded.{column}" for column in columns if column not in keys)
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}"
+        )
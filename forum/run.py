@@ -9,6 +9,7 @@ import sys
 import argparse
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
+from forum_spider.replay import apply_replay_settings
 
 
 def main():
@@ -30,6 +31,11 @@ def main():
                        help='启用调试模式')
     parser.add_argument('--no-cache', action='store_true',
                        help='禁用HTTP缓存')
+    parser.add_argument('--replay', nargs='?', const='', default=None, metavar='CORPUS',
+                       help='离线回放：只从录制的语料返回响应（默认为HTTP缓存目录，也可以是WARC文件/目录），'
+                            '不访问网络、不限速，结束时报告解析和Pipeline吞吐量')
+    parser.add_argument('--fresh', action='store_true',
+                       help='丢弃上次未完成爬取的断点（请求队列和爬虫状态），重新开始')
     
     args = parser.parse_args()
     
@@ -43,6 +49,7 @@ def main():
         'MAX_POSTS_PER_PAGE': args.posts,
         'MAX_REPLIES_PER_POST': args.replies,
         'OUTPUT_DIR': args.output,
+        'FRONTIER_RESUME': not args.fresh,
     })
     
     settings.set('DOWNLOAD_DELAY', args.delay)
@@ -53,6 +60,9 @@ def main():
     if args.no_cache:
         settings.set('HTTPCACHE_ENABLED', False)
     
+    if args.replay is not None:
+        apply_replay_settings(settings, args.replay or None)
+    
     # 创建输出目录
     if not os.path.exists(args.output):
         os.makedirs(args.output)
@@ -70,6 +80,7 @@ def main():
 - 请求延迟: {args.delay}秒
 - 调试模式: {'开启' if args.debug else '关闭'}
 - HTTP缓存: {'禁用' if args.no_cache else '启用'}
+- 离线回放: {(args.replay or 'HTTP缓存') if args.replay is not None else '关闭'}
         """)
     else:
         print(f"""
@@ -83,6 +94,7 @@ def main():
 - 请求延迟: {args.delay}秒
 - 调试模式: {'开启' if args.debug else '关闭'}
 - HTTP缓存: {'禁用' if args.no_cache else '启用'}
+- 离线回放: {(args.replay or 'HTTP缓存') if args.replay is not None else '关闭'}
         """)
     
     # 启动爬虫，传递URL参数
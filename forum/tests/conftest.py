@@ -0,0 +1,41 @@
+"""
+测试共用的fixture：保存的Discuz接口响应和使用临时输出目录的爬虫实例
+"""
+
+import os
+
+import pytest
+from scrapy import Request
+from scrapy.http import TextResponse
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.test import get_crawler
+
+from forum_spider.spiders.hassbian_spider import HassbianSpider
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def fixture_response(name, url='https://bbs.hassbian.com/api/mobile/index.php', meta=None):
+    """用 fixtures/ 下保存的响应体构造响应，meta 为对应请求的meta"""
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        body = f.read()
+    request = Request(url, meta=meta or {})
+    return TextResponse(url, body=body, encoding='utf-8', request=request)
+
+
+def create_spider(tmp_path, settings=None, **custom):
+    """项目设置（可覆盖）下的爬虫，已见集合、HTTP缓存等输出写到临时目录"""
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'forum_spider.settings')
+    custom_settings = dict(get_project_settings().get('CUSTOM_SETTINGS', {}), OUTPUT_DIR=str(tmp_path), **custom)
+    crawler = get_crawler(HassbianSpider, {'HTTPCACHE_DIR': str(tmp_path / 'httpcache'), **(settings or {}),
+                                           'CUSTOM_SETTINGS': custom_settings})
+    crawler.spider = crawler._create_spider()
+    return crawler.spider
+
+
+@pytest.fixture
+def spider(tmp_path):
+    """开启API模式的爬虫"""
+    spider = create_spider(tmp_path, DISCUZ_API_ENABLED=True)
+    yield spider
+    spider.seen_store.close()
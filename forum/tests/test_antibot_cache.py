@@ -0,0 +1,104 @@
+"""
+反爬虫检测与HTTP缓存：缓存的拦截页不计入熔断，重试的请求跳过缓存条目重新下载
+"""
+
+import pytest
+from scrapy import Request
+from scrapy.downloadermiddlewares.httpcache import HttpCacheMiddleware
+from scrapy.http import HtmlResponse
+
+from forum_spider.middlewares import ResponseValidationMiddleware
+from tests.conftest import create_spider
+
+URL = 'https://bbs.hassbian.com/thread-28311-1-1.html'
+BLOCK_PAGE = ('<html><body>' + ' ' * 200 + '请输入验证码</body></html>').encode('utf-8')
+NORMAL_PAGE = ('<html><body>' + '帖子内容 ' * 50 + '</body></html>').encode('utf-8')
+
+
+class Site:
+    """HTTP缓存 -> 反爬虫检测，未命中缓存时由“服务器”按顺序返回页面（页面或 (状态码, 页面)）"""
+
+    def __init__(self, spider, pages):
+        self.spider = spider
+        self.pages = list(pages)
+        self.hits = 0
+        self.cache = HttpCacheMiddleware.from_crawler(spider.crawler)
+        self.cache.spider_opened(spider)
+        self.validation = ResponseValidationMiddleware.from_crawler(spider.crawler)
+
+    def fetch(self, request):
+        response = self.cache.process_request(request)
+        if response is None:
+            self.hits += 1
+            page = self.pages.pop(0)
+            status, body = page if isinstance(page, tuple) else (200, page)
+            response = HtmlResponse(request.url, status=status, body=body, encoding='utf-8', request=request)
+            response = self.cache.process_response(request, response)
+        return self.validation.process_response(request, response, self.spider)
+
+    def breaker(self):
+        return self.validation.domains['bbs.hassbian.com']
+
+
+@pytest.fixture
+def site(tmp_path):
+    spider = create_spider(tmp_path, settings={
+        'HTTPCACHE_ENABLED': True,
+        'HTTPCACHE_EXPIRATION_SECS': 3600,
+        'HTTPCACHE_STORAGE': 'forum_spider.httpcache.SqliteCacheStorage',
+        'HTTPCACHE_POLICY': 'forum_spider.httpcache.RevalidatingPolicy',
+    }, CIRCUIT_BREAKER_THRESHOLD=2)
+    site = Site(spider, [BLOCK_PAGE, NORMAL_PAGE])
+    yield site
+    site.cache.spider_closed(spider)
+    spider.seen_store.close()
+
+
+def test_retry_refetches_cached_block_page(site):
+    retry = site.fetch(Request(URL))
+    assert isinstance(retry, Request) and retry.meta['antibot_retries'] == 1
+    
+    # 重试跳过缓存的拦截页，直接下载（不带条件头），新响应覆盖缓存条目
+    response = site.fetch(retry)
+    assert isinstance(response, HtmlResponse) and 'cached' not in response.flags
+    assert b'If-None-Match' not in retry.headers and b'If-Modified-Since' not in retry.headers
+    assert site.hits == 2
+    
+    response = site.fetch(Request(URL))
+    assert 'cached' in response.flags and response.body == NORMAL_PAGE
+    assert site.hits == 2
+
+
+def test_cached_block_page_does_not_trip_breaker(site):
+    site.fetch(Request(URL))
+    assert site.breaker()['consecutive'] == 1
+    
+    # 同一页面的其它请求命中缓存的拦截页：照样重新入队，但不计入熔断
+    retry = site.fetch(Request(URL))
+    assert isinstance(retry, Request) and retry.meta['antibot_retries'] == 1
+    assert site.breaker() == {'consecutive': 1, 'trips': 0, 'paused_until': 0.0}
+    assert site.spider.crawler.stats.get_value('antibot/detected_cached') == 1
+    assert site.hits == 1
+
+
+def test_cached_normal_page_does_not_reset_breaker(site):
+    site.pages = [NORMAL_PAGE, BLOCK_PAGE]
+    site.fetch(Request(URL))
+    site.fetch(Request('https://bbs.hassbian.com/thread-28312-1-1.html'))
+    assert site.breaker()['consecutive'] == 1
+    
+    response = site.fetch(Request(URL))
+    assert 'cached' in response.flags
+    assert site.breaker()['consecutive'] == 1
+
+
+def test_retried_status_is_not_cached(site):
+    site.pages = [(503, b'Service Unavailable'), NORMAL_PAGE]
+    response = site.fetch(Request(URL))
+    assert response.status == 503
+    
+    # 重试（RetryMiddleware）重新下载，而不是回放缓存的503
+    response = site.fetch(Request(URL))
+    assert response.status == 200 and 'cached' not in response.flags
+    assert site.hits == 2
+    assert 'cached' in site.fetch(Request(URL)).flags
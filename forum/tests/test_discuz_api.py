@@ -0,0 +1,139 @@
+"""
+Discuz移动端JSON API：接口响应解析，以及爬虫的API解析和回退到HTML页面
+"""
+
+from scrapy import Request
+
+from forum_spider import discuz_api
+from forum_spider.items import PostItem, ReplyItem
+from tests.conftest import fixture_response
+
+VIEWTHREAD_URL = discuz_api.viewthread_url('https://bbs.hassbian.com', '28311', 1)
+FORUMDISPLAY_URL = discuz_api.forumdisplay_url('https://bbs.hassbian.com', '38', 1)
+THREAD_HTML_URL = 'https://bbs.hassbian.com/thread-28311-1-1.html'
+
+
+def api_meta(html_callback, html_url=THREAD_HTML_URL, html_errback=None, **meta):
+    return dict(meta, html_url=html_url, html_callback=html_callback, html_errback=html_errback)
+
+
+def test_variables():
+    assert 'postlist' in discuz_api.variables(fixture_response('discuz_api/viewthread.json'))
+    assert 'forum_threadlist' in discuz_api.variables(fixture_response('discuz_api/forumdisplay.json'))
+
+
+def test_variables_without_data():
+    # 只有登录信息和提示信息、或者根本不是JSON时没有可用数据
+    message_only = fixture_response('discuz_api/message_only.json')
+    assert discuz_api.variables(message_only) is None
+    assert discuz_api.message_of(message_only) == 'to_login//1'
+    not_json = fixture_response('discuz_api/not_json.html')
+    assert discuz_api.variables(not_json) is None
+    assert discuz_api.message_of(not_json) is None
+
+
+def test_thread_list():
+    variables = discuz_api.variables(fixture_response('discuz_api/forumdisplay.json'))
+    assert discuz_api.thread_list(variables) == [
+        ('28311', 23, '2025-8-3 21:07', 1532),  # dblastpost 时间戳
+        ('28296', 4, '2025-7-31 08:15', 877),  # 纯文本
+        ('28290', 0, '2025-7-29 10:02', 210),  # span 的 title
+    ]
+
+
+def test_total_pages():
+    variables = discuz_api.variables(fixture_response('discuz_api/viewthread.json'))
+    per_page = discuz_api.posts_per_page(variables, 10)
+    assert per_page == 5
+    # 12条回复 + 主帖 = 13楼，每页5楼
+    assert discuz_api.total_pages(variables, per_page) == 3
+    assert discuz_api.total_pages(variables, 10) == 2
+    assert discuz_api.posts_per_page({}, 10) == 10
+    assert discuz_api.posts_per_page({'ppp': '0'}, 10) == 10
+    assert discuz_api.total_pages({}, 10) == 1
+
+
+def test_display_time():
+    assert discuz_api.display_time('3 天前', '1754010720') == '2025-8-1 09:12'
+    assert discuz_api.display_time('<span title="2025-8-1 10:30">3&nbsp;天前</span>', '0') == '2025-8-1 10:30'
+    assert discuz_api.display_time('2025-7-31 08:15') == '2025-7-31 08:15'
+    assert discuz_api.display_time('') is None
+    assert discuz_api.display_time(None, None) is None
+
+
+def test_parse_post_detail_api(spider):
+    response = fixture_response('discuz_api/viewthread.json', VIEWTHREAD_URL,
+                                api_meta('parse_post_detail', page_num=1, post_id='28311'))
+    output = list(spider.parse_api(response))
+    
+    posts = [item for item in output if isinstance(item, PostItem)]
+    assert len(posts) == 1
+    assert posts[0]['title'] == 'HA 2025.8 升级后 & 米家集成失效'
+    assert posts[0]['post_time'] == '2025-8-1 09:12'
+    assert posts[0]['reply_count'] == 12
+    assert 'Config entry not ready' in posts[0]['content']
+    
+    # 第4楼内容为空，跳过
+    replies = [item for item in output if isinstance(item, ReplyItem)]
+    assert [reply['floor_num'] for reply in replies] == [2, 3, 5]
+    assert replies[1]['content'] == '回滚到 2025.7.4 可以暂时解决 同样的问题 >_<'
+    assert replies[0]['reply_id'] == ['post_611020']  # 与HTML页面一样没有输出处理器
+    
+    # 其余回复页仍走API，起始楼层按接口的每页楼层数（ppp=5）计算
+    requests = [request for request in output if isinstance(request, Request)]
+    assert [request.meta['reply_page'] for request in requests] == [2, 3]
+    assert [request.meta['start_floor'] for request in requests] == [6, 11]
+    assert all('module=viewthread' in request.url for request in requests)
+    assert requests[0].meta['html_url'] == 'https://bbs.hassbian.com/thread-28311-2-1.html'
+
+
+def test_parse_forum_list_api(spider):
+    response = fixture_response('discuz_api/forumdisplay.json', FORUMDISPLAY_URL,
+                                api_meta('parse_forum_list', html_url='https://bbs.hassbian.com/forum-38-1.html',
+                                         html_errback='list_page_failed', page_num=1, list_page=True, board_id='38'))
+    requests = list(spider.parse_api(response))
+    assert sorted(request.meta['post_id'] for request in requests) == ['28290', '28296', '28311']
+    assert spider.list_thread_stats['28311'] == (23, '2025-8-3 21:07')
+    assert spider.list_thread_views['28296'] == 877
+
+
+def test_fallback_to_html(spider):
+    for name in ('discuz_api/message_only.json', 'discuz_api/not_json.html'):
+        response = fixture_response(name, VIEWTHREAD_URL, api_meta('parse_post_detail', page_num=1, post_id='28311'))
+        output = list(spider.parse_api(response))
+        assert len(output) == 1
+        request = output[0]
+        assert request.url == THREAD_HTML_URL
+        assert request.callback == spider.parse_post_detail
+        assert request.dont_filter
+        assert request.meta['post_id'] == '28311'
+    assert spider.crawler.stats.get_value('discuz_api/fallbacks') == 2
+    assert spider.api_enabled
+
+
+def test_fallback_keeps_errback(spider):
+    response = fixture_response('discuz_api/message_only.json', VIEWTHREAD_URL,
+                                api_meta('parse_post_replies', html_url='https://bbs.hassbian.com/thread-28311-2-1.html',
+                                         html_errback='reply_page_failed', post_id='28311', reply_page=2,
+                                         start_floor=11, page_num=1))
+    request, = spider.parse_api(response)
+    assert request.callback == spider.parse_post_replies
+    assert request.errback == spider.reply_page_failed
+
+
+def test_api_disabled_after_repeated_failures(spider):
+    meta = api_meta('parse_post_detail', page_num=1, post_id='28311')
+    for _ in range(spider.api_max_failures):
+        list(spider.parse_api(fixture_response('discuz_api/not_json.html', VIEWTHREAD_URL, meta)))
+    assert not spider.api_enabled
+    # 之后的请求直接请求HTML页面
+    request = spider.thread_page_request('28296', 1, spider.parse_post_detail)
+    assert request.url == 'https://bbs.hassbian.com/thread-28296-1-1.html'
+
+
+def test_success_resets_failures(spider):
+    meta = api_meta('parse_post_detail', page_num=1, post_id='28311')
+    list(spider.parse_api(fixture_response('discuz_api/not_json.html', VIEWTHREAD_URL, meta)))
+    assert spider.api_failures == 1
+    list(spider.parse_api(fixture_response('discuz_api/viewthread.json', VIEWTHREAD_URL, meta)))
+    assert spider.api_failures == 0
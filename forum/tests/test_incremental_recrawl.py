@@ -0,0 +1,71 @@
+"""
+增量重爬：按帖子实测的每页楼层数计算新楼层所在的页和楼层号
+"""
+
+from scrapy import Request
+
+from forum_spider import discuz_api
+from forum_spider.items import ReplyItem
+from forum_spider.seen_store import POST, REPLY
+from tests.conftest import fixture_response
+
+POST_ID = '28311'
+
+
+def seen_thread(spider, max_floor, state, posts_per_page=None):
+    spider.seen_store.add(POST, POST_ID)
+    spider.seen_store.add(REPLY, f'{POST_ID}_{max_floor}')
+    spider.seen_store.set_thread_state(POST_ID, *state, posts_per_page)
+
+
+def update_request(spider):
+    spider.list_thread_stats[POST_ID] = (12, '2025-8-2 08:40')
+    return spider.thread_update_request(spider.boards['38'], POST_ID, 1)
+
+
+def test_update_request_uses_recorded_page_size(spider):
+    seen_thread(spider, 7, (10, '2025-8-1 12:05'), posts_per_page=5)
+    request = update_request(spider)
+    assert request.meta['reply_page'] == 2
+    assert request.meta['posts_per_page'] == 5
+    assert request.meta['first_floor'] == 8
+
+
+def test_update_request_without_recorded_page_size(spider):
+    # 之前的版本记录的状态没有每页楼层数，按 THREAD_POSTS_PER_PAGE 估计
+    seen_thread(spider, 7, (10, '2025-8-1 12:05'))
+    request = update_request(spider)
+    assert request.meta['reply_page'] == 1
+    assert request.meta['posts_per_page'] == spider.posts_per_page == 10
+
+
+def test_update_corrects_page_size_from_api(spider):
+    seen_thread(spider, 7, (10, '2025-8-1 12:05'))
+    request = update_request(spider)
+    response = fixture_response('discuz_api/viewthread.json', request.url, request.meta)
+    output = list(spider.parse_api(response))
+    
+    # 第1页（1-5楼）都已见过；按接口的 ppp=5，第8楼在第2页，12条回复共3页
+    assert not [item for item in output if isinstance(item, ReplyItem)]
+    requests = [item for item in output if isinstance(item, Request)]
+    assert [r.meta['reply_page'] for r in requests] == [2, 3]
+    assert [r.meta['start_floor'] for r in requests] == [6, 11]
+    assert all(r.meta['first_floor'] == 8 for r in requests)
+    assert spider.thread_states[POST_ID] == (12, '2025-8-2 08:40', 5)
+
+
+def test_replies_before_first_unseen_floor_dropped(spider):
+    meta = {'post_id': POST_ID, 'reply_page': 1, 'start_floor': 1, 'first_floor': 3, 'page_num': 1,
+            'html_url': 'https://bbs.hassbian.com/thread-28311-1-1.html', 'html_callback': 'parse_post_replies',
+            'html_errback': 'reply_page_failed'}
+    spider.reassembler.expect(POST_ID, 1)
+    response = fixture_response('discuz_api/viewthread.json', discuz_api.viewthread_url(spider.base_url, POST_ID, 1), meta)
+    replies = list(spider.parse_api(response))
+    assert [reply['floor_num'] for reply in replies] == [3, 5]
+
+
+def test_page_size_recorded_with_thread_state(spider):
+    seen_thread(spider, 7, (10, '2025-8-1 12:05'), posts_per_page=5)
+    spider.seen_store.flush()
+    assert spider.seen_store.thread_state(POST_ID) == (10, '2025-8-1 12:05')
+    assert spider.seen_store.thread_posts_per_page(POST_ID) == 5
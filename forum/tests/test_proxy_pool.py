@@ -0,0 +1,60 @@
+"""
+代理池：释放名额时按到达顺序唤醒等待中的请求
+"""
+
+import pytest
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+from twisted.internet.task import Clock
+
+from forum_spider.proxy_pool import ProxyPool
+
+
+@pytest.fixture
+def pool():
+    return ProxyPool(['http://a.example:8080', 'http://b.example:8080'], MemoryStatsCollector(get_crawler()),
+                     max_concurrency=1, clock=Clock())
+
+
+def waiter(pool, assigned, name, pin=None):
+    pool.wait(pin).addCallback(lambda proxy: assigned.append((name, proxy.url)))
+
+
+def test_pinned_waiter_does_not_block_free_slot(pool):
+    pinned = pool.acquire('forum-38-1')
+    other = pool.acquire()
+    assigned = []
+    waiter(pool, assigned, 'pinned', 'forum-38-1')
+    waiter(pool, assigned, 'free')
+    
+    # 绑定的代理仍然满载：空出的名额交给后面的请求，绑定的请求继续等待
+    pool.release(other)
+    assert assigned == [('free', other.url)]
+    assert len(pool.waiters) == 1
+    
+    pool.release(pinned)
+    assert assigned == [('free', other.url), ('pinned', pinned.url)]
+    assert not pool.waiters
+
+
+def test_waiters_served_in_order(pool):
+    first = pool.acquire()
+    pool.acquire()
+    assigned = []
+    for name in ('w1', 'w2', 'w3'):
+        waiter(pool, assigned, name)
+    pool.release(first)
+    assert assigned == [('w1', first.url)]
+    assert [pin for _, pin in pool.waiters] == [None, None]
+
+
+def test_cancelled_waiter_skipped(pool):
+    proxy = pool.acquire()
+    pool.acquire()
+    cancelled = pool.wait()
+    cancelled.addErrback(lambda failure: None)
+    cancelled.cancel()
+    assigned = []
+    waiter(pool, assigned, 'next')
+    pool.release(proxy)
+    assert assigned == [('next', proxy.url)]
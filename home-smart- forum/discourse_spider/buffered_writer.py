@@ -0,0 +1,95 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedFileWriter:
+	"""Append-buffering text writer with an LRU cache of open file handles.
+
+	Appends are held per file in memory and written out once a file's buffer
+	reaches flush_bytes, all buffers reach max_buffered_bytes, or flush_interval
+	seconds have passed since the last flush.
+	"""
+
+	def __init__(self, flush_bytes=64 * 1024, flush_interval=5.0, max_open_files=64,
+			max_buffered_bytes=8 * 1024 * 1024, encoding='utf-8'):
+		self.flush_bytes = flush_bytes
+		self.flush_interval = flush_interval
+		self.max_open_files = max(1, max_open_files)
+		self.max_buffered_bytes = max_buffered_bytes
+		self.encoding = encoding
+		self.buffers = {}
+		self.buffer_sizes = {}
+		self.buffered_total = 0
+		self.handles = OrderedDict()
+		self.last_flush = time.monotonic()
+		self.append_count = 0
+		self.write_count = 0
+		self.open_count = 0
+
+	def write(self, path, text):
+		# truncate and write immediately (file headers)
+		self._discard_buffer(path)
+		handle = self.handles.pop(path, None)
+		if handle:
+			handle.close()
+		handle = self._get_handle(path, 'w')
+		handle.write(text)
+		self.write_count += 1
+
+	def append(self, path, text):
+		self.buffers.setdefault(path, []).append(text)
+		self.buffer_sizes[path] = self.buffer_sizes.get(path, 0) + len(text)
+		self.buffered_total += len(text)
+		self.append_count += 1
+		if self.buffered_total >= self.max_buffered_bytes or time.monotonic() - self.last_flush >= self.flush_interval:
+			self.flush()
+		elif self.buffer_sizes[path] >= self.flush_bytes:
+			self._flush_path(path)
+
+	def flush(self):
+		for path in list(self.buffers):
+			self._flush_path(path)
+		for handle in self.handles.values():
+			handle.flush()
+		self.last_flush = time.monotonic()
+
+	def close(self):
+		self.flush()
+		while self.handles:
+			_, handle = self.handles.popitem(last=False)
+			handle.close()
+		logger.info(f"Buffered writer closed: {self.append_count} appends, {self.write_count} writes, {self.open_count} file opens")
+
+	def _flush_path(self, path):
+		chunks = self.buffers.pop(path, None)
+		if not chunks:
+			return
+		self.buffered_total -= self.buffer_sizes.pop(path, 0)
+		handle = self._get_handle(path, 'a')
+		handle.write(''.join(chunks))
+		self.write_count += 1
+
+	def _discard_buffer(self, path):
+		if self.buffers.pop(path, None) is not None:
+			self.buffered_total -= self.buffer_sizes.pop(path, 0)
+
+	def _get_handle(self, path, mode):
+		handle = self.handles.get(path)
+		if handle is not None:
+			self.handles.move_to_end(path)
+			return handle
+		# evict least recently used handles
+		while len(self.handles) >= self.max_open_files:
+			_, old = self.handles.popitem(last=False)
+			old.close()
+		directory = os.path.dirname(path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		handle = open(path, mode, encoding=self.encoding)
+		self.handles[path] = handle
+		self.open_count += 1
+		return handle
@@ -0,0 +1,364 @@
+"""Crash-safe, resumable crawl frontier.
+
+FrontierScheduler replaces Scrapy's in-memory scheduler. Pending requests
+(with their priority), the fingerprints of every scheduled request and the
+spider's own state live in a SQLite database under OUTPUT_DIR (FRONTIER_DB,
+one file per spider). Running the same spider again after the process was
+killed continues from the last checkpoint and only refetches the requests
+that were being downloaded or processed at the time:
+
+- requests table: one row per request (request.to_dict(), pickled) in state
+  pending / inflight (handed to the downloader) / done (all callback output
+  processed). Dequeued by priority, last-in-first-out within a priority like
+  Scrapy's default queues. Retries of a request reuse its row
+  (meta['frontier_id']). Non-dont_filter requests whose fingerprint is
+  already in the table are filtered, replacing RFPDupeFilter across restarts.
+- checkpoints: every FRONTIER_CHECKPOINT_INTERVAL seconds, once no callback is
+  producing output, the frontier_checkpoint signal makes pipelines write their
+  buffered output to disk, then spider.frontier_state() and the requests table
+  are committed in one transaction.
+- resume: when the previous run did not finish, inflight requests go back to
+  pending, the saved state is handed to spider.restore_frontier_state() and
+  output files are appended to (resuming()). Records written after the last
+  checkpoint are written again (at-least-once); the SQLite store upserts them.
+  Requests that ended in an errback stay inflight and are fetched again.
+
+FRONTIER_ENABLED = False uses Scrapy's default scheduler; FRONTIER_RESUME =
+False (run.py --fresh) discards the saved crawl.
+"""
+
+import os
+import pickle
+import sqlite3
+import logging
+
+from scrapy import Request
+from scrapy.core.scheduler import BaseScheduler, Scheduler
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.request import request_from_dict
+from twisted.internet import task
+
+logger = logging.getLogger(__name__)
+
+FRONTIER_ID_KEY = 'frontier_id'
+
+# sent before each checkpoint so pipelines write buffered output to disk
+frontier_checkpoint = object()
+
+PENDING = 'pending'
+INFLIGHT = 'inflight'
+DONE = 'done'
+
+# meta only meaningful within one download of this process, dropped from restored requests
+RUN_LOCAL_META = ('aimd_sent', 'download_latency')
+
+SCHEMA = [
+	"""
+	CREATE TABLE IF NOT EXISTS requests (
+		id INTEGER PRIMARY KEY,
+		fingerprint TEXT,
+		priority INTEGER NOT NULL,
+		state TEXT NOT NULL,
+		restored INTEGER NOT NULL DEFAULT 0,
+		data BLOB
+	)
+	""",
+	"CREATE INDEX IF NOT EXISTS idx_requests_fingerprint ON requests (fingerprint)",
+	"CREATE INDEX IF NOT EXISTS idx_requests_queue ON requests (state, priority, id)",
+	"CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB NOT NULL)",
+]
+
+
+def frontier_enabled(settings):
+	return settings.get('CUSTOM_SETTINGS', {}).get('FRONTIER_ENABLED', True)
+
+
+def resuming(crawler):
+	"""Whether this run resumes a previous one (output files are appended to)."""
+	frontier = getattr(crawler, 'frontier', None)
+	return frontier is not None and frontier.resumed
+
+
+def connect_checkpoint(crawler, handler):
+	if getattr(crawler, 'frontier', None) is not None:
+		crawler.signals.connect(handler, signal=frontier_checkpoint)
+
+
+def disconnect_checkpoint(crawler, handler):
+	if getattr(crawler, 'frontier', None) is not None:
+		crawler.signals.disconnect(handler, signal=frontier_checkpoint)
+
+
+class FrontierScheduler(BaseScheduler):
+	"""SQLite-backed scheduler (SCHEDULER)."""
+
+	def __init__(self, crawler, path, resume=True, checkpoint_interval=10.0):
+		self.crawler = crawler
+		self.stats = crawler.stats
+		self.fingerprinter = crawler.request_fingerprinter
+		self.path = path
+		self.resume = resume
+		self.checkpoint_interval = checkpoint_interval
+		self.conn = None
+		self.spider = None
+		self.resumed = False
+		self.pending = 0
+		self.unserializable = {}  # row id -> request that could not be saved (memory only)
+		self.processing = 0  # callbacks currently producing output
+		self.checkpoint_due = False
+		self.checkpoint_task = None
+
+	@classmethod
+	def from_crawler(cls, crawler):
+		if not frontier_enabled(crawler.settings):
+			return Scheduler.from_crawler(crawler)
+		custom = crawler.settings.get('CUSTOM_SETTINGS', {})
+		out_dir = custom.get('OUTPUT_DIR', 'output')
+		os.makedirs(out_dir, exist_ok=True)
+		db_name = custom.get('FRONTIER_DB', 'frontier_{spider}.db').format(spider=crawler.spider.name)
+		scheduler = cls(
+			crawler,
+			os.path.join(out_dir, db_name),
+			resume=custom.get('FRONTIER_RESUME', True),
+			checkpoint_interval=custom.get('FRONTIER_CHECKPOINT_INTERVAL', 10.0),
+		)
+		# FrontierMiddleware and the output pipelines find it here
+		crawler.frontier = scheduler
+		return scheduler
+
+	def open(self, spider):
+		self.spider = spider
+		self.conn = sqlite3.connect(self.path)
+		self.conn.execute("PRAGMA journal_mode=WAL")
+		self.conn.execute("PRAGMA synchronous=NORMAL")
+		for statement in SCHEMA:
+			self.conn.execute(statement)
+		self.conn.commit()
+
+		status = self._get('status')
+		if status == 'running' and self.resume:
+			self._restore(spider)
+		else:
+			if status == 'running':
+				logger.info(f"Discarding the unfinished crawl in {self.path} (FRONTIER_RESUME is off)")
+			self.conn.execute("DELETE FROM requests")
+			self.conn.execute("DELETE FROM state")
+		self._set('status', 'running')
+		self.conn.commit()
+
+		self.checkpoint_task = task.LoopingCall(self.request_checkpoint)
+		self.checkpoint_task.start(self.checkpoint_interval, now=False)
+
+	def _restore(self, spider):
+		lost = self.conn.execute("DELETE FROM requests WHERE data IS NULL AND state != ?", (DONE,)).rowcount
+		refetch = self.conn.execute("UPDATE requests SET state = ? WHERE state = ?", (PENDING, INFLIGHT)).rowcount
+		self.conn.execute("UPDATE requests SET restored = 1 WHERE state = ?", (PENDING,))
+		self.pending = self.conn.execute("SELECT COUNT(*) FROM requests WHERE state = ?", (PENDING,)).fetchone()[0]
+		done = self.conn.execute("SELECT COUNT(*) FROM requests WHERE state = ?", (DONE,)).fetchone()[0]
+
+		spider_state = self._get('spider')
+		if spider_state is not None and hasattr(spider, 'restore_frontier_state'):
+			spider.restore_frontier_state(spider_state)
+		self.resumed = True
+
+		self.stats.set_value('frontier/resumed_pending', self.pending)
+		self.stats.set_value('frontier/resumed_refetch', refetch)
+		if lost:
+			self.stats.set_value('frontier/resumed_lost', lost)
+		logger.info(f"Resuming crawl from {self.path}: {done} requests done, {self.pending} pending "
+					f"({refetch} were in flight and will be fetched again"
+					f"{f', {lost} could not be saved and are lost' if lost else ''})")
+
+	def close(self, reason):
+		if self.conn is None:
+			return
+		if self.checkpoint_task is not None and self.checkpoint_task.running:
+			self.checkpoint_task.stop()
+		if self.processing:
+			# callbacks still running: fall back to the last checkpoint
+			logger.warning(f"{self.processing} callbacks still running at close, keeping the last checkpoint")
+			self.conn.rollback()
+		else:
+			self.checkpoint(final=True)
+		if reason == 'finished':
+			self._set('status', 'finished')
+			self.conn.commit()
+		else:
+			logger.info(f"Crawl closed ({reason}) with {self.pending} pending requests, "
+						f"run again to resume from {self.path}")
+		self.stats.set_value('frontier/pending_at_close', self.pending)
+		self.conn.close()
+		self.conn = None
+
+	def has_pending_requests(self):
+		return self.pending > 0
+
+	def __len__(self):
+		return self.pending
+
+	def enqueue_request(self, request):
+		row_id = request.meta.get(FRONTIER_ID_KEY)
+		if row_id is not None:
+			# a retry of a scheduled request: reuse its row
+			row = self.conn.execute("SELECT state FROM requests WHERE id = ?", (row_id,)).fetchone()
+			if row is None:
+				row_id = None
+			elif row[0] == PENDING:
+				self.pending -= 1
+		if row_id is None:
+			fingerprint = None
+			if not request.dont_filter:
+				fingerprint = self.fingerprinter.fingerprint(request).hex()
+				if self.conn.execute("SELECT 1 FROM requests WHERE fingerprint = ? LIMIT 1", (fingerprint,)).fetchone():
+					self.stats.inc_value('dupefilter/filtered')
+					logger.debug(f"Filtered duplicate request: {request}")
+					return False
+			row_id = self.conn.execute("INSERT INTO requests (fingerprint, priority, state) VALUES (?, ?, ?)",
+									   (fingerprint, request.priority, PENDING)).lastrowid
+			request.meta[FRONTIER_ID_KEY] = row_id
+
+		data = self._serialize(request)
+		if data is None:
+			self.unserializable[row_id] = request
+		self.conn.execute("UPDATE requests SET priority = ?, state = ?, restored = 0, data = ? WHERE id = ?",
+						  (request.priority, PENDING, data, row_id))
+		self.pending += 1
+		self.stats.inc_value('scheduler/enqueued')
+		return True
+
+	def next_request(self):
+		row = self.conn.execute(
+			"SELECT id, restored, data FROM requests WHERE state = ? ORDER BY priority DESC, id DESC LIMIT 1",
+			(PENDING,)).fetchone()
+		if row is None:
+			return None
+		row_id, restored, data = row
+		self.conn.execute("UPDATE requests SET state = ? WHERE id = ?", (INFLIGHT, row_id))
+		self.pending -= 1
+		request = self.unserializable.pop(row_id, None)
+		if request is None:
+			request = request_from_dict(pickle.loads(data), spider=self.spider)
+			request.meta[FRONTIER_ID_KEY] = row_id
+			if restored:
+				for key in RUN_LOCAL_META:
+					request.meta.pop(key, None)
+		self.stats.inc_value('scheduler/dequeued')
+		return request
+
+	def _serialize(self, request):
+		# unpicklable meta values are dropped one by one; None if the request cannot be saved at all
+		try:
+			data = request.to_dict(spider=self.spider)
+		except ValueError as e:
+			logger.warning(f"Request {request} cannot be saved and will not survive a restart: {e}")
+			self.stats.inc_value('frontier/unserializable')
+			return None
+		data['meta'] = {key: value for key, value in request.meta.items() if key != FRONTIER_ID_KEY}
+		try:
+			return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+		except Exception:
+			pass
+		meta = {}
+		for key, value in data['meta'].items():
+			try:
+				pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+			except Exception:
+				logger.debug(f"Dropping unpicklable meta[{key!r}] of {request} from the saved frontier")
+				self.stats.inc_value('frontier/dropped_meta')
+				continue
+			meta[key] = value
+		data['meta'] = meta
+		try:
+			return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+		except Exception as e:
+			logger.warning(f"Request {request} cannot be saved and will not survive a restart: {e}")
+			self.stats.inc_value('frontier/unserializable')
+			return None
+
+	def begin(self):
+		self.processing += 1
+
+	def finish(self, row_id, completed):
+		# completed is False when the callback raised; the request then stays inflight
+		self.processing -= 1
+		if completed and row_id is not None and self.conn is not None:
+			self.conn.execute("UPDATE requests SET state = ?, data = NULL WHERE id = ?", (DONE, row_id))
+		if not self.processing and self.checkpoint_due:
+			self.checkpoint()
+
+	def request_checkpoint(self):
+		# deferred until no callback is producing output
+		if self.processing:
+			self.checkpoint_due = True
+		else:
+			self.checkpoint()
+
+	def checkpoint(self, final=False):
+		# output to disk, then spider state and requests in one commit; pipelines are closed when final
+		self.checkpoint_due = False
+		if self.conn is None:
+			return
+		if not final:
+			self.crawler.signals.send_catch_log(signal=frontier_checkpoint)
+		if hasattr(self.spider, 'frontier_state'):
+			self._set('spider', self.spider.frontier_state())
+		self.conn.commit()
+		self.stats.inc_value('frontier/checkpoints')
+
+	def _get(self, key):
+		row = self.conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+		return pickle.loads(row[0]) if row else None
+
+	def _set(self, key, value):
+		self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+						  (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+
+
+class FrontierMiddleware:
+	"""Marks a request done once its callback output is processed; new requests never inherit its row."""
+
+	def __init__(self, crawler):
+		self.crawler = crawler
+
+	@classmethod
+	def from_crawler(cls, crawler):
+		if not frontier_enabled(crawler.settings):
+			raise NotConfigured
+		return cls(crawler)
+
+	def _detach(self, output, row_id):
+		# requests built from response.meta or request.replace() are new requests and get their own row
+		if isinstance(output, Request) and row_id is not None and output.meta.get(FRONTIER_ID_KEY) == row_id:
+			del output.meta[FRONTIER_ID_KEY]
+		return output
+
+	def process_spider_output(self, response, result, spider):
+		frontier = getattr(self.crawler, 'frontier', None)
+		if frontier is None:
+			yield from result
+			return
+		row_id = response.meta.get(FRONTIER_ID_KEY)
+		frontier.begin()
+		completed = False
+		try:
+			for output in result:
+				yield self._detach(output, row_id)
+			completed = True
+		finally:
+			frontier.finish(row_id, completed)
+
+	async def process_spider_output_async(self, response, result, spider):
+		frontier = getattr(self.crawler, 'frontier', None)
+		if frontier is None:
+			async for output in result:
+				yield output
+			return
+		row_id = response.meta.get(FRONTIER_ID_KEY)
+		frontier.begin()
+		completed = False
+		try:
+			async for output in result:
+				yield self._detach(output, row_id)
+			completed = True
+		finally:
+			frontier.finish(row_id, completed)
@@ -0,0 +1,286 @@
+"""Single-file, compressed HTTP cache with conditional revalidation.
+
+Replaces Scrapy's FilesystemCacheStorage (several small files per response,
+full re-download once an entry expires):
+
+- SqliteCacheStorage keeps every response in .scrapy/<HTTPCACHE_DIR>/<spider>.sqlite3
+  (WAL mode). Bodies are zstd-compressed (zlib without the zstandard package);
+  bodies the server already Content-Encoded are stored as they are. Above
+  HTTPCACHE_MAX_MB the least recently used entries are evicted down to 90% of
+  the cap. Stale entries are kept so the policy can revalidate them.
+- RevalidatingPolicy serves entries younger than HTTPCACHE_EXPIRATION_SECS (0
+  never expires). Stale entries are requested again with If-None-Match /
+  If-Modified-Since from the cached ETag / Last-Modified; a 304 keeps the cached
+  response and refreshes its stored time, a 200 replaces the entry.
+  Responses with a RETRY_HTTP_CODES or HTTPCACHE_IGNORE_HTTP_CODES status are
+  not cached, so a retry downloads the page instead of replaying the error.
+
+Scrapy's HttpCacheMiddleware counts httpcache/hit, httpcache/revalidate (304)
+and httpcache/invalidate (changed). This module adds httpcache/bytes_saved
+(body bytes not downloaded thanks to hits and 304s), httpcache/conditional,
+httpcache/evictions and the database size and compression ratio at close.
+"""
+
+import os
+import time
+import zlib
+import sqlite3
+import logging
+
+from scrapy import signals
+from scrapy.extensions.httpcache import DummyPolicy
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+try:
+	import zstandard
+except ImportError:  # optional, zlib is used without it
+	zstandard = None
+
+logger = logging.getLogger(__name__)
+
+STORED_AT_KEY = 'cache_timestamp'  # same meta key as Scrapy's own storages
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+	fingerprint TEXT PRIMARY KEY,
+	method TEXT NOT NULL,
+	request_url TEXT NOT NULL,
+	url TEXT NOT NULL,
+	status INTEGER NOT NULL,
+	headers BLOB NOT NULL,
+	body BLOB NOT NULL,
+	codec TEXT NOT NULL,
+	raw_size INTEGER NOT NULL,
+	stored_size INTEGER NOT NULL,
+	stored_at REAL NOT NULL,
+	accessed_at REAL NOT NULL
+)
+"""
+
+INDEXES = [
+	"CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)",
+	"CREATE INDEX IF NOT EXISTS idx_responses_request_url ON responses (method, request_url)",
+]
+
+
+def cache_db_path(settings, spider_name):
+	"""Path of the spider's cache database."""
+	return os.path.join(data_path(settings.get('HTTPCACHE_DIR', 'httpcache')), f'{spider_name}.sqlite3')
+
+
+def uncached_codes(settings):
+	"""Statuses that are neither cached nor served from the cache: retried ones and HTTPCACHE_IGNORE_HTTP_CODES."""
+	codes = settings.getlist('HTTPCACHE_IGNORE_HTTP_CODES') + settings.getlist('RETRY_HTTP_CODES')
+	return {int(code) for code in codes}
+
+
+def available_codec(codec):
+	"""Fall back to zlib when the configured codec is unavailable."""
+	if codec == 'zstd' and zstandard is None:
+		return 'zlib'
+	return codec if codec in ('zstd', 'zlib', 'none') else 'zlib'
+
+
+def compress(data, codec):
+	if codec == 'zstd':
+		return zstandard.ZstdCompressor(level=3).compress(data)
+	if codec == 'zlib':
+		return zlib.compress(data, 6)
+	return data
+
+
+def decompress(data, codec):
+	if codec == 'zstd':
+		if zstandard is None:
+			raise RuntimeError("Cache entry is zstd-compressed but the 'zstandard' package is not installed")
+		return zstandard.ZstdDecompressor().decompress(data)
+	if codec == 'zlib':
+		return zlib.decompress(data)
+	return data
+
+
+class SqliteCacheStorage:
+	"""Compressed cache storage in a single SQLite file (HTTPCACHE_STORAGE)."""
+
+	def __init__(self, settings):
+		custom_settings = settings.get('CUSTOM_SETTINGS', {})
+		self.settings = settings
+		self.codec = available_codec(custom_settings.get('HTTPCACHE_COMPRESSION', 'zstd'))
+		self.max_bytes = int(custom_settings.get('HTTPCACHE_MAX_MB', 512) * 1024 * 1024)
+		self.commit_interval = custom_settings.get('HTTPCACHE_COMMIT_INTERVAL', 5.0)
+		self.uncached_codes = uncached_codes(settings)
+		self.path = None
+		self.conn = None
+		self.stats = None
+		self.fingerprinter = None
+		self.total_bytes = 0  # stored (compressed) size of all entries
+		self.accessed = {}  # fingerprint -> last access time, written at commit
+		self.last_commit = time.monotonic()
+
+	def open_spider(self, spider):
+		crawler = spider.crawler
+		self.stats = crawler.stats
+		self.fingerprinter = crawler.request_fingerprinter
+		self.path = cache_db_path(self.settings, spider.name)
+		os.makedirs(os.path.dirname(self.path), exist_ok=True)
+		self.conn = sqlite3.connect(self.path)
+		self.conn.execute("PRAGMA journal_mode=WAL")
+		self.conn.execute("PRAGMA synchronous=NORMAL")
+		self.conn.execute(SCHEMA)
+		for statement in INDEXES:
+			self.conn.execute(statement)
+		self.conn.commit()
+		self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(stored_size), 0) FROM responses").fetchone()[0]
+		# hits and 304 revalidations skip the body download; count it as saved
+		crawler.signals.connect(self.response_received, signal=signals.response_received)
+		logger.info(f"HTTP cache {self.path}: {self.total_bytes / 1024 / 1024:.1f}MB, codec {self.codec}")
+		if self.total_bytes > self.max_bytes:  # the cap was lowered
+			self._evict()
+			self._commit()
+
+	def close_spider(self, spider):
+		if self.conn is None:
+			return
+		self._commit()
+		entries, raw_bytes = self.conn.execute(
+			"SELECT COUNT(*), COALESCE(SUM(raw_size), 0) FROM responses").fetchone()
+		self.stats.set_value('httpcache/db_entries', entries)
+		self.stats.set_value('httpcache/db_bytes', self.total_bytes)
+		if self.total_bytes:
+			self.stats.set_value('httpcache/compression_ratio', round(raw_bytes / self.total_bytes, 2))
+		self.conn.close()
+		self.conn = None
+
+	def _fingerprint(self, request):
+		return self.fingerprinter.fingerprint(request).hex()
+
+	def retrieve_response(self, spider, request):
+		fingerprint = self._fingerprint(request)
+		row = self.conn.execute(
+			"SELECT url, status, headers, body, codec, stored_at FROM responses WHERE fingerprint = ?",
+			(fingerprint,)).fetchone()
+		if row is None:
+			return None
+		url, status, headers, body, codec, stored_at = row
+		body = decompress(body, codec)
+		self.accessed[fingerprint] = time.time()
+		self._maybe_commit()
+		request.meta[STORED_AT_KEY] = stored_at
+		headers = Headers(headers_raw_to_dict(headers))
+		response_cls = responsetypes.from_args(headers=headers, url=url, body=body)
+		return response_cls(url=url, headers=headers, status=status, body=body)
+
+	def store_response(self, spider, request, response):
+		fingerprint = self._fingerprint(request)
+		now = time.time()
+		headers = headers_dict_to_raw(response.headers)
+		if 'cached' in response.flags:
+			# after a 304 Scrapy re-stores the cached response with freshened headers; the body is unchanged
+			self.conn.execute(
+				"UPDATE responses SET headers = ?, stored_at = ?, accessed_at = ? WHERE fingerprint = ?",
+				(headers, now, now, fingerprint))
+			self._maybe_commit()
+			return
+
+		body = response.body
+		# bodies the server already encoded (decoded later by HttpCompressionMiddleware) don't compress further
+		codec = 'none' if b'Content-Encoding' in response.headers else self.codec
+		stored = compress(body, codec)
+		stored_size = len(stored) + len(headers)
+		previous = self.conn.execute(
+			"SELECT stored_size FROM responses WHERE fingerprint = ?", (fingerprint,)).fetchone()
+		self.conn.execute(
+			"INSERT OR REPLACE INTO responses (fingerprint, method, request_url, url, status, headers, body, codec, "
+			"raw_size, stored_size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+			(fingerprint, request.method, request.url, response.url, response.status, headers, stored, codec,
+				len(body) + len(headers), stored_size, now, now))
+		self.accessed.pop(fingerprint, None)
+		self.total_bytes += stored_size - (previous[0] if previous else 0)
+		if self.total_bytes > self.max_bytes:
+			self._evict()
+		self._maybe_commit()
+
+	def _evict(self):
+		"""Evict least recently used entries until the total is under 90% of the cap."""
+		self._flush_accessed()
+		target = self.max_bytes * 0.9
+		evicted = evicted_bytes = 0
+		while self.total_bytes > target:
+			rows = self.conn.execute(
+				"SELECT fingerprint, stored_size FROM responses ORDER BY accessed_at LIMIT 100").fetchall()
+			if not rows:
+				break
+			victims = []
+			for fingerprint, stored_size in rows:
+				if self.total_bytes <= target:
+					break
+				victims.append((fingerprint,))
+				self.total_bytes -= stored_size
+				evicted_bytes += stored_size
+			self.conn.executemany("DELETE FROM responses WHERE fingerprint = ?", victims)
+			evicted += len(victims)
+		self.stats.inc_value('httpcache/evictions', evicted)
+		self.stats.inc_value('httpcache/evicted_bytes', evicted_bytes)
+		logger.info(f"HTTP cache over {self.max_bytes / 1024 / 1024:.0f}MB, evicted {evicted} entries "
+			f"({evicted_bytes / 1024 / 1024:.1f}MB)")
+
+	def _flush_accessed(self):
+		if self.accessed:
+			self.conn.executemany(
+				"UPDATE responses SET accessed_at = ? WHERE fingerprint = ?",
+				[(accessed_at, fingerprint) for fingerprint, accessed_at in self.accessed.items()])
+			self.accessed.clear()
+
+	def _maybe_commit(self):
+		if time.monotonic() - self.last_commit >= self.commit_interval:
+			self._commit()
+
+	def _commit(self):
+		self._flush_accessed()
+		self.conn.commit()
+		self.last_commit = time.monotonic()
+
+	def response_received(self, response, request, spider):
+		if b'If-None-Match' in request.headers or b'If-Modified-Since' in request.headers:
+			self.stats.inc_value('httpcache/conditional')
+		if 'cached' not in response.flags or self.conn is None:
+			return
+		if response.status in self.uncached_codes:  # error page cached by an older version, nothing saved
+			return
+		self.stats.inc_value('httpcache/bytes_saved', len(response.body))
+
+
+class RevalidatingPolicy(DummyPolicy):
+	"""Serve fresh entries, revalidate stale ones with conditional requests (HTTPCACHE_POLICY)."""
+
+	def __init__(self, settings):
+		super().__init__(settings)
+		self.expiration_secs = settings.getint('HTTPCACHE_EXPIRATION_SECS')
+		self.uncached_codes = uncached_codes(settings)
+
+	def should_cache_response(self, response, request):
+		# 429/5xx are retried later by RetryMiddleware; a cached copy would answer the retry
+		return response.status not in self.uncached_codes
+
+	def is_cached_response_fresh(self, cachedresponse, request):
+		if cachedresponse.status in self.uncached_codes:
+			# error page cached by an older version: download it again
+			return False
+		stored_at = request.meta.get(STORED_AT_KEY)
+		if stored_at is None or not self.expiration_secs or time.time() - stored_at < self.expiration_secs:
+			return True
+		etag = cachedresponse.headers.get(b'ETag')
+		last_modified = cachedresponse.headers.get(b'Last-Modified')
+		if etag:
+			request.headers[b'If-None-Match'] = etag
+		if last_modified:
+			request.headers[b'If-Modified-Since'] = last_modified
+		# stale entries without validators are downloaded again
+		return False
+
+	def is_cached_response_valid(self, cachedresponse, response, request):
+		# on a 304 Scrapy freshens the cached response and stores it again (the 'cached' branch of store_response)
+		return response.status == 304
@@ -0,0 +1,111 @@
+"""Streaming JSON Lines output.
+
+Convert a JSONL file back to the legacy JSON array format with:
+	python -m discourse_spider.jsonl output/posts.jsonl output/posts.json
+"""
+import gzip
+import json
+import time
+import logging
+import argparse
+
+try:
+	import zstandard
+except ImportError:  # optional, only needed for zstd compression
+	zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_SUFFIXES = {
+	'gzip': '.gz',
+	'zstd': '.zst',
+}
+
+
+def compressed_path(path, compression=None):
+	if not compression:
+		return path
+	if compression not in COMPRESSION_SUFFIXES:
+		raise ValueError(f"Unsupported JSONL compression: {compression}")
+	return path + COMPRESSION_SUFFIXES[compression]
+
+
+def open_jsonl(path, mode='r', compression=None):
+	# infer compression from the file suffix when not given
+	if compression is None:
+		for name, suffix in COMPRESSION_SUFFIXES.items():
+			if path.endswith(suffix):
+				compression = name
+				break
+	if compression == 'gzip':
+		return gzip.open(path, mode + 't', encoding='utf-8')
+	if compression == 'zstd':
+		if zstandard is None:
+			raise RuntimeError("zstd compression requires the 'zstandard' package")
+		return zstandard.open(path, mode + 't', encoding='utf-8')
+	return open(path, mode, encoding='utf-8')
+
+
+def iter_jsonl(path):
+	with open_jsonl(path, 'r') as f:
+		for line in f:
+			line = line.strip()
+			if line:
+				yield json.loads(line)
+
+
+def jsonl_to_json(src, dst, indent=2):
+	# streams records, output matches json.dump(records, indent=indent)
+	count = 0
+	pad = ' ' * indent
+	with open(dst, 'w', encoding='utf-8') as out:
+		out.write('[')
+		for record in iter_jsonl(src):
+			text = json.dumps(record, ensure_ascii=False, indent=indent)
+			out.write(',\n' if count else '\n')
+			out.write('\n'.join(pad + line for line in text.split('\n')))
+			count += 1
+		out.write('\n]' if count else ']')
+	return count
+
+
+class JsonLinesWriter:
+	def __init__(self, path, compression=None, flush_every=100, flush_interval=5.0, append=False):
+		self.path = compressed_path(path, compression)
+		self.flush_every = flush_every
+		self.flush_interval = flush_interval
+		# gzip and zstd readers both accept concatenated frames, so appending works for every format
+		self.file = open_jsonl(self.path, 'a' if append else 'w', compression)
+		self.count = 0
+		self.pending = 0
+		self.last_flush = time.monotonic()
+
+	def write(self, record):
+		self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+		self.count += 1
+		self.pending += 1
+		if self.pending >= self.flush_every or time.monotonic() - self.last_flush >= self.flush_interval:
+			self.flush()
+
+	def flush(self):
+		self.file.flush()
+		self.pending = 0
+		self.last_flush = time.monotonic()
+
+	def close(self):
+		self.file.close()
+		logger.info(f"JSONL file closed: {self.path} ({self.count} records)")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Convert a JSONL file to a JSON array file")
+	parser.add_argument("src", help="JSONL file (.gz / .zst supported)")
+	parser.add_argument("dst", help="Output JSON file")
+	parser.add_argument("--indent", type=int, default=2)
+	args = parser.parse_args()
+	count = jsonl_to_json(args.src, args.dst, indent=args.indent)
+	print(f"Converted {count} records: {args.src} -> {args.dst}")
+
+
+if __name__ == "__main__":
+	main()
@@ -1,8 +1,12 @@
+import io
 import os
-import json
 from datetime import datetime
 from itemadapter import ItemAdapter
 from scrapy.exceptions import DropItem
+from discourse_spider.buffered_writer import BufferedFileWriter
+from discourse_spider.frontier import resuming, connect_checkpoint, disconnect_checkpoint
+from discourse_spider.jsonl import JsonLinesWriter, jsonl_to_json
+from discourse_spider.storage import SqliteStore
 
 
 def clean_filename(filename: str) -> str:
@@ -32,38 +36,70 @@ class ValidationPipeline:
 
 
 class JsonWriterPipeline:
+	# streams items to JSONL as they arrive; legacy JSON arrays are derived on close
+	FILES = {
+		'TopicItem': 'posts',
+		'ReplyItem': 'replies',
+		'LatestTopicItem': 'latest_topics',
+	}
+
 	def __init__(self):
-		self.posts = []
-		self.replies = []
-		self.latest = []
-		self.posts_file = None
-		self.replies_file = None
-		self.latest_file = None
+		self.out_dir = None
+		self.writers = {}
+		self.legacy_export = True
 
 	def open_spider(self, spider):
-		out_dir = spider.settings.get('CUSTOM_SETTINGS', {}).get('OUTPUT_DIR', 'output')
-		os.makedirs(out_dir, exist_ok=True)
-		self.posts_file = open(os.path.join(out_dir, 'posts.json'), 'w', encoding='utf-8')
-		self.replies_file = open(os.path.join(out_dir, 'replies.json'), 'w', encoding='utf-8')
-		self.latest_file = open(os.path.join(out_dir, 'latest_topics.json'), 'w', encoding='utf-8')
+		custom = spider.settings.get('CUSTOM_SETTINGS', {})
+		self.out_dir = custom.get('OUTPUT_DIR', 'output')
+		os.makedirs(self.out_dir, exist_ok=True)
+		self.legacy_export = custom.get('JSON_LEGACY_EXPORT', True)
+		for cls, name in self.FILES.items():
+			self.writers[cls] = JsonLinesWriter(
+				os.path.join(self.out_dir, f'{name}.jsonl'),
+				compression=custom.get('JSONL_COMPRESSION'),
+				flush_every=custom.get('JSONL_FLUSH_EVERY', 100),
+				flush_interval=custom.get('JSONL_FLUSH_INTERVAL', 5.0),
+				append=resuming(spider.crawler),
+			)
+		connect_checkpoint(spider.crawler, self.checkpoint)
+
+	def checkpoint(self):
+		for writer in self.writers.values():
+			writer.flush()
 
 	def close_spider(self, spider):
-		json.dump(self.posts, self.posts_file, ensure_ascii=False, indent=2)
-		json.dump(self.replies, self.replies_file, ensure_ascii=False, indent=2)
-		json.dump(self.latest, self.latest_file, ensure_ascii=False, indent=2)
-		self.posts_file.close()
-		self.replies_file.close()
-		self.latest_file.close()
+		disconnect_checkpoint(spider.crawler, self.checkpoint)
+		for cls, writer in self.writers.items():
+			writer.close()
+			if self.legacy_export:
+				jsonl_to_json(writer.path, os.path.join(self.out_dir, f'{self.FILES[cls]}.json'))
 
 	def process_item(self, item, spider):
-		adapter = ItemAdapter(item)
-		cls = item.__class__.__name__
-		if cls == 'TopicItem':
-			self.posts.append(dict(adapter))
-		elif cls == 'ReplyItem':
-			self.replies.append(dict(adapter))
-		elif cls == 'LatestTopicItem':
-			self.latest.append(dict(adapter))
+		writer = self.writers.get(item.__class__.__name__)
+		if writer:
+			writer.write(dict(ItemAdapter(item)))
+		return item
+
+
+class SqliteStoragePipeline:
+	# WAL-mode SQLite with batched upserts, see discourse_spider.storage
+	def __init__(self):
+		self.store = None
+
+	def open_spider(self, spider):
+		self.store = SqliteStore.from_spider(spider)
+		self.store.open()
+		connect_checkpoint(spider.crawler, self.checkpoint)
+
+	def checkpoint(self):
+		self.store.flush()
+
+	def close_spider(self, spider):
+		disconnect_checkpoint(spider.crawler, self.checkpoint)
+		self.store.close()
+
+	def process_item(self, item, spider):
+		self.store.add(item.__class__.__name__, ItemAdapter(item).asdict())
 		return item
 
 
@@ -72,6 +108,8 @@ class TxtWriterPipeline:
 		self.base = None
 		self.forum_name = None
 		self.inited = set()
+		self.post_dirs = {}
+		self.writer = None
 
 	def open_spider(self, spider):
 		custom = spider.settings.get('CUSTOM_SETTINGS', {})
@@ -79,11 +117,35 @@ class TxtWriterPipeline:
 		out_dir = custom.get('OUTPUT_DIR', 'output')
 		self.base = os.path.join(out_dir, self.forum_name)
 		os.makedirs(self.base, exist_ok=True)
+		self.writer = BufferedFileWriter(
+			flush_bytes=custom.get('TXT_FLUSH_BYTES', 64 * 1024),
+			flush_interval=custom.get('TXT_FLUSH_INTERVAL', 5.0),
+			max_open_files=custom.get('TXT_MAX_OPEN_FILES', 64),
+		)
+		connect_checkpoint(spider.crawler, self.checkpoint)
+
+	def checkpoint(self):
+		self.writer.flush()
+
+	def close_spider(self, spider):
+		disconnect_checkpoint(spider.crawler, self.checkpoint)
+		if self.writer:
+			self.writer.close()
+
+	def _find_post_dir(self, post_id):
+		dir_name = self.post_dirs.get(post_id)
+		if dir_name is None:
+			# topic written by an earlier run: find directory by prefix once
+			for d in os.listdir(self.base):
+				if d.startswith(f"{post_id}_"):
+					dir_name = self.post_dirs[post_id] = d
+					break
+		return dir_name
 
 	def process_item(self, item, spider):
 		adapter = ItemAdapter(item)
 		if item.__class__.__name__ == 'TopicItem':
-			post_id = adapter.get('post_id') or 'unknown'
+			post_id = str(adapter.get('post_id') or 'unknown')  # ItemLoader fields are lists (unhashable)
 			title = clean_filename(adapter.get('title', 'unknown'))
 			dir_name = f"{post_id}_{title}"
 			post_dir = os.path.join(self.base, dir_name)
@@ -91,7 +153,8 @@ class TxtWriterPipeline:
 			file_path = os.path.join(post_dir, '完整内容.txt')
 			if file_path in self.inited:
 				return item
-			with open(file_path, 'w', encoding='utf-8') as f:
+			self.post_dirs[post_id] = dir_name
+			with io.StringIO() as f:
 				f.write("="*60 + "\n")
 				f.write(f"帖子标题: {adapter.get('title','')}\n")
 				f.write(f"帖子ID: {post_id}\n")
@@ -108,18 +171,18 @@ class TxtWriterPipeline:
 				f.write("\n" + "="*60 + "\n")
 				f.write("【回复内容】\n")
 				f.write("="*60 + "\n")
+				self.writer.write(file_path, f.getvalue())
 			self.inited.add(file_path)
 		elif item.__class__.__name__ == 'ReplyItem':
-			post_id = adapter.get('post_id') or 'unknown'
-			# find directory by prefix
-			for d in os.listdir(self.base):
-				if d.startswith(f"{post_id}_"):
-					file_path = os.path.join(self.base, d, '完整内容.txt')
-					with open(file_path, 'a', encoding='utf-8') as f:
-						f.write(f"\n【{adapter.get('floor_num',0)}楼】 - {adapter.get('author','未知用户')}\n")
-						f.write(f"回复时间: {adapter.get('reply_time','未知')}\n")
-						f.write("-"*40 + "\n")
-						f.write(f"{adapter.get('content','暂无内容')}\n")
-						f.write("-"*40 + "\n")
-					break
+			post_id = str(adapter.get('post_id') or 'unknown')
+			dir_name = self._find_post_dir(post_id)
+			if dir_name:
+				file_path = os.path.join(self.base, dir_name, '完整内容.txt')
+				with io.StringIO() as f:
+					f.write(f"\n【{adapter.get('floor_num',0)}楼】 - {adapter.get('author','未知用户')}\n")
+					f.write(f"回复时间: {adapter.get('reply_time','未知')}\n")
+					f.write("-"*40 + "\n")
+					f.write(f"{adapter.get('content','暂无内容')}\n")
+					f.write("-"*40 + "\n")
+					self.writer.append(file_path, f.getvalue())
 		return item
@@ -5,14 +5,14 @@ NEWSPIDER_MODULE = 'discourse_spider.spiders'
 
 ROBOTSTXT_OBEY = False
 
-CONCURRENT_REQUESTS = 8
-CONCURRENT_REQUESTS_PER_DOMAIN = 2
-CONCURRENT_REQUESTS_PER_IP = 1
+CONCURRENT_REQUESTS = 16  # global cap; per-domain concurrency is tuned by AdaptiveConcurrencyMiddleware
+CONCURRENT_REQUESTS_PER_DOMAIN = 2  # used when AIMD_ENABLED is off
+CONCURRENT_REQUESTS_PER_IP = 0  # slots per domain; a per-IP limit would override PER_DOMAIN and AIMD
 
-DOWNLOAD_DELAY = 1.5
+DOWNLOAD_DELAY = 1.5  # starting delay for AIMD (fixed delay when AIMD_ENABLED is off)
 RANDOMIZE_DOWNLOAD_DELAY = True
 
-AUTOTHROTTLE_ENABLED = True
+AUTOTHROTTLE_ENABLED = False  # replaced by AdaptiveConcurrencyMiddleware
 AUTOTHROTTLE_START_DELAY = 1
 AUTOTHROTTLE_MAX_DELAY = 10
 AUTOTHROTTLE_TARGET_CONCURRENCY = 2.0
@@ -26,20 +26,34 @@ DEFAULT_REQUEST_HEADERS = {
 	'Upgrade-Insecure-Requests': '1',
 }
 
+SCHEDULER = 'discourse_spider.frontier.FrontierScheduler'  # resumable SQLite frontier, falls back to Scrapy's scheduler when FRONTIER_ENABLED is off
+
+SPIDER_MIDDLEWARES = {
+	'discourse_spider.frontier.FrontierMiddleware': 10,  # marks requests done once their callback output is processed
+	'discourse_spider.replay.ReplayTimingMiddleware': 950,  # replay mode only
+}
+
 DOWNLOADER_MIDDLEWARES = {
+	'discourse_spider.replay.ReplayMiddleware': 1,  # replay mode only: serve responses from the recorded corpus
 	'discourse_spider.middlewares.RotateUserAgentMiddleware': 400,
+	'discourse_spider.concurrency.AdaptiveConcurrencyMiddleware': 960,  # per-domain AIMD, next to the downloader
 	'scrapy.downloadermiddlewares.useragent.UserAgentMiddleware': None,
 }
 
 ITEM_PIPELINES = {
+	'discourse_spider.replay.PipelineTimerStart': 1,  # replay mode only
 	'discourse_spider.pipelines.ValidationPipeline': 300,
 	'discourse_spider.pipelines.TxtWriterPipeline': 400,
 	'discourse_spider.pipelines.JsonWriterPipeline': 450,
+	# 'discourse_spider.pipelines.SqliteStoragePipeline': 500,
+	'discourse_spider.replay.PipelineTimerEnd': 999,
 }
 
 HTTPCACHE_ENABLED = True
-HTTPCACHE_EXPIRATION_SECS = 3600
+HTTPCACHE_EXPIRATION_SECS = 3600  # fresh for an hour, then revalidated with If-None-Match / If-Modified-Since
 HTTPCACHE_DIR = 'httpcache'
+HTTPCACHE_STORAGE = 'discourse_spider.httpcache.SqliteCacheStorage'  # one compressed SQLite file per spider
+HTTPCACHE_POLICY = 'discourse_spider.httpcache.RevalidatingPolicy'
 
 LOG_LEVEL = 'INFO'
 LOG_FILE = 'scrapy.log'
@@ -54,6 +68,38 @@ CUSTOM_SETTINGS = {
 	'FORUM_NAME': 'Home Assistant Community',
 	'OUTPUT_DIR': 'output',
 	'MAX_REPLIES_PER_POST': 100,
+	'TXT_FLUSH_BYTES': 64 * 1024,
+	'TXT_FLUSH_INTERVAL': 5.0,
+	'TXT_MAX_OPEN_FILES': 64,
+	'JSONL_COMPRESSION': None,  # None, 'gzip' or 'zstd' (needs zstandard)
+	'JSONL_FLUSH_EVERY': 100,
+	'JSONL_FLUSH_INTERVAL': 5.0,
+	'JSON_LEGACY_EXPORT': True,
+	'SQLITE_DB': 'forum_data.db',  # under OUTPUT_DIR
+	'SQLITE_SOURCE': None,  # defaults to the spider's domain
+	'SQLITE_BATCH_SIZE': 500,
+	'SQLITE_COMMIT_INTERVAL': 5.0,
+	'AIMD_ENABLED': True,
+	'AIMD_START_CONCURRENCY': 1,
+	'AIMD_MIN_CONCURRENCY': 1,
+	'AIMD_MAX_CONCURRENCY': 8,
+	'AIMD_INCREASE': 1,
+	'AIMD_DECREASE_FACTOR': 0.5,
+	'AIMD_WINDOW': 5,  # minimum responses per evaluation window
+	'AIMD_MIN_DELAY': 0.05,  # keeps a small gap so a slot never bursts its whole queue at once
+	'AIMD_MAX_DELAY': 10.0,
+	'AIMD_LATENCY_FACTOR': 2.0,  # window mean latency above this x baseline is a spike
+	'AIMD_LATENCY_FLOOR': 0.25,  # seconds; lower mean latencies never count as spikes
+	'HTTPCACHE_COMPRESSION': 'zstd',  # 'zstd' (needs zstandard, else zlib) / 'zlib' / 'none'
+	'HTTPCACHE_MAX_MB': 512,  # cache database cap; least recently used entries are evicted above it
+	'HTTPCACHE_COMMIT_INTERVAL': 5.0,  # seconds
+	'REPLAY_ENABLED': False,  # run.py --replay
+	'REPLAY_SOURCE': None,  # HTTP cache db/dir or WARC file/dir; defaults to .scrapy/<HTTPCACHE_DIR>/<spider name>.sqlite3 (or the dir)
+	'REPLAY_CONCURRENT_REQUESTS': 64,
+	'FRONTIER_ENABLED': True,  # resume an interrupted crawl from the last checkpoint
+	'FRONTIER_DB': 'frontier_{spider}.db',  # under OUTPUT_DIR
+	'FRONTIER_RESUME': True,  # run.py --fresh turns this off and starts over
+	'FRONTIER_CHECKPOINT_INTERVAL': 10.0,  # seconds
 }
 
 TELNETCONSOLE_ENABLED = False
@@ -17,6 +17,14 @@ class LatestTopicsSpider(scrapy.Spider):
 		self.limit = int(kwargs.get('limit', 200))
 		self.collected = 0
 
+	def frontier_state(self):
+		# saved with each frontier checkpoint, see discourse_spider.frontier
+		return {'collected': self.collected}
+
+	def restore_frontier_state(self, state):
+		self.collected = state.get('collected', 0)
+		self.logger.info(f"Resumed with {self.collected} topics already collected")
+
 	def start_requests(self):
 		url = urljoin(self.base, '/latest.json')
 		yield scrapy.Request(url=url, callback=self.parse_page, meta={'page': 0})
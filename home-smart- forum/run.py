@@ -3,6 +3,7 @@ import os
 import sys
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
+from discourse_spider.replay import apply_replay_settings
 
 
 def main():
@@ -14,6 +15,11 @@ def main():
 	parser.add_argument("--debug", action="store_true", help="Enable debug logging")
 	parser.add_argument("--list", choices=["latest"], help="Crawl a listing instead of a single topic", required=False)
 	parser.add_argument("--limit", type=int, default=200, help="Max items for listing crawls")
+	parser.add_argument("--replay", nargs="?", const="", default=None, metavar="CORPUS",
+						help="Serve responses only from a recorded corpus (the HTTP cache by default, or a WARC file/dir) "
+							 "with no network access or delays, and report parse/pipeline throughput")
+	parser.add_argument("--fresh", action="store_true",
+						help="Discard the checkpoint of an unfinished crawl (request queue and spider state) and start over")
 	args = parser.parse_args()
 
 	os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "discourse_spider.settings")
@@ -22,12 +28,14 @@ def main():
 	# Override some runtime settings
 	settings.set("DOWNLOAD_DELAY", args.delay, priority='cmdline')
 	settings.set("CUSTOM_SETTINGS", {
+		**settings.get("CUSTOM_SETTINGS", {}),
 		"MAX_REPLIES_PER_POST": args.replies,
-		"OUTPUT_DIR": "output",
-		"FORUM_NAME": "Home Assistant Community",
+		"FRONTIER_RESUME": not args.fresh,
 	}, priority='cmdline')
 	if args.debug:
 		settings.set("LOG_LEVEL", "DEBUG", priority='cmdline')
+	if args.replay is not None:
+		apply_replay_settings(settings, args.replay or None)
 
 	process = CrawlerProcess(settings)
 